@@ -0,0 +1,241 @@
+"""Offline benchmark of the parse -> filter -> notify pipeline.
+
+Usage:
+    python -m benchmarks.bench_pipeline                  # run and compare against the baseline
+    python -m benchmarks.bench_pipeline --save-baseline  # run and store the results as the new baseline
+
+Each stage is timed separately on synthetic pages of several sizes (and on the
+recorded page), reporting the best time, throughput in cards per second and
+peak memory. The process exits with status 1 when a stage is slower than the
+baseline by more than the tolerance.
+
+Timings are compared relative to a calibration workload (the standard library
+HTML parser and json module on the recorded page) measured in the same run, so
+that a baseline recorded on a faster or slower machine still applies.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Callable
+
+# The pipeline never talks to the website or Telegram here, but Settings requires credentials
+for _name in ("MSE_EMAIL", "MSE_PASSWORD", "TELEGRAM_BOT_TOKEN", "MY_TELEGRAM_ID"):
+    os.environ.setdefault(_name, "benchmark")
+
+from benchmarks.fixtures import recorded_page, synthetic_page  # noqa: E402
+from src.filters import FilterEngine  # noqa: E402
+from src.models import Accommodation, SearchResults, UserConf  # noqa: E402
+from src.notification_builder import NotificationBuilder  # noqa: E402
+from src.page_cache import page_fingerprint  # noqa: E402
+from src.parser import SoupPageParser, get_page_parser  # noqa: E402
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+SEARCH_URL = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=4.67_45.94_5.06_45.52"
+
+
+def measure(func: Callable[[], Any], items: int, min_time: float = 0.5) -> dict[str, float]:
+    """Returns the best time of `func` over repeated runs (at least once, until `min_time` is spent), and its peak memory."""
+    # Peak memory is measured on a separate run, as tracing allocations slows everything down
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = float("inf")
+    spent = 0.0
+    while spent < min_time or best == float("inf"):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+
+    return {
+        "seconds": best,
+        "items_per_second": items / best if best > 0 else float("inf"),
+        "peak_memory_mb": peak / 1024 / 1024,
+    }
+
+
+def calibrate() -> float:
+    """Returns the best time of a workload that only depends on the machine and the Python version, not on this code."""
+    html = recorded_page()
+
+    def workload() -> None:
+        parser = HTMLParser()
+        parser.feed(html)
+        parser.close()
+        json.loads(json.dumps([html[i : i + 80] for i in range(0, len(html), 80)]))
+
+    return measure(workload, 1)["seconds"]
+
+
+def bench_page(name: str, html: str, results: dict[str, dict[str, float]]) -> None:
+    soup_parser = SoupPageParser()
+    parsed = soup_parser.parse(html)
+    accommodations = parsed.accommodations
+    size = len(accommodations)
+
+    results[f"{name}/parse[html.parser]"] = measure(lambda: soup_parser.parse(html), size)
+    # Cost of a poll whose results did not change, once the page is fetched
+    results[f"{name}/fingerprint"] = measure(lambda: page_fingerprint(html), size)
+
+    fast_parser = get_page_parser("auto")
+    if not isinstance(fast_parser, SoupPageParser):
+        results[f"{name}/parse[lxml]"] = measure(lambda: fast_parser.parse(html), size)
+
+    raw_accommodations = [a.model_dump() for a in accommodations]
+    results[f"{name}/model_construction"] = measure(
+        lambda: [Accommodation(**raw) for raw in raw_accommodations], size
+    )
+
+    search_results = SearchResults(
+        search_url=SEARCH_URL,  # type: ignore
+        count=parsed.count,
+        accommodations=accommodations,
+    )
+    confs = [
+        UserConf(conf_title=None, telegram_id="1", search_url=SEARCH_URL),  # type: ignore
+        UserConf(conf_title=None, telegram_id="2", search_url=SEARCH_URL, max_price=400),  # type: ignore
+        UserConf(conf_title=None, telegram_id="3", search_url=SEARCH_URL, is_colocative=True),  # type: ignore
+    ]
+    filter_engine = FilterEngine()
+    results[f"{name}/filter"] = measure(
+        lambda: filter_engine.filter_batch(accommodations, confs),
+        size * len(confs),
+    )
+    # Many subscribers of the same search, with a few distinct criteria
+    many_confs = [
+        UserConf(
+            conf_title=None,
+            telegram_id=str(i),
+            search_url=SEARCH_URL,  # type: ignore
+            max_price=300 + 50 * (i % 5),
+            min_surface=15 if i % 3 == 0 else None,
+        )
+        for i in range(1000)
+    ]
+    results[f"{name}/filter[1000 users]"] = measure(
+        lambda: filter_engine.filter_batch(accommodations, many_confs),
+        size * len(many_confs),
+    )
+
+    builder = NotificationBuilder()
+    results[f"{name}/notification"] = measure(
+        lambda: builder.search_results_notification(search_results), size
+    )
+
+
+def run(sizes: list[int]) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+    bench_page("recorded", recorded_page(), results)
+    for size in sizes:
+        bench_page(f"synthetic-{size}", synthetic_page(size), results)
+    return results
+
+
+def relative_slowdowns(
+    results: dict[str, dict[str, float]],
+    calibration: float,
+    baseline: dict[str, Any],
+) -> dict[str, float]:
+    """Returns, for each stage of the baseline, how many times slower it got, machine speed aside."""
+    if "calibration_seconds" not in baseline:
+        # Recorded before the timings were calibrated: absolute timings of another machine cannot be compared
+        return {}
+    machine_speedup = baseline["calibration_seconds"] / calibration
+    return {
+        stage: result["seconds"] * machine_speedup / baseline["results"][stage]["seconds"]
+        for stage, result in results.items()
+        if stage in baseline["results"]
+    }
+
+
+def compare(slowdowns: dict[str, float], tolerance: float) -> list[str]:
+    """Returns the stages that got slower than the baseline by more than `tolerance`."""
+    return [
+        f"{stage}: {ratio:.2f}x slower than baseline"
+        for stage, ratio in slowdowns.items()
+        if ratio > 1 + tolerance
+    ]
+
+
+def print_report(results: dict[str, dict[str, float]], slowdowns: dict[str, float]) -> None:
+    print(f"{'stage':<45} {'time (ms)':>12} {'items/s':>12} {'peak MB':>9} {'vs base':>8}")
+    for stage, result in results.items():
+        delta = f"{slowdowns[stage]:.2f}x" if stage in slowdowns else "-"
+        print(
+            f"{stage:<45} {result['seconds'] * 1000:>12.2f} "
+            f"{result['items_per_second']:>12.0f} {result['peak_memory_mb']:>9.2f} {delta:>8}"
+        )
+
+
+def main() -> int:
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help=f"Number of cards of the synthetic pages (default: {DEFAULT_SIZES})",
+    )
+    argument_parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline",
+    )
+    argument_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown against the baseline before failing (default: 0.25 = 25%%)",
+    )
+    args = argument_parser.parse_args()
+
+    # Parsers log every page, which would dominate the timings
+    logging.disable(logging.CRITICAL)
+
+    # Calibrated before and after, in case the machine got busier meanwhile
+    calibration = calibrate()
+    results = run(args.sizes)
+    calibration = min(calibration, calibrate())
+
+    baseline: dict[str, Any] = {"results": {}}
+    if BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text())
+    slowdowns = relative_slowdowns(results, calibration, baseline)
+
+    print(f"Calibration: {calibration * 1000:.2f} ms")
+    print_report(results, slowdowns)
+
+    if args.save_baseline:
+        BASELINE_PATH.write_text(
+            json.dumps(
+                {"python": platform.python_version(), "calibration_seconds": calibration, "results": results},
+                indent=2,
+                sort_keys=True,
+            )
+            + "\n"
+        )
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return 0
+
+    if baseline["results"] and not slowdowns:
+        print("The baseline has no calibration, save a new one with --save-baseline", file=sys.stderr)
+    regressions = compare(slowdowns, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
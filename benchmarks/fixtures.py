@@ -0,0 +1,72 @@
+"""Search results pages used by the benchmarks.
+
+The recorded cards come from the real website. Synthetic pages of any size are
+generated by cycling through them, with unique ids and varied prices, titles
+and occupation types.
+"""
+
+import random
+import re
+from pathlib import Path
+from typing import List
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+_ID_PATTERN = re.compile(r"/tools/42/accommodations/\d+")
+_TITLE_PATTERN = re.compile(r'(<h3 class="fr-card__title"><a [^>]*>)[^<]*(</a>)')
+_PRICE_PATTERN = re.compile(r'(<p class="fr-badge">)[^<]*(</p>)')
+_OCCUPATION_PATTERN = re.compile(r'(<p class="fr-card__detail fr-icon-group-fill">)[^<]*(</p>)')
+
+
+def recorded_cards() -> List[str]:
+    """Returns the HTML of the cards recorded from the real website."""
+    text = (FIXTURES_DIR / "recorded_cards.html").read_text(encoding="utf-8")
+    return [line for line in text.splitlines() if line.strip()]
+
+
+def search_page(cards: List[str], count: int | None = None) -> str:
+    """Wraps cards into a search results page, as rendered by the website."""
+    count = len(cards) if count is None else count
+    heading = f"{count} logements trouvés" if count else "Aucun logement trouvé"
+    return (
+        "<!doctype html><html lang=\"fr\"><head><title>Trouver un logement</title></head><body>"
+        "<main class=\"fr-container\">"
+        f'<h2 class="SearchResults-desktop fr-h4 svelte-11sc5my">{heading}</h2>'
+        f'<ul class="fr-grid-row fr-grid-row--gutters svelte-11sc5my">{"".join(cards)}</ul>'
+        "</main></body></html>"
+    )
+
+
+def _format_price(price: float) -> str:
+    return f"{price:.2f}".replace(".", ",") + " €"
+
+
+def synthetic_cards(size: int, seed: int = 42) -> List[str]:
+    """Returns `size` cards with unique ids, derived from the recorded ones."""
+    rng = random.Random(seed)
+    templates = recorded_cards()
+    cards = []
+    for i in range(size):
+        card = templates[i % len(templates)]
+        card = _ID_PATTERN.sub(f"/tools/42/accommodations/{100000 + i}", card)
+        card = _TITLE_PATTERN.sub(rf"\g<1>Residence {i}\g<2>", card)
+
+        low = round(rng.uniform(150, 650), 2)
+        if rng.random() < 0.2:
+            price = f"de {_format_price(low)[:-2]} à {_format_price(low + rng.uniform(20, 80))}"
+        else:
+            price = _format_price(low)
+        card = _PRICE_PATTERN.sub(rf"\g<1>{price}\g<2>", card, count=1)
+
+        occupation = rng.choice(["Individuel", "Individuel, Couple", "Colocation"])
+        card = _OCCUPATION_PATTERN.sub(rf"\g<1>{occupation}\g<2>", card)
+        cards.append(card)
+    return cards
+
+
+def synthetic_page(size: int, seed: int = 42) -> str:
+    return search_page(synthetic_cards(size, seed))
+
+
+def recorded_page() -> str:
+    return search_page(recorded_cards())
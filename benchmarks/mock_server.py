@@ -0,0 +1,397 @@
+"""Local stand-in for the MSE login, the CROUS accommodation website and the Telegram Bot API.
+
+Usage:
+    python -m benchmarks.mock_server --port 8080 --results 120 --latency-ms 200
+
+Then point the notifier at it (e.g. in .env):
+    CROUS_BASE_URL=http://localhost:8080
+    MSE_INITIAL_LOGIN_URL=http://localhost:8080/oauth2/login
+    TELEGRAM_API_URL=http://localhost:8080
+
+Behaviour can be changed while running, and counters read, through:
+    POST /__mock__/config   JSON body with any of the options below
+    GET  /__mock__/stats
+
+Options:
+    latency_ms        delay added to every response
+    error_rate        probability of answering a website request with a 500
+    results           number of accommodations of every search
+    page_size         number of cards per results page
+    churn_per_minute  number of accommodations replaced by new ones every minute
+    telegram_429_rate probability of answering a Bot API call with a 429 (retry_after = 1)
+"""
+
+import argparse
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from math import ceil
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from benchmarks.fixtures import search_page, synthetic_cards
+
+logger = logging.getLogger("mock_server")
+
+FIRST_ID = 100000
+SESSION_COOKIE = "crous_session"
+MSE_COOKIE = "mse_session"
+
+
+class MockState:
+    def __init__(self, **config: Any):
+        self.lock = threading.Lock()
+        self.config: dict[str, Any] = {
+            "latency_ms": 0,
+            "error_rate": 0.0,
+            "results": 50,
+            "page_size": 24,
+            "churn_per_minute": 0.0,
+            "telegram_429_rate": 0.0,
+        }
+        self.config.update({k: v for k, v in config.items() if v is not None})
+        self.started_at = time.monotonic()
+        self.sessions: set[str] = set()
+        self.stats: dict[str, int] = {}
+        self.messages: list[dict[str, Any]] = []
+        self.next_message_id = 1
+        self._cards: list[str] = []
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def cards(self, base_url: str) -> list[str]:
+        """Returns the cards currently listed, shifted by the churn since startup."""
+        results = int(self.config["results"])
+        minutes = (time.monotonic() - self.started_at) / 60
+        offset = int(minutes * float(self.config["churn_per_minute"]))
+
+        with self.lock:
+            total = offset + results
+            if len(self._cards) < total:
+                self._cards = synthetic_cards(max(total, 2 * len(self._cards)))
+            cards = self._cards[offset:total]
+
+        return [card.replace("https://trouverunlogement.lescrous.fr", base_url) for card in cards]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server: "MockServer"
+    protocol_version = "HTTP/1.1"
+
+    # --- Plumbing -------------------------------------------------------------------
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.headers.get('Host') or 'localhost'}"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+    def _cookies(self) -> dict[str, str]:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return {key: morsel.value for key, morsel in cookie.items()}
+
+    def _body(self) -> bytes:
+        return self.request_body
+
+    def _send(
+        self,
+        status: int,
+        body: str | bytes = b"",
+        content_type: str = "text/html; charset=utf-8",
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        payload = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _json(self, status: int, data: Any, headers: dict[str, str] | None = None) -> None:
+        self._send(status, json.dumps(data), "application/json", headers)
+
+    def _redirect(self, location: str, cookies: dict[str, str] | None = None) -> None:
+        headers = {"Location": location}
+        self.send_response(302)
+        for key, value in (cookies or {}).items():
+            self.send_header("Set-Cookie", f"{key}={value}; Path=/; HttpOnly")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _simulate_conditions(self) -> bool:
+        """Applies the configured latency and errors. Returns False if an error was sent."""
+        latency = float(self.state.config["latency_ms"]) / 1000
+        if latency:
+            time.sleep(latency)
+        if random.random() < float(self.state.config["error_rate"]):
+            self.state.count("website_errors")
+            self._send(500, "<h1>Erreur interne</h1>")
+            return False
+        return True
+
+    def _is_authenticated(self) -> bool:
+        return self._cookies().get(SESSION_COOKIE) in self.state.sessions
+
+    # --- Routing --------------------------------------------------------------------
+
+    def do_GET(self) -> None:
+        self._route("GET")
+
+    def do_POST(self) -> None:
+        self._route("POST")
+
+    def _route(self, method: str) -> None:
+        # Always consume the body, the connection is kept alive
+        length = int(self.headers.get("Content-Length") or 0)
+        self.request_body = self.rfile.read(length) if length else b""
+
+        url = urlparse(self.path)
+        path = url.path
+        query = parse_qs(url.query)
+
+        if path.startswith("/__mock__/"):
+            return self._control(method, path)
+        if path.startswith("/bot"):
+            return self._telegram(path)
+
+        self.state.count(f"{method} {path.split('/')[1] if '/' in path else path}")
+        if not self._simulate_conditions():
+            return
+
+        if path == "/oauth2/login":
+            return self._redirect(f"/login?login_challenge={secrets.token_hex(16)}")
+        if path == "/login" and method == "GET":
+            return self._send(200, _login_page(query.get("login_challenge", [""])[0]))
+        if path == "/login" and method == "POST":
+            return self._redirect(
+                "/mse/discovery/connect", {MSE_COOKIE: secrets.token_hex(16)}
+            )
+        if path == "/mse/discovery/connect":
+            if MSE_COOKIE not in self._cookies():
+                return self._redirect("/oauth2/login")
+            session = secrets.token_hex(16)
+            with self.state.lock:
+                self.state.sessions.add(session)
+            return self._redirect("/tools/42/search", {SESSION_COOKIE: session})
+        if path.startswith("/tools/42/search"):
+            if not self._is_authenticated():
+                return self._redirect("/oauth2/login")
+            return self._search_page(query)
+        if path.startswith("/tools/42/accommodations/"):
+            return self._detail_page(path.rsplit("/", 1)[-1])
+        if path.startswith("/api/fr/search/") and method == "POST":
+            if not self._is_authenticated():
+                return self._json(401, {"error": "unauthorized"})
+            return self._search_api()
+
+        self._send(404, "<h1>Page introuvable</h1>")
+
+    # --- Website --------------------------------------------------------------------
+
+    def _search_page(self, query: dict[str, list[str]]) -> None:
+        cards = self.state.cards(self.base_url)
+        page_size = int(self.state.config["page_size"])
+        page_count = max(1, ceil(len(cards) / page_size))
+        page = int(query.get("page", ["1"])[0])
+
+        html = search_page(cards[(page - 1) * page_size : page * page_size], count=len(cards))
+        if page_count > 1:
+            params = {k: v[0] for k, v in query.items()}
+            links = "".join(
+                f'<li><a class="fr-pagination__link" href="?{urlencode({**params, "page": p})}">{p}</a></li>'
+                for p in range(1, page_count + 1)
+            )
+            html = html.replace(
+                "</main>", f'<nav class="fr-pagination"><ul>{links}</ul></nav></main>'
+            )
+        self._send(200, html)
+
+    def _detail_page(self, accommodation_id: str) -> None:
+        rng = random.Random(accommodation_id)
+        self._send(
+            200,
+            "<html><body><main>"
+            f"<h1>Logement {accommodation_id}</h1>"
+            f'<div id="map" data-lat="{45.5 + rng.random() / 2:.6f}" data-lng="{4.7 + rng.random() / 2:.6f}"></div>'
+            f"<p>Surface : {rng.randint(9, 40)} m²</p>"
+            f"<p>Loyer : {rng.randint(150, 650)},{rng.randint(0, 99):02d} €</p>"
+            f"<p>Disponible à partir du 01/09/2026</p>"
+            "</main></body></html>",
+        )
+
+    def _search_api(self) -> None:
+        try:
+            payload = json.loads(self._body() or b"{}")
+        except ValueError:
+            return self._json(400, {"error": "invalid JSON"})
+
+        cards = self.state.cards(self.base_url)
+        page = int(payload.get("page", 1))
+        page_size = int(payload.get("pageSize", 24))
+        items = []
+        for i in range((page - 1) * page_size, min(page * page_size, len(cards))):
+            rent = random.Random(i).randint(15000, 65000)
+            items.append(
+                {
+                    "id": FIRST_ID + i,
+                    "label": f"Residence {i}",
+                    "residence": {
+                        "label": f"Residence {i}",
+                        "address": "1 rue de la Paix 69000 LYON",
+                        "location": {"lat": 45.5 + random.Random(-i).random() / 2, "lon": 4.7 + random.Random(i).random() / 2},
+                    },
+                    "occupationModes": [{"type": "alone", "rent": {"min": rent, "max": rent}}],
+                }
+            )
+        self._json(200, {"results": {"items": items, "total": {"value": len(cards)}}})
+
+    # --- Telegram -------------------------------------------------------------------
+
+    def _telegram(self, path: str) -> None:
+        method = path.rsplit("/", 1)[-1]
+        body = self._body()
+        content_type = self.headers.get("Content-Type", "")
+        if "application/json" in content_type:
+            params = json.loads(body or b"{}")
+        elif "multipart/form-data" in content_type:
+            params = _parse_multipart(content_type, body)
+        else:
+            params = {k: v[0] for k, v in parse_qs(body.decode("utf-8", "replace")).items()}
+
+        self.state.count(f"telegram {method}")
+        if random.random() < float(self.state.config["telegram_429_rate"]):
+            return self._json(
+                429,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                },
+            )
+
+        if method == "getMe":
+            return self._json(200, {"ok": True, "result": {"id": 1, "is_bot": True, "username": "mock_bot"}})
+
+        with self.state.lock:
+            message_id = self.state.next_message_id
+            self.state.next_message_id += 1
+            self.state.messages.append({"method": method, "message_id": message_id, **params})
+
+        if method == "sendMediaGroup":
+            media = params.get("media", [])
+            if isinstance(media, str):
+                media = json.loads(media)
+            result: Any = [{"message_id": message_id + i} for i in range(len(media))]
+        else:
+            result = {"message_id": message_id, "chat": {"id": params.get("chat_id")}, "text": params.get("text")}
+        self._json(200, {"ok": True, "result": result})
+
+    # --- Control --------------------------------------------------------------------
+
+    def _control(self, method: str, path: str) -> None:
+        if path == "/__mock__/config" and method == "POST":
+            updates = json.loads(self._body() or b"{}")
+            with self.state.lock:
+                self.state.config.update(updates)
+            return self._json(200, self.state.config)
+        if path == "/__mock__/stats":
+            with self.state.lock:
+                return self._json(
+                    200,
+                    {
+                        "config": self.state.config,
+                        "requests": self.state.stats,
+                        "telegram_messages": len(self.state.messages),
+                        "sessions": len(self.state.sessions),
+                    },
+                )
+        self._json(404, {"error": "unknown control endpoint"})
+
+
+def _parse_multipart(content_type: str, body: bytes) -> dict[str, str]:
+    message = BytesParser(policy=default_policy).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(
+            decode=True
+        ).decode("utf-8")
+        for part in message.iter_parts()
+    }
+
+
+def _login_page(challenge: str) -> str:
+    # The credentials form is only shown once the MSE login method has been chosen, as on the real page
+    return f"""<html><body>
+<button class="loginapp-button" onclick="document.getElementById('login-form').style.display = 'block'">
+  Connexion avec MesServices.etudiant.gouv.fr
+</button>
+<form id="login-form" method="post" action="/login?login_challenge={challenge}" style="display: none">
+  <input id="login_login" name="login" type="text">
+  <input id="login_password" name="password" type="password">
+  <button type="submit">Se connecter</button>
+</form>
+</body></html>"""
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], state: MockState):
+        super().__init__(address, MockHandler)
+        self.state = state
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument("--host", default="127.0.0.1")
+    argument_parser.add_argument("--port", type=int, default=8080)
+    argument_parser.add_argument("--results", type=int, default=None)
+    argument_parser.add_argument("--page-size", type=int, default=None)
+    argument_parser.add_argument("--latency-ms", type=float, default=None)
+    argument_parser.add_argument("--error-rate", type=float, default=None)
+    argument_parser.add_argument("--churn-per-minute", type=float, default=None)
+    argument_parser.add_argument("--telegram-429-rate", type=float, default=None)
+    args = argument_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+
+    state = MockState(
+        results=args.results,
+        page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        churn_per_minute=args.churn_per_minute,
+        telegram_429_rate=args.telegram_429_rate,
+    )
+    server = MockServer((args.host, args.port), state)
+    logger.info(f"Mock server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,39 @@
 import argparse
+import asyncio
 import logging
-from typing import List
-
-import telepot
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
-from selenium.webdriver.remote.webdriver import WebDriver
+import math
+import os
+import signal
+import time
+from typing import TYPE_CHECKING, List
 
+from src.archive import ListingArchive
 from src.authenticator import Authenticator
+from src.bot_api_client import BotApiClient
+from src.delivery_queue import DeliveryQueue
+from src.details import DetailCache, DetailEnricher
+from src.filters import FilterEngine
+from src.http_fetcher import HttpFetcher
+from src.metrics import metrics, start_metrics_server, write_cycle_record
 from src.parser import Parser
 from src.models import UserConf
 from src.notification_builder import NotificationBuilder
-from src.settings import Settings
-from src.telegram_notifier import TelegramNotifier
+from src.page_cache import PageCache
+from src.rate_limiter import HostRateLimiter
+from src.runtime import PollingRuntime
+from src.scheduler import AdaptiveScheduler
+from src.config_store import ConfigStore
+from src.search_planner import plan_searches
+from src.search_pool import SearchPool
+from src.seen_store import SeenStore
+from src.session_manager import SessionManager, SessionPool
+from src.sharding import ShardCoordinator
+from src.tiling import TilePlanner
+from src.settings import get_settings
+from src.telegram_notifier import BotApiNotifier, TelegramNotifier, set_bot_api_url
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
 
 logging.basicConfig(
     format="%(asctime)s %(name)s %(levelname)s: %(message)s",
@@ -31,7 +51,7 @@ def load_users_conf(
         UserConf(
             conf_title="Me",
             telegram_id=settings.MY_TELEGRAM_ID,
-            search_url=f"https://trouverunlogement.lescrous.fr/tools/42/search?bounds={bounds}",  # type:ignore
+            search_url=f"{settings.CROUS_BASE_URL}/tools/42/search?bounds={bounds}",  # type:ignore
             ignored_ids=[2755],
             max_price=max_price,
             is_colocative=is_colocative,
@@ -39,12 +59,21 @@ def load_users_conf(
     ]
 
 
-def create_driver(browser: str = "chrome", headless: bool = True) -> WebDriver:
+def create_driver(
+    browser: str = "chrome", headless: bool = True, remote_url: str | None = None
+) -> "WebDriver":
     """Create a Selenium WebDriver using Selenium Manager-managed drivers.
 
     browser: 'chrome' or 'firefox'
     headless: run without opening a visible browser window
+    remote_url: drive the browser of a remote Selenium server (e.g. a selenium/standalone-chrome
+    container) instead of starting a local one
     """
+    # Selenium is only imported once a browser is actually needed
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options as ChromeOptions
+    from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
     browser = browser.lower()
     if browser == "firefox":
         ff_options = FirefoxOptions()
@@ -53,6 +82,8 @@ def create_driver(browser: str = "chrome", headless: bool = True) -> WebDriver:
             ff_options.add_argument("-headless")
         else:
             logging.info("Running Firefox in non-headless mode")
+        if remote_url:
+            return webdriver.Remote(command_executor=remote_url, options=ff_options)
         # Create Firefox driver (Selenium Manager will resolve geckodriver)
         return webdriver.Firefox(options=ff_options)
     elif browser == "chrome":
@@ -72,12 +103,52 @@ def create_driver(browser: str = "chrome", headless: bool = True) -> WebDriver:
 
         ch_options.add_argument("--disable-dev-shm-usage")
         ch_options.add_argument("--no-sandbox")
+        if remote_url:
+            return webdriver.Remote(command_executor=remote_url, options=ch_options)
         # Create Chrome driver (Selenium Manager will resolve chromedriver)
         return webdriver.Chrome(options=ch_options)
     else:
         raise ValueError("Unsupported browser. Use 'chrome' or 'firefox'.")
 
 
+def record_cycle(duration: float, **details: int) -> None:
+    """Records the duration of a polling cycle, and writes what happened during it as a JSON line."""
+    metrics.observe("crous_cycle_seconds", duration)
+    metrics.set("crous_last_cycle_seconds", duration)
+    overrun = duration > settings.POLL_INTERVAL_SECONDS
+    if overrun:
+        metrics.inc("crous_cycle_overruns_total")
+        logger.warning(
+            f"Polling cycle took {duration:.0f}s, more than the poll interval ({settings.POLL_INTERVAL_SECONDS}s)"
+        )
+
+    stages = metrics.end_cycle()
+    if settings.METRICS_JSONL_PATH:
+        write_cycle_record(
+            settings.METRICS_JSONL_PATH,
+            {
+                "timestamp": time.time(),
+                "cycle_seconds": round(duration, 3),
+                "poll_interval_seconds": settings.POLL_INTERVAL_SECONDS,
+                "overrun": overrun,
+                **details,
+                "metrics": stages,
+            },
+        )
+
+
+async def run_until_signalled(runtime: PollingRuntime) -> None:
+    """Runs the polling runtime until SIGTERM or SIGINT (Ctrl+C) asks it to stop gracefully."""
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, runtime.stop)
+        except (NotImplementedError, AttributeError):
+            # Windows: signal handlers run in the main thread, between event loop steps
+            signal.signal(signum, lambda *_: loop.call_soon_threadsafe(runtime.stop))
+    await runtime.run()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Run the script in headless mode or not."
@@ -93,6 +164,24 @@ if __name__ == "__main__":
         default="chrome",
         help="Browser to use for Selenium (default: chrome)",
     )
+    parser.add_argument(
+        "--fetch-backend",
+        choices=["selenium", "http"],
+        default="selenium",
+        help="How search pages are fetched once authenticated (default: selenium)",
+    )
+    parser.add_argument(
+        "--telegram-backend",
+        choices=["botapi", "telepot"],
+        default="botapi",
+        help="Client used to send Telegram messages (default: botapi)",
+    )
+    parser.add_argument(
+        "--config",
+        default=None,
+        help="Users configurations file (.json, .yaml) or database (.sqlite3), reloaded when it changes "
+        "(default: USERS_CONFIG_PATH, or a single configuration built from the options below)",
+    )
     parser.add_argument(
         "--max-price",
         type=float,
@@ -108,57 +197,210 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    settings = Settings()
-    bot = telepot.Bot(token=settings.TELEGRAM_BOT_TOKEN)
-    bot.getMe()  # test if the bot is working
+    settings = get_settings()
+    if settings.SEARCH_TILE_DEGREES and not (
+        settings.ENRICH_DETAILS or (settings.CROUS_SEARCH_API_URL and args.fetch_backend == "http")
+    ):
+        # Cards have no coordinates: accommodations could not be routed to the users whose area contains them
+        parser.error(
+            "SEARCH_TILE_DEGREES needs the coordinates of the accommodations: "
+            "set ENRICH_DETAILS, or CROUS_SEARCH_API_URL with --fetch-backend http"
+        )
+    if not settings.LOCAL_BROWSER and not settings.SELENIUM_REMOTE_URL:
+        # The login always runs in a browser, even with the HTTP backend
+        parser.error("No browser is installed (LOCAL_BROWSER=false): set SELENIUM_REMOTE_URL to a Selenium server")
+    if settings.SHARD_STORE_PATH and not settings.SHARD_WORKER_ID:
+        parser.error("SHARD_WORKER_ID is required with SHARD_STORE_PATH, and must not change when the worker restarts")
+    if args.telegram_backend == "telepot":
+        import telepot
+
+        set_bot_api_url(settings.TELEGRAM_API_URL)
+        bot = telepot.Bot(token=settings.TELEGRAM_BOT_TOKEN)
+        bot.getMe()  # test if the bot is working
+        notifier: TelegramNotifier | BotApiNotifier = TelegramNotifier(bot)
+    else:
+        notifier = BotApiNotifier(
+            BotApiClient(
+                settings.TELEGRAM_BOT_TOKEN,
+                settings.TELEGRAM_API_URL,
+                pool_size=settings.TELEGRAM_POOL_SIZE,
+            )
+        )
+        notifier.get_me()  # test if the bot is working
 
-    user_confs = load_users_conf(
-        max_price=args.max_price, is_colocative=args.is_colocative
+    config_path = args.config or settings.USERS_CONFIG_PATH
+    config_store = ConfigStore(config_path) if config_path else None
+    user_confs = (
+        load_users_conf(max_price=args.max_price, is_colocative=args.is_colocative)
+        if config_store is None
+        else []
     )
 
     notification_builder = NotificationBuilder()
-    notifier = TelegramNotifier(bot)
+    filter_engine = FilterEngine()
+    shard = (
+        ShardCoordinator(
+            settings.SHARD_STORE_PATH,
+            worker_id=settings.SHARD_WORKER_ID,  # type: ignore[arg-type]
+            lease_seconds=settings.SHARD_LEASE_SECONDS,
+        )
+        if settings.SHARD_STORE_PATH
+        else None
+    )
+    delivery_queue_path = settings.DELIVERY_QUEUE_PATH
+    if shard is not None:
+        # Each worker sends its own messages
+        root, extension = os.path.splitext(delivery_queue_path)
+        delivery_queue_path = f"{root}.{shard.worker_id}{extension}"
+    delivery_queue = DeliveryQueue(
+        notifier,
+        delivery_queue_path,
+        workers=settings.DELIVERY_WORKERS,
+        per_chat_interval=settings.DELIVERY_PER_CHAT_INTERVAL_SECONDS,
+        global_per_second=settings.DELIVERY_GLOBAL_PER_SECOND,
+    )
+    delivery_queue.start()
 
-    while True:
-        try:
-            # Fresh driver and authentication every cycle
-            driver = create_driver(browser=args.browser, headless=not args.no_headless)
-            try:
-                Authenticator(settings.MSE_EMAIL, settings.MSE_PASSWORD).authenticate_driver(driver)
-
-                parser = Parser(driver)
-
-                for conf in user_confs:
-                    logging.info(f"Handling configuration : {conf}")
-                    search_results = parser.get_accommodations(conf.search_url)  # type: ignore
-
-                    # Filter accommodations based on UserConf
-                    filtered_accommodations = [
-                        acc
-                        for acc in search_results.accommodations
-                        if (
-                            conf.max_price is None
-                            or (
-                                isinstance(acc.price, (int, float))
-                                and acc.price <= conf.max_price
-                            )
-                        )
-                        and (acc.is_colocative == conf.is_colocative)
-                    ]
-                    search_results.accommodations = filtered_accommodations
-
-                    notification = notification_builder.search_results_notification(search_results)
-                    if notification:
-                        notifier.send_notification(conf.telegram_id, notification)
-            finally:
-                # Always close the driver before sleeping / next cycle
-                driver.quit()
-
-            logging.info(
-                f"Sleeping {settings.POLL_INTERVAL_SECONDS}s before next check..."
+    if settings.METRICS_PORT is not None:
+        start_metrics_server(settings.METRICS_PORT, host=settings.METRICS_HOST)
+    metrics.set("crous_poll_interval_seconds", settings.POLL_INTERVAL_SECONDS)
+
+    session = SessionPool(
+        [
+            SessionManager(
+                driver_factory=lambda: create_driver(
+                    browser=args.browser,
+                    headless=not args.no_headless,
+                    remote_url=settings.SELENIUM_REMOTE_URL,
+                ),
+                authenticator=Authenticator(settings.MSE_EMAIL, settings.MSE_PASSWORD),
+                max_cycles=settings.SESSION_MAX_CYCLES,
+                max_memory_mb=settings.SESSION_MAX_MEMORY_MB,
             )
-            import time
-            time.sleep(settings.POLL_INTERVAL_SECONDS)
-        except Exception:
-            logger.exception("Error during polling loop; stopping.")
-            break
+            for _ in range(settings.SEARCH_BROWSERS)
+        ]
+    )
+
+    http_fetcher = (
+        HttpFetcher(
+            timeout=settings.HTTP_TIMEOUT_SECONDS, pool_size=settings.SEARCH_CONCURRENCY
+        )
+        if args.fetch_backend == "http"
+        else None
+    )
+
+    rate_limiter = HostRateLimiter(settings.RATE_LIMIT_PER_HOST_SECONDS)
+    parser = Parser(
+        session,
+        http_fetcher,
+        rate_limiter=rate_limiter,
+        page_cache=PageCache(settings.PAGE_CACHE_MAX_AGE_SECONDS) if settings.PAGE_FINGERPRINTS else None,
+    )
+    search_pool = SearchPool(parser, max_workers=settings.SEARCH_CONCURRENCY)
+
+    enricher = (
+        DetailEnricher(
+            # Detail pages are public, the session cookies are sent anyway when available
+            http_fetcher or HttpFetcher(timeout=settings.HTTP_TIMEOUT_SECONDS),
+            DetailCache(
+                settings.DETAIL_CACHE_PATH,
+                ttl_seconds=settings.DETAIL_CACHE_TTL_HOURS * 3600 if settings.DETAIL_CACHE_TTL_HOURS else None,
+                max_entries=settings.DETAIL_CACHE_MAX_ENTRIES,
+            ),
+            settings.CROUS_BASE_URL,
+            max_workers=settings.DETAIL_FETCH_CONCURRENCY,
+            rate_limiter=rate_limiter,
+        )
+        if settings.ENRICH_DETAILS
+        else None
+    )
+
+    seen_store = SeenStore(
+        settings.SEEN_STORE_PATH,
+        ttl_seconds=settings.SEEN_TTL_HOURS * 3600 if settings.SEEN_TTL_HOURS else None,
+        # Searches move between workers, along with the accommodations their configurations saw
+        shared=shard is not None,
+    )
+    archive = ListingArchive(settings.LISTING_ARCHIVE_PATH) if settings.LISTING_ARCHIVE_PATH else None
+
+    scheduler = AdaptiveScheduler(
+        min_interval=settings.POLL_MIN_INTERVAL_SECONDS,
+        max_interval=settings.POLL_MAX_INTERVAL_SECONDS,
+        jitter=settings.POLL_JITTER,
+        max_polls_per_minute=settings.MAX_POLLS_PER_MINUTE,
+    )
+
+    tile_planner = (
+        TilePlanner(settings.SEARCH_TILE_DEGREES, max_tiles=settings.SEARCH_TILE_MAX_TILES)
+        if settings.SEARCH_TILE_DEGREES
+        else None
+    )
+
+    def current_plan() -> dict[str, List[UserConf]]:
+        # Each distinct search is fetched once, then its results are fanned out to its configurations
+        if config_store is None:
+            plan = plan_searches(user_confs)
+        else:
+            config_store.reload_if_changed()
+            plan = config_store.by_search_url
+            filter_engine.forget_others(conf for confs in plan.values() for conf in confs)
+        if tile_planner is not None:
+            # Overlapping areas are searched once, tile by tile
+            plan = tile_planner.plan(conf for confs in plan.values() for conf in confs)
+        if shard is not None:
+            # Only the searches assigned to this worker
+            return shard.owned(plan)
+        return plan
+
+    reload_interval = settings.USERS_CONFIG_RELOAD_SECONDS if config_store is not None else None
+    if shard is not None:
+        # Searches assigned to this worker are picked up before the lease of their previous owner could expire
+        reload_interval = min(reload_interval or math.inf, settings.SHARD_LEASE_SECONDS / 3)
+        shard.start()
+
+    runtime = PollingRuntime(
+        plan=current_plan,
+        scheduler=scheduler,
+        searcher=search_pool,
+        filter_engine=filter_engine,
+        seen_store=seen_store,
+        notification_builder=notification_builder,
+        delivery_queue=delivery_queue,
+        default_interval=settings.POLL_INTERVAL_SECONDS,
+        session=session,
+        end_cycle=session.end_cycle,
+        on_cycle=record_cycle,
+        route=tile_planner.route if tile_planner is not None else None,
+        enricher=enricher,
+        fast_alerts=settings.FAST_ALERTS,
+        archive=archive,
+        reload_interval=reload_interval,
+        max_consecutive_failures=settings.SESSION_MAX_CONSECUTIVE_FAILURES,
+    )
+
+    try:
+        asyncio.run(run_until_signalled(runtime))
+    finally:
+        if shard is not None:
+            # Hands the searches over to the other workers right away
+            shard.stop()
+            shard.close()
+        delivery_queue.stop(drain_timeout=settings.DELIVERY_DRAIN_TIMEOUT_SECONDS)
+        delivery_queue.close()
+        if isinstance(notifier, BotApiNotifier):
+            notifier.close()
+        seen_store.close()
+        if archive is not None:
+            archive.close()
+        if config_store is not None:
+            config_store.close()
+        search_pool.close()
+        parser.close()
+        session.close()
+        if enricher is not None:
+            enricher.close()
+            enricher.cache.close()
+            if enricher.http_fetcher is not http_fetcher:
+                enricher.http_fetcher.close()
+        if http_fetcher is not None:
+            http_fetcher.close()
@@ -0,0 +1,249 @@
+"""Archive of every accommodation found by every search, and the commands querying it.
+
+Each cycle appends one row per accommodation and search to a compact SQLite table:
+search URLs are stored once and referenced by an integer, timestamps are whole
+seconds and prices whole cents, and the table is clustered on the accommodation id
+(WITHOUT ROWID), so the history of one accommodation is read from contiguous pages
+whatever the size of the archive. The times at which accommodations (re)appear are
+kept in their own small table, for the questions about when rooms get listed.
+
+    python -m src.archive price-history 506
+    python -m src.archive appearances "Résidence Jean Mermoz"
+"""
+
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from src.card_fields import parse_range
+from src.models import Accommodation, SearchResults
+from src.search_planner import normalize_search_url
+from src.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+
+
+class PricePoint(NamedTuple):
+    """A price of an accommodation, from the first to the last time it was observed."""
+
+    first_seen: float
+    last_seen: float
+    price: Optional[float]
+
+
+def _price_cents(accommodation: Accommodation) -> Optional[int]:
+    # Price ranges are archived as their lower bound
+    price = parse_range(accommodation.price)
+    return round(price[0] * 100) if price else None
+
+
+class ListingArchive:
+    """On-disk (SQLite) archive of the accommodations found by the searches, cycle after cycle.
+
+    An accommodation is considered to appear again when it was not observed for
+    `relist_after_seconds`.
+    """
+
+    def __init__(self, path: str, relist_after_seconds: float = 6 * 3600, clock=time.time):
+        self.path = path
+        self.relist_after_seconds = relist_after_seconds
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS searches (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS listings (
+                accommodation_id INTEGER PRIMARY KEY,
+                title TEXT,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS observations (
+                accommodation_id INTEGER NOT NULL,
+                observed_at INTEGER NOT NULL,
+                search_id INTEGER NOT NULL,
+                price_cents INTEGER,
+                PRIMARY KEY (accommodation_id, observed_at, search_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS appearances (
+                accommodation_id INTEGER NOT NULL,
+                appeared_at INTEGER NOT NULL,
+                PRIMARY KEY (accommodation_id, appeared_at)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._connection.commit()
+        # Search URL -> id, search URLs being few
+        self._search_ids: dict[str, int] = dict(
+            (url, search_id) for search_id, url in self._connection.execute("SELECT id, url FROM searches")
+        )
+
+    def append(self, search_results: SearchResults) -> int:
+        """Archives the accommodations of one search. Returns the number of rows added."""
+        accommodations = {a.id: a for a in search_results.accommodations if a.id is not None}
+        if not accommodations:
+            return 0
+
+        now = int(self.clock())
+        search_url = normalize_search_url(search_results.search_url)
+        with self._lock:
+            search_id = self._search_id(search_url)
+            with self._connection:
+                ids = list(accommodations)
+                placeholders = ",".join("?" * len(ids))
+                last_seen = dict(
+                    self._connection.execute(
+                        f"SELECT accommodation_id, last_seen FROM listings WHERE accommodation_id IN ({placeholders})",
+                        ids,
+                    ).fetchall()
+                )
+                appeared = [
+                    (i, now)
+                    for i in ids
+                    if i not in last_seen or now - last_seen[i] > self.relist_after_seconds
+                ]
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO appearances (accommodation_id, appeared_at) VALUES (?, ?)", appeared
+                )
+                self._connection.executemany(
+                    """
+                    INSERT INTO listings (accommodation_id, title, first_seen, last_seen) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (accommodation_id)
+                    DO UPDATE SET title = COALESCE(excluded.title, title), last_seen = excluded.last_seen
+                    """,
+                    [(i, a.title, now, now) for i, a in accommodations.items()],
+                )
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO observations (accommodation_id, observed_at, search_id, price_cents) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(i, now, search_id, _price_cents(a)) for i, a in accommodations.items()],
+                )
+        return len(accommodations)
+
+    def _search_id(self, search_url: str) -> int:
+        search_id = self._search_ids.get(search_url)
+        if search_id is None:
+            with self._connection:
+                search_id = self._connection.execute(
+                    "INSERT INTO searches (url) VALUES (?)", (search_url,)
+                ).lastrowid
+            self._search_ids[search_url] = search_id  # type: ignore
+        return search_id  # type: ignore
+
+    def price_history(self, accommodation_id: int) -> List[PricePoint]:
+        """Returns the successive prices of an accommodation, consecutive observations at the same price being merged."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT observed_at, price_cents FROM observations WHERE accommodation_id = ? ORDER BY observed_at",
+                (accommodation_id,),
+            ).fetchall()
+
+        history: List[PricePoint] = []
+        for observed_at, price_cents in rows:
+            price = price_cents / 100 if price_cents is not None else None
+            if history and history[-1].price == price:
+                history[-1] = history[-1]._replace(last_seen=observed_at)
+            else:
+                history.append(PricePoint(observed_at, observed_at, price))
+        return history
+
+    def appearances(self, title: str) -> List[tuple[int, float]]:
+        """Returns the (accommodation id, time) at which the accommodations whose title contains `title` appeared."""
+        with self._lock:
+            return self._connection.execute(
+                """
+                SELECT appearances.accommodation_id, appeared_at FROM appearances
+                JOIN listings ON listings.accommodation_id = appearances.accommodation_id
+                WHERE listings.title LIKE ? ORDER BY appeared_at
+                """,
+                (f"%{title}%",),
+            ).fetchall()
+
+    def appearance_histogram(self, title: str) -> dict[tuple[int, int], int]:
+        """Counts the appearances of the accommodations whose title contains `title` by (weekday, hour), in local time."""
+        histogram: dict[tuple[int, int], int] = {}
+        for _, appeared_at in self.appearances(title):
+            moment = datetime.fromtimestamp(appeared_at)
+            key = (moment.weekday(), moment.hour)
+            histogram[key] = histogram.get(key, 0) + 1
+        return histogram
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%d/%m/%Y %H:%M")
+
+
+def _print_price_history(archive: ListingArchive, accommodation_id: int) -> int:
+    history = archive.price_history(accommodation_id)
+    if not history:
+        print(f"Logement {accommodation_id} jamais vu")
+        return 1
+    for point in history:
+        price = f"{point.price:g} €" if point.price is not None else "prix inconnu"
+        print(f"{_format_time(point.first_seen)} → {_format_time(point.last_seen)}  {price}")
+    return 0
+
+
+def _print_appearances(archive: ListingArchive, title: str) -> int:
+    histogram = archive.appearance_histogram(title)
+    total = sum(histogram.values())
+    if not total:
+        print(f"Aucun logement trouvé pour {title!r}")
+        return 1
+    print(f"{total} apparitions de logements pour {title!r}")
+    for weekday in range(7):
+        hours = {hour: count for (day, hour), count in histogram.items() if day == weekday}
+        if hours:
+            busiest = ", ".join(f"{hour}h ({count})" for hour, count in sorted(hours.items(), key=lambda i: -i[1]))
+            print(f"{WEEKDAYS[weekday]:<9} {sum(hours.values()):>5}  {busiest}")
+    return 0
+
+
+def main(argv: Iterable[str] | None = None) -> int:
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument(
+        "--path", default=None, help="Archive database (default: LISTING_ARCHIVE_PATH)"
+    )
+    commands = argument_parser.add_subparsers(dest="command", required=True)
+    price_history = commands.add_parser("price-history", help="Successive prices of an accommodation")
+    price_history.add_argument("accommodation_id", type=int)
+    appearances = commands.add_parser(
+        "appearances", help="When the accommodations of a residence appear, by weekday and hour"
+    )
+    appearances.add_argument("title", help="Part of the title of the accommodations, e.g. the residence name")
+    args = argument_parser.parse_args(None if argv is None else list(argv))
+
+    path = args.path or get_settings().LISTING_ARCHIVE_PATH
+    if not path:
+        argument_parser.error("No archive: pass --path or set LISTING_ARCHIVE_PATH")
+    archive = ListingArchive(path)
+    try:
+        if args.command == "price-history":
+            return _print_price_history(archive, args.accommodation_id)
+        return _print_appearances(archive, args.title)
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,15 +1,13 @@
 import logging
-from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from time import sleep
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse, parse_qs
 
-from src.settings import Settings
+from src.metrics import metrics
+from src.settings import get_settings
+from src.waits import timed_wait
 
-settings = Settings()
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
 
 logger = logging.getLogger(__name__)
 
@@ -17,17 +15,24 @@ logger = logging.getLogger(__name__)
 class Authenticator:
     """Class that handles the authentication to the CROUS website and returns a WebDriver object that is authenticated."""
 
-    def __init__(self, email: str, password: str, delay: int = 2):
+    def __init__(self, email: str, password: str):
         self.email = email
         self.password = password
-        self.delay = delay
 
-    def authenticate_driver(self, driver: WebDriver) -> None:
+    def authenticate_driver(self, driver: "WebDriver") -> None:
         """Authenticates the given WebDriver object to the CROUS website."""
+        with metrics.timer("crous_authentication_seconds"):
+            self._authenticate(driver)
 
-        logger.info("Authenticating to the CROUS website...")
+    def _authenticate(self, driver: "WebDriver") -> None:
+        # Slow to import, and only needed once a browser is started
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        from selenium.webdriver.support import expected_conditions as EC
 
-        sleep(self.delay)
+        settings = get_settings()
+        logger.info("Authenticating to the CROUS website...")
 
         # Step 1: Go to the initial login page (will redirect with a fresh login_challenge)
         logger.info(f"Going to the initial login page: {settings.MSE_INITIAL_LOGIN_URL}")
@@ -35,57 +40,103 @@ class Authenticator:
 
         # Wait for redirect to URL that contains the login_challenge parameter
         try:
-            WebDriverWait(driver, 15).until(EC.url_contains("login_challenge="))
+            timed_wait(
+                driver,
+                EC.url_contains("login_challenge="),
+                settings.WAIT_LOGIN_CHALLENGE_TIMEOUT,
+                "login_challenge",
+            )
             current_url = driver.current_url
             parsed = urlparse(current_url)
             challenge = parse_qs(parsed.query).get("login_challenge", [None])[0]
             if challenge:
                 logger.info(f"Obtained login_challenge token: {challenge}")
-        except Exception:
+        except TimeoutException:
             logger.warning("Did not detect login_challenge in URL within timeout; continuing anyway")
-        sleep(self.delay)
 
         # Step 2: choose the correct authentication method
         logger.info("Choosing the correct authentication method")
-        mse_connect_button = driver.find_element(By.CLASS_NAME, "loginapp-button")
+        mse_connect_button = timed_wait(
+            driver,
+            EC.presence_of_element_located((By.CLASS_NAME, "loginapp-button")),
+            settings.WAIT_LOGIN_FORM_TIMEOUT,
+            "login_method_button",
+        )
         # mse_connect_button.click() # somehow doesn't work. We simulate a click instead :
         driver.execute_script("arguments[0].click();", mse_connect_button)
-        sleep(self.delay)
 
         # Step 3: Input credentials and submit
         logger.info("Inputting credentials")
-        username_input = driver.find_element(By.ID, "login_login")
+        username_input = timed_wait(
+            driver,
+            EC.visibility_of_element_located((By.ID, "login_login")),
+            settings.WAIT_LOGIN_FORM_TIMEOUT,
+            "login_form",
+        )
         password_input = driver.find_element(By.ID, "login_password")
 
         username_input.send_keys(self.email)
         password_input.send_keys(self.password)
 
         logger.info("Submitting the form")
+        login_url = driver.current_url
         password_input.send_keys(Keys.RETURN)
 
-        sleep(self.delay)
+        # Wait for the login form to go away (post-login redirect)
+        try:
+            timed_wait(
+                driver,
+                EC.any_of(EC.staleness_of(password_input), EC.url_changes(login_url)),
+                settings.WAIT_LOGIN_REDIRECT_TIMEOUT,
+                "login_redirect",
+            )
+        except TimeoutException:
+            logger.warning("Login form still displayed after submitting; continuing anyway")
 
         # Step 4: Validate the rules
         # self._validate_rules(driver)
 
         # Step 5: Force update the auth status
-        driver.get("https://trouverunlogement.lescrous.fr/mse/discovery/connect")
+        connect_path = "/mse/discovery/connect"
+        driver.get(f"{settings.CROUS_BASE_URL}{connect_path}")
+        try:
+            # The connect page redirects to the website once the session is updated
+            timed_wait(
+                driver,
+                lambda driver: urlparse(driver.current_url).path.rstrip("/") != connect_path,
+                settings.WAIT_LOGIN_REDIRECT_TIMEOUT,
+                "connect_redirect",
+            )
+        except TimeoutException:
+            logger.warning("Still on the connect page after updating the session")
 
         # Done
         logger.info("Successfully authenticated to the CROUS website")
 
-    def _validate_rules(self, driver: WebDriver) -> None:
+    def _validate_rules(self, driver: "WebDriver") -> None:
         """Validates the rules of the CROUS website."""
-        logger.info("Validating the rules of the CROUS website")
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
 
-        driver.get("https://trouverunlogement.lescrous.fr/tools/42/rules")
+        settings = get_settings()
+        logger.info("Validating the rules of the CROUS website")
 
-        sleep(self.delay)
+        driver.get(f"{settings.CROUS_BASE_URL}/tools/42/rules")
 
         # <button class="fr-btn" type="submit" name="searchSubmit">Passer à la recherche de logements</button>
 
-        validate_button = driver.find_element(By.NAME, "searchSubmit")
+        validate_button = timed_wait(
+            driver,
+            EC.element_to_be_clickable((By.NAME, "searchSubmit")),
+            settings.WAIT_LOGIN_FORM_TIMEOUT,
+            "rules_button",
+        )
 
         validate_button.click()
 
-        sleep(self.delay)
+        timed_wait(
+            driver,
+            EC.staleness_of(validate_button),
+            settings.WAIT_LOGIN_REDIRECT_TIMEOUT,
+            "rules_redirect",
+        )
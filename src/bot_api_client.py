@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine, List, TypeVar
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Telegram accepts between 2 and 10 items in a single sendMediaGroup call
+MEDIA_GROUP_MAX_SIZE = 10
+# Maximum length of the caption of a photo
+TELEGRAM_MAX_CAPTION_LENGTH = 1024
+
+
+class TelegramApiError(Exception):
+    """Error answered by the Bot API.
+
+    Exposes `error_code`, `retry_after` and the raw `json` answer, like telepot's errors,
+    so that the delivery queue can tell rate limits and permanent failures apart.
+    """
+
+    def __init__(self, description: str, error_code: int | None, json: dict | None = None):
+        super().__init__(description, error_code)
+        self.description = description
+        self.error_code = error_code
+        self.json = json or {}
+        self.retry_after = (self.json.get("parameters") or {}).get("retry_after")
+
+    def __str__(self) -> str:
+        return f"{self.error_code}: {self.description}"
+
+
+class BotApiClient:
+    """Asynchronous Telegram Bot API client on top of a pooled, keep-alive aiohttp session.
+
+    All requests share the same connection pool, so bursts of notifications reuse
+    a few TCP/TLS connections instead of opening one per message.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = "https://api.telegram.org",
+        pool_size: int = 20,
+        timeout: float = 30,
+    ):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # The session is created lazily, inside the event loop that uses it
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size, limit_per_host=self.pool_size, keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def call(self, method: str, **params: Any) -> Any:
+        """Calls a Bot API method and returns its `result`, raises TelegramApiError on failure."""
+        payload = {key: value for key, value in params.items() if value is not None}
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        async with self._get_session().post(url, json=payload) as response:
+            try:
+                data = await response.json(content_type=None)
+            except ValueError:
+                raise TelegramApiError(
+                    f"Invalid answer to {method} (HTTP {response.status})", response.status
+                )
+        if not isinstance(data, dict) or not data.get("ok"):
+            data = data if isinstance(data, dict) else {}
+            raise TelegramApiError(
+                data.get("description", f"{method} failed"),
+                data.get("error_code", response.status),
+                data,
+            )
+        return data.get("result")
+
+    async def get_me(self) -> dict:
+        return await self.call("getMe")
+
+    async def send_message(
+        self, chat_id: str, text: str, parse_mode: str | None = "HTML"
+    ) -> dict:
+        return await self.call(
+            "sendMessage",
+            chat_id=chat_id,
+            text=text,
+            parse_mode=parse_mode,
+            disable_web_page_preview=True,
+        )
+
+    async def edit_message_text(
+        self, chat_id: str, message_id: int, text: str, parse_mode: str | None = "HTML"
+    ) -> dict:
+        return await self.call(
+            "editMessageText",
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
+            parse_mode=parse_mode,
+            disable_web_page_preview=True,
+        )
+
+    async def send_media_group(
+        self,
+        chat_id: str,
+        photo_urls: List[str],
+        caption: str | None = None,
+        parse_mode: str | None = "HTML",
+    ) -> List[dict]:
+        """Sends photos as albums, MEDIA_GROUP_MAX_SIZE photos per call. The caption goes on the first photo."""
+        messages: List[dict] = []
+        for start in range(0, len(photo_urls), MEDIA_GROUP_MAX_SIZE):
+            group = photo_urls[start : start + MEDIA_GROUP_MAX_SIZE]
+            media: List[dict] = [{"type": "photo", "media": url} for url in group]
+            if start == 0 and caption:
+                media[0]["caption"] = caption[:TELEGRAM_MAX_CAPTION_LENGTH]
+                media[0]["parse_mode"] = parse_mode
+            if len(media) == 1:
+                # sendMediaGroup needs at least two items
+                photo = media[0]
+                messages.append(
+                    await self.call(
+                        "sendPhoto",
+                        chat_id=chat_id,
+                        photo=photo["media"],
+                        caption=photo.get("caption"),
+                        parse_mode=photo.get("parse_mode"),
+                    )
+                )
+            else:
+                messages.extend(
+                    await self.call("sendMediaGroup", chat_id=chat_id, media=media)
+                )
+        return messages
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class EventLoopThread:
+    """Runs an asyncio event loop in a background thread, so that synchronous code can submit coroutines to it."""
+
+    def __init__(self, name: str = "event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name=name, daemon=True
+        )
+        self._thread.start()
+
+    def run(self, coroutine: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        """Runs the coroutine in the loop and blocks until it is done."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def close(self) -> None:
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
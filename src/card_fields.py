@@ -0,0 +1,208 @@
+"""Typed fields of an accommodation card, extracted once when the card is parsed.
+
+The card shows the address, then free text details: surface, occupation modes,
+beds and amenities. Occupation modes and amenities are stored as bit flags so
+that filters only compare integers.
+"""
+
+import logging
+import re
+import sys
+from enum import IntFlag
+from typing import Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+# "393,46 €", "de 418,4 à 481,2 €", "19 m²", "de 9,9 à 11,9 m²"
+_RANGE_PATTERN = re.compile(rf"^(?:de\s+)?{_NUMBER}(?:\s*à\s*{_NUMBER})?\s*(?:€|m²)?$")
+# "1 lit simple, 1 lit rapprochable", "2 lits simples"
+_BEDS_PATTERN = re.compile(r"(\d+)\s+lits?\b", re.IGNORECASE)
+# "... 40000 MONT-DE-MARSAN", "1, rue Gaston DEFERRE - 90000 BELFORT -"
+_POSTAL_CODE_PATTERN = re.compile(r"\b(\d{5})\b([^\d,]*)")
+
+
+def parse_range(value: float | str | None) -> Optional[tuple[float, float]]:
+    """Parses a price or surface, single value or range, into (min, max). Returns None if it cannot be parsed."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value), float(value)
+
+    match = _RANGE_PATTERN.match(value.strip().replace("\u00a0", " ").replace("\u202f", " "))
+    if not match:
+        return None
+    low = float(match.group(1).replace(",", "."))
+    high = float(match.group(2).replace(",", ".")) if match.group(2) else low
+    return min(low, high), max(low, high)
+
+
+# Flag class -> casefolded label -> flag, filled in once each class is defined
+_FLAGS_BY_LABEL: dict[type, dict[str, "_LabeledFlag"]] = {}
+# Same, with the values of the flags
+_BITS_BY_LABEL: dict[type, dict[str, int]] = {}
+
+
+def _register_labels(cls: type, flags_by_label: dict[str, "_LabeledFlag"]) -> None:
+    _FLAGS_BY_LABEL[cls] = flags_by_label
+    _BITS_BY_LABEL[cls] = {label: flag.value for label, flag in flags_by_label.items()}
+
+
+class _LabeledFlag(IntFlag):
+    """Bit flags shown on the cards with a French label."""
+
+    @classmethod
+    def parse(cls, label: str):
+        """Returns the flag with the given label (case insensitive), or None if it is unknown."""
+        return _FLAGS_BY_LABEL[cls].get(label.strip().casefold())
+
+    @classmethod
+    def from_labels(cls, labels: Iterable[str]):
+        # Flags are combined as plain ints, operations on enum members being much slower
+        bits = _BITS_BY_LABEL[cls]
+        flags = 0
+        for label in labels:
+            flag = bits.get(label.strip().casefold())
+            if flag is None:
+                logger.debug(f"Unknown {cls.__name__.lower()} label: {label!r}")
+            else:
+                flags |= flag
+        return cls(flags)
+
+    def labels(self) -> List[str]:
+        return [flag.label for flag in type(self) if flag in self]  # type: ignore[attr-defined]
+
+
+class Occupation(_LabeledFlag):
+    INDIVIDUEL = 1
+    COUPLE = 2
+    COLOCATION = 4
+
+    @property
+    def label(self) -> str:
+        return (self.name or "").capitalize()
+
+
+_register_labels(Occupation, {flag.label.casefold(): flag for flag in Occupation})
+_OCCUPATION_BITS = _BITS_BY_LABEL[Occupation]
+
+
+# Occupation types of the search API
+API_OCCUPATIONS = {
+    "alone": Occupation.INDIVIDUEL,
+    "couple": Occupation.COUPLE,
+    "house_sharing": Occupation.COLOCATION,
+}
+
+
+class Amenity(_LabeledFlag):
+    WC = 1
+    DOUCHE = 2
+    BAIGNOIRE = 4
+    LAVABO = 8
+    EVIER_PLAQUE = 16
+    CUISINE = 32
+    KITCHENETTE = 64
+    FRIGO = 128
+    MICRO_ONDE = 256
+    FOUR = 512
+    LAVE_LINGE = 1024
+    BALCON = 2048
+    TERRASSE = 4096
+    DUPLEX = 8192
+    MEUBLE = 16384
+    ASCENSEUR = 32768
+    PARKING = 65536
+    INTERNET = 131072
+    ACCESSIBLE_PMR = 262144
+
+    @property
+    def label(self) -> str:
+        return _AMENITY_LABELS[self]
+
+
+# Labels as shown on the cards
+_AMENITY_LABELS = {
+    Amenity.WC: "WC",
+    Amenity.DOUCHE: "Douche",
+    Amenity.BAIGNOIRE: "Baignoire",
+    Amenity.LAVABO: "Lavabo",
+    Amenity.EVIER_PLAQUE: "Evier + plaque",
+    Amenity.CUISINE: "Cuisine",
+    Amenity.KITCHENETTE: "Kitchenette",
+    Amenity.FRIGO: "Frigo",
+    Amenity.MICRO_ONDE: "Micro-onde",
+    Amenity.FOUR: "Four",
+    Amenity.LAVE_LINGE: "Lave-linge",
+    Amenity.BALCON: "Balcon",
+    Amenity.TERRASSE: "Terrasse",
+    Amenity.DUPLEX: "Duplex",
+    Amenity.MEUBLE: "Meublé",
+    Amenity.ASCENSEUR: "Ascenseur",
+    Amenity.PARKING: "Parking",
+    Amenity.INTERNET: "Internet",
+    Amenity.ACCESSIBLE_PMR: "Accessible PMR",
+}
+_AMENITIES_BY_LABEL = {label.casefold(): amenity for amenity, label in _AMENITY_LABELS.items()}
+# Spelling variants
+_AMENITIES_BY_LABEL.update(
+    {"micro-ondes": Amenity.MICRO_ONDE, "wifi": Amenity.INTERNET, "pmr": Amenity.ACCESSIBLE_PMR}
+)
+_register_labels(Amenity, _AMENITIES_BY_LABEL)
+_AMENITY_BITS = _BITS_BY_LABEL[Amenity]
+
+
+class CardFields(NamedTuple):
+    surface: Optional[tuple[float, float]] = None
+    occupations: Occupation = Occupation(0)
+    bed_count: Optional[int] = None
+    amenities: Amenity = Amenity(0)
+    postal_code: Optional[str] = None
+    city: Optional[str] = None
+
+
+def parse_address(address: str | None) -> tuple[Optional[str], Optional[str]]:
+    """Returns the postal code and city of an address, the last postal code of the address being used."""
+    matches = _POSTAL_CODE_PATTERN.findall(address or "")
+    if not matches:
+        return None, None
+    postal_code, city = matches[-1]
+    city = city.strip(" -").strip()
+    # Many accommodations share the same few cities
+    return sys.intern(postal_code), sys.intern(city) if city else None
+
+
+_COLOCATION = Occupation.COLOCATION.value
+
+
+def parse_card_fields(address: str | None, details: Iterable[str]) -> CardFields:
+    """Extracts the typed fields of a card from its address and its free text details."""
+    surface = None
+    occupations = 0
+    bed_count = None
+    amenities = 0
+
+    for detail in details:
+        detail = detail.strip()
+        if not detail:
+            continue
+        # As long as it is mentioned, e.g. "Colocation (3 places)", even next to the surface or the beds
+        if "colocation" in detail.casefold():
+            occupations |= _COLOCATION
+        if detail.endswith("m²"):
+            surface = surface or parse_range(detail)
+            continue
+        beds = _BEDS_PATTERN.findall(detail)
+        if beds:
+            bed_count = sum(int(count) for count in beds)
+            continue
+        for label in detail.split(","):
+            label = label.strip().casefold()
+            mode = _OCCUPATION_BITS.get(label)
+            if mode is not None:
+                occupations |= mode
+            else:
+                amenities |= _AMENITY_BITS.get(label, 0)
+
+    postal_code, city = parse_address(address)
+    return CardFields(surface, Occupation(occupations), bed_count, Amenity(amenities), postal_code, city)
@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, List
+
+from pydantic import ValidationError
+
+from src.models import UserConf
+from src.search_planner import plan_searches
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+YAML_SUFFIXES = (".yaml", ".yml")
+
+
+class _FileSource:
+    """Configurations stored in a JSON or YAML file: a list of entries, or a mapping with a `users` list."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def version(self) -> Any:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load_entries(self) -> List[Any]:
+        with open(self.path, encoding="utf-8") as f:
+            if self.path.endswith(YAML_SUFFIXES):
+                try:
+                    import yaml  # type: ignore
+                except ImportError:
+                    raise RuntimeError(
+                        "PyYAML is needed to read YAML configurations, install it with: pip install pyyaml"
+                    )
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+
+        if isinstance(data, dict):
+            data = data.get("users")
+        if data is None:
+            return []
+        if not isinstance(data, list):
+            raise ValueError(f"{self.path} should hold a list of configurations")
+        return data
+
+    def close(self) -> None:
+        pass
+
+
+class _SqliteSource:
+    """Configurations stored in a SQLite table indexed by telegram_id and search_url.
+
+    Every other field of the configuration is stored as JSON, so that new
+    `UserConf` fields do not need a schema migration.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS user_confs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telegram_id TEXT NOT NULL,
+                search_url TEXT NOT NULL,
+                conf TEXT NOT NULL DEFAULT '{}'
+            );
+            CREATE INDEX IF NOT EXISTS user_confs_telegram_id ON user_confs (telegram_id);
+            CREATE INDEX IF NOT EXISTS user_confs_search_url ON user_confs (search_url);
+            """
+        )
+        self._connection.commit()
+        self._local_changes = 0
+
+    def version(self) -> Any:
+        # data_version changes when another connection commits, local writes are counted apart
+        (data_version,) = self._connection.execute("PRAGMA data_version").fetchone()
+        return data_version, self._local_changes
+
+    def load_entries(self) -> List[Any]:
+        rows = self._connection.execute(
+            "SELECT telegram_id, search_url, conf FROM user_confs ORDER BY id"
+        ).fetchall()
+        return [
+            {**json.loads(conf), "telegram_id": telegram_id, "search_url": search_url}
+            for telegram_id, search_url, conf in rows
+        ]
+
+    def add(self, conf: UserConf) -> None:
+        fields = conf.model_dump(mode="json", exclude={"telegram_id", "search_url"})
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO user_confs (telegram_id, search_url, conf) VALUES (?, ?, ?)",
+                (conf.telegram_id, str(conf.search_url), json.dumps(fields)),
+            )
+        self._local_changes += 1
+
+    def remove(self, telegram_id: str, search_url: str | None = None) -> int:
+        with self._connection:
+            if search_url is None:
+                cursor = self._connection.execute(
+                    "DELETE FROM user_confs WHERE telegram_id = ?", (telegram_id,)
+                )
+            else:
+                cursor = self._connection.execute(
+                    "DELETE FROM user_confs WHERE telegram_id = ? AND search_url = ?",
+                    (telegram_id, search_url),
+                )
+        self._local_changes += 1
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class ConfigStore:
+    """Users configurations loaded from a JSON/YAML file or a SQLite database, and reloaded when they change.
+
+    Entries are validated with `UserConf`: invalid entries are skipped, and if
+    the source cannot be read at all (e.g. a file being edited), the previous
+    configurations are kept. Configurations are indexed by Telegram id and by
+    normalized search URL.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._source = _SqliteSource(path) if path.endswith(SQLITE_SUFFIXES) else _FileSource(path)
+        self._version: Any = object()
+
+        self.confs: List[UserConf] = []
+        self.by_telegram_id: dict[str, List[UserConf]] = {}
+        # Normalized search URL -> configurations, as returned by plan_searches
+        self.by_search_url: dict[str, List[UserConf]] = {}
+
+        self.reload_if_changed()
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the configurations if the source changed since the last load. Returns whether they were reloaded."""
+        version = self._source.version()
+        if version == self._version:
+            return False
+        self._version = version
+
+        try:
+            entries = self._source.load_entries()
+        except Exception:
+            logger.exception(f"Could not load the configurations from {self.path}, keeping the previous ones")
+            return False
+
+        confs: List[UserConf] = []
+        for i, entry in enumerate(entries):
+            try:
+                confs.append(UserConf.model_validate(entry))
+            except ValidationError as e:
+                logger.warning(f"Skipping invalid configuration #{i} of {self.path}: {e}")
+
+        self._set_confs(confs)
+        logger.info(
+            f"Loaded {len(confs)} configurations for {len(self.by_telegram_id)} users "
+            f"and {len(self.by_search_url)} searches from {self.path}"
+        )
+        return True
+
+    def _set_confs(self, confs: List[UserConf]) -> None:
+        by_telegram_id: dict[str, List[UserConf]] = {}
+        for conf in confs:
+            by_telegram_id.setdefault(conf.telegram_id, []).append(conf)
+
+        self.confs = confs
+        self.by_telegram_id = by_telegram_id
+        self.by_search_url = plan_searches(confs)
+
+    def add(self, conf: UserConf) -> None:
+        """Adds a configuration (SQLite stores only)."""
+        if not isinstance(self._source, _SqliteSource):
+            raise TypeError("Only SQLite configuration stores can be modified")
+        self._source.add(conf)
+        self.reload_if_changed()
+
+    def remove(self, telegram_id: str, search_url: str | None = None) -> int:
+        """Removes the configurations of a user, or only the one of a search (SQLite stores only)."""
+        if not isinstance(self._source, _SqliteSource):
+            raise TypeError("Only SQLite configuration stores can be modified")
+        removed = self._source.remove(telegram_id, search_url)
+        self.reload_if_changed()
+        return removed
+
+    def close(self) -> None:
+        self._source.close()
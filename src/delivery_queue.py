@@ -0,0 +1,438 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import List
+
+from src.metrics import metrics
+from src.models import Notification
+from src.telegram_notifier import Notifier
+
+logger = logging.getLogger(__name__)
+
+# Maximum length of the text of a Telegram message
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+# Telegram answers these codes for requests that will never succeed (bad request, bot blocked, ...)
+PERMANENT_ERROR_CODES = {400, 401, 403, 404}
+
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_MESSAGE_LENGTH) -> List[str]:
+    """Splits a message into chunks of at most `limit` characters.
+
+    Chunks are cut between paragraphs when possible, then between lines, so that
+    the HTML markup of each accommodation stays in one piece.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    chunks: List[str] = []
+    current = ""
+    for separator_level, piece in _pieces(text, limit):
+        candidate = f"{current}{separator_level}{piece}" if current else piece
+        if len(candidate) <= limit:
+            current = candidate
+        else:
+            chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _pieces(text: str, limit: int):
+    """Yields (separator, piece) pairs, each piece fitting within `limit`."""
+    for i, paragraph in enumerate(text.split("\n\n")):
+        paragraph_separator = "\n\n" if i else ""
+        if len(paragraph) <= limit:
+            yield paragraph_separator, paragraph
+            continue
+        for j, line in enumerate(paragraph.split("\n")):
+            line_separator = paragraph_separator if j == 0 else "\n"
+            # Last resort: hard cut of a single huge line
+            for k in range(0, max(len(line), 1), limit):
+                yield (line_separator if k == 0 else ""), line[k : k + limit]
+
+
+def _retry_after(error: Exception) -> float | None:
+    """Returns the delay requested by a Telegram 429 error, if any."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        data = getattr(error, "json", None)
+        if isinstance(data, dict):
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+    return float(retry_after) if retry_after is not None else None
+
+
+def _is_permanent(error: Exception) -> bool:
+    return getattr(error, "error_code", None) in PERMANENT_ERROR_CODES
+
+
+@dataclass
+class _PendingMessage:
+    id: int
+    chat_id: str
+    text: str
+    parse_mode: str
+    attempts: int
+    not_before: float
+    image_urls: List[str] = field(default_factory=list)
+    # Short message sent ahead of the full notification, which then replaces its text
+    alert: bool = False
+    # Id of the alert this message replaces, and the Telegram id of that alert once it is sent
+    edit_of: int | None = None
+    edit_message_id: int | None = None
+    # time.monotonic() at which the page that triggered the alert was received, for the latency metric
+    received_at: float | None = None
+
+
+class DeliveryQueue:
+    """Persistent outbound queue of Telegram messages, sent by a pool of background workers.
+
+    Messages are stored in SQLite until Telegram accepts them, so nothing is lost
+    on restart. Messages to the same chat are sent in order, at most one every
+    `per_chat_interval` seconds, and at most `global_per_second` messages are sent
+    per second overall. Failed sends are retried with exponential backoff, and
+    429 errors are retried after the delay requested by Telegram.
+
+    Alerts (`enqueue_alert`) are served before the messages of other chats, and
+    the notification that `replaces` an alert is sent as an edit of it.
+    """
+
+    def __init__(
+        self,
+        notifier: Notifier,
+        path: str,
+        workers: int = 2,
+        per_chat_interval: float = 1.0,
+        global_per_second: float = 25,
+        max_attempts: int = 8,
+        base_backoff: float = 2.0,
+    ):
+        self.notifier = notifier
+        self.path = path
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.global_per_second = global_per_second
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+
+        self._db_lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                parse_mode TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                image_urls TEXT NOT NULL DEFAULT '[]',
+                alert INTEGER NOT NULL DEFAULT 0,
+                edit_of INTEGER,
+                edit_message_id INTEGER
+            )
+            """
+        )
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(pending_messages)")}
+        # Queue created by an older version
+        for column, definition in [
+            ("image_urls", "TEXT NOT NULL DEFAULT '[]'"),
+            ("alert", "INTEGER NOT NULL DEFAULT 0"),
+            ("edit_of", "INTEGER"),
+            ("edit_message_id", "INTEGER"),
+        ]:
+            if column not in columns:
+                self._connection.execute(f"ALTER TABLE pending_messages ADD COLUMN {column} {definition}")
+        self._connection.commit()
+
+        self._cond = threading.Condition()
+        # chat id -> messages waiting to be sent to that chat, in order
+        self._chats: OrderedDict[str, deque[_PendingMessage]] = OrderedDict()
+        self._chat_next_send: dict[str, float] = {}
+        self._in_flight: set[str] = set()
+        # Id of each alert sent -> its Telegram message id, until the notification replacing it is queued
+        self._sent_alerts: dict[int, int] = {}
+        self._tokens = global_per_second
+        self._tokens_updated_at = time.monotonic()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+        self._load_pending()
+
+    def _load_pending(self) -> None:
+        with self._db_lock:
+            rows = self._connection.execute(
+                "SELECT id, chat_id, text, parse_mode, attempts, image_urls, alert, edit_of, edit_message_id "
+                "FROM pending_messages WHERE failed = 0 ORDER BY id"
+            ).fetchall()
+        for row_id, chat_id, text, parse_mode, attempts, image_urls, alert, edit_of, edit_message_id in rows:
+            self._chats.setdefault(chat_id, deque()).append(
+                _PendingMessage(
+                    row_id,
+                    chat_id,
+                    text,
+                    parse_mode,
+                    attempts,
+                    0,
+                    json.loads(image_urls),
+                    bool(alert),
+                    edit_of,
+                    edit_message_id,
+                )
+            )
+        if rows:
+            logger.info(f"Loaded {len(rows)} pending messages from {self.path}")
+
+    def enqueue(
+        self,
+        chat_id: str,
+        notification: Notification,
+        parse_mode: str = "HTML",
+        replaces: int | None = None,
+    ) -> None:
+        """Persists the notification (split if it is too long) and schedules its delivery.
+
+        The photos of the notification are sent with its last chunk. With `replaces`
+        (the id returned by `enqueue_alert`), the first chunk is sent as an edit of
+        that alert, or as a new message if the alert could not be sent.
+        """
+        chunks = split_message(notification.message)
+        chunk_images = [[] for _ in chunks[:-1]] + [list(notification.image_urls)]
+        edits_of = [replaces] + [None] * (len(chunks) - 1)
+        with self._db_lock:
+            with self._connection:
+                ids = [
+                    self._connection.execute(
+                        "INSERT INTO pending_messages (chat_id, text, parse_mode, image_urls, edit_of) VALUES (?, ?, ?, ?, ?)",
+                        (chat_id, chunk, parse_mode, json.dumps(images), edit_of),
+                    ).lastrowid
+                    for chunk, images, edit_of in zip(chunks, chunk_images, edits_of)
+                ]
+
+        with self._cond:
+            # The alert may already be sent
+            edit_message_id = self._sent_alerts.pop(replaces, None) if replaces is not None else None
+            queue = self._chats.setdefault(chat_id, deque())
+            for row_id, chunk, images, edit_of in zip(ids, chunks, chunk_images, edits_of):
+                queue.append(
+                    _PendingMessage(
+                        row_id, chat_id, chunk, parse_mode, 0, 0, images,  # type: ignore
+                        edit_of=edit_of,
+                        edit_message_id=edit_message_id if edit_of is not None else None,
+                    )
+                )
+            self._cond.notify_all()
+        if edit_message_id is not None:
+            self._save_edit_message_id(replaces, edit_message_id)  # type: ignore[arg-type]
+
+    def enqueue_alert(
+        self,
+        chat_id: str,
+        notification: Notification,
+        parse_mode: str = "HTML",
+        received_at: float | None = None,
+    ) -> int:
+        """Persists a short alert and schedules it before the messages of the other chats.
+
+        Returns its id, to be passed as `replaces` to `enqueue` along with the full
+        notification. `received_at` is the time.monotonic() at which the results
+        page behind the alert was received.
+        """
+        with self._db_lock:
+            with self._connection:
+                row_id = self._connection.execute(
+                    "INSERT INTO pending_messages (chat_id, text, parse_mode, alert) VALUES (?, ?, ?, 1)",
+                    (chat_id, notification.message, parse_mode),
+                ).lastrowid
+
+        with self._cond:
+            self._chats.setdefault(chat_id, deque()).append(
+                _PendingMessage(
+                    row_id, chat_id, notification.message, parse_mode, 0, 0, alert=True, received_at=received_at  # type: ignore
+                )
+            )
+            # Chats are served in turn from the front
+            self._chats.move_to_end(chat_id, last=False)
+            self._cond.notify_all()
+        return row_id  # type: ignore
+
+    def _save_edit_message_id(self, alert_id: int, message_id: int) -> None:
+        """Persists the Telegram message to edit by the queued message replacing the given alert."""
+        with self._db_lock:
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE pending_messages SET edit_message_id = ? WHERE edit_of = ?", (message_id, alert_id)
+                )
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return sum(len(queue) for queue in self._chats.values())
+
+    def start(self) -> None:
+        self._stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"delivery-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, drain_timeout: float = 0) -> None:
+        """Stops the workers, after waiting up to `drain_timeout` seconds for pending messages to be sent.
+
+        Messages that could not be sent stay on disk and are sent after the next start.
+        """
+        deadline = time.monotonic() + drain_timeout
+        while self.pending_count() and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+        remaining = self.pending_count()
+        if remaining:
+            logger.warning(f"{remaining} messages left in the delivery queue, they will be sent on restart")
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._connection.close()
+
+    def _refill_tokens(self, now: float) -> None:
+        elapsed = now - self._tokens_updated_at
+        self._tokens = min(self.global_per_second, self._tokens + elapsed * self.global_per_second)
+        self._tokens_updated_at = now
+
+    def _next_message(self) -> _PendingMessage | None:
+        """Waits for a message that can be sent now, and reserves its chat. Returns None when stopping."""
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                self._refill_tokens(now)
+
+                wake_at: float | None = None
+                for chat_id, queue in self._chats.items():
+                    if not queue or chat_id in self._in_flight:
+                        continue
+                    ready_at = max(queue[0].not_before, self._chat_next_send.get(chat_id, 0))
+                    if ready_at <= now and self._tokens >= 1:
+                        self._tokens -= 1
+                        self._in_flight.add(chat_id)
+                        # Move the chat to the end, so that chats are served in turn
+                        self._chats.move_to_end(chat_id)
+                        return queue[0]
+                    if self._tokens < 1:
+                        ready_at = max(ready_at, now + (1 - self._tokens) / self.global_per_second)
+                    wake_at = ready_at if wake_at is None else min(wake_at, ready_at)
+
+                self._cond.wait(timeout=None if wake_at is None else max(0.0, wake_at - now))
+            return None
+
+    def _work(self) -> None:
+        while True:
+            message = self._next_message()
+            if message is None:
+                return
+
+            notification = Notification(message=message.text, image_urls=message.image_urls)
+            try:
+                with metrics.timer("crous_notification_send_seconds"):
+                    if message.edit_message_id is not None:
+                        self.notifier.edit_notification(
+                            message.chat_id, message.edit_message_id, notification, parse_mode=message.parse_mode
+                        )
+                        message_id = message.edit_message_id
+                    else:
+                        message_id = self.notifier.send_notification(
+                            message.chat_id, notification, parse_mode=message.parse_mode
+                        )
+            except Exception as e:
+                self._handle_failure(message, e)
+            else:
+                self._handle_success(message, message_id)
+
+    def _handle_success(self, message: _PendingMessage, message_id: int | None = None) -> None:
+        if message.alert:
+            if message.received_at is not None:
+                metrics.observe("crous_time_to_first_alert_seconds", time.monotonic() - message.received_at)
+            if message_id is not None:
+                self._on_alert_sent(message, message_id)
+
+        with self._db_lock:
+            with self._connection:
+                self._connection.execute("DELETE FROM pending_messages WHERE id = ?", (message.id,))
+
+        with self._cond:
+            self._chats[message.chat_id].popleft()
+            self._chat_next_send[message.chat_id] = time.monotonic() + self.per_chat_interval
+            self._in_flight.discard(message.chat_id)
+            self._cond.notify_all()
+
+    def _on_alert_sent(self, alert: _PendingMessage, message_id: int) -> None:
+        # The alert is still at the front of its chat queue: its replacement cannot be sent meanwhile
+        with self._cond:
+            replacements = [m for m in self._chats.get(alert.chat_id, ()) if m.edit_of == alert.id]
+            if not replacements:
+                # The notification replacing it is not queued yet
+                self._sent_alerts[alert.id] = message_id
+                return
+            for message in replacements:
+                message.edit_message_id = message_id
+        self._save_edit_message_id(alert.id, message_id)
+
+    def _handle_failure(self, message: _PendingMessage, error: Exception) -> None:
+        if message.edit_message_id is not None and _is_permanent(error):
+            # The alert cannot be edited (e.g. it was deleted): send the notification as a new message
+            logger.warning(f"Could not edit the alert sent to {message.chat_id} ({error}), sending a new message")
+            message.edit_message_id = None
+            with self._db_lock:
+                with self._connection:
+                    self._connection.execute(
+                        "UPDATE pending_messages SET edit_message_id = NULL WHERE id = ?", (message.id,)
+                    )
+            with self._cond:
+                self._in_flight.discard(message.chat_id)
+                self._cond.notify_all()
+            return
+
+        message.attempts += 1
+        retry_after = _retry_after(error)
+        give_up = _is_permanent(error) or message.attempts >= self.max_attempts
+
+        if give_up:
+            logger.error(
+                f"Giving up sending a message to {message.chat_id} after {message.attempts} attempts: {error}"
+            )
+        elif retry_after is not None:
+            logger.warning(f"Rate limited by Telegram, retrying in {retry_after:.0f}s")
+            message.not_before = time.monotonic() + retry_after
+        else:
+            delay = self.base_backoff * 2 ** (message.attempts - 1)
+            logger.warning(f"Could not send a message to {message.chat_id} ({error}), retrying in {delay:.0f}s")
+            message.not_before = time.monotonic() + delay
+
+        with self._db_lock:
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE pending_messages SET attempts = ?, failed = ? WHERE id = ?",
+                    (message.attempts, int(give_up), message.id),
+                )
+
+        with self._cond:
+            if give_up:
+                self._chats[message.chat_id].popleft()
+            if retry_after is not None:
+                # The whole bot is being rate limited, not only this chat
+                self._tokens = min(self._tokens, 0) - retry_after * self.global_per_second
+            self._in_flight.discard(message.chat_id)
+            self._cond.notify_all()
@@ -0,0 +1,249 @@
+"""Enrichment of newly seen accommodations with the fields of their detail page.
+
+Cards only give a summary: the exact floor area, rent and availability date are
+on `/tools/42/accommodations/{id}`. Detail pages are fetched concurrently by a
+bounded pool, only for accommodations not already in the on-disk cache, so each
+page is fetched once as long as its cache entry lives.
+"""
+
+import html as html_lib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Callable, Iterable, List, Optional
+
+from src.http_fetcher import HttpFetcher
+from src.metrics import metrics
+from src.models import Accommodation, AccommodationDetails
+from src.rate_limiter import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+_NUMBER = r"(\d[\d\s\u00a0\u202f]*(?:[.,]\d+)?)"
+_TAG_RE = re.compile(r"<[^>]+>")
+_SURFACE_RE = re.compile(rf"(?:Surface|Superficie)\s*:?\s*{_NUMBER}\s*m²", re.IGNORECASE)
+_RENT_RE = re.compile(rf"(?:Loyer|Redevance)[^:\d]*:?\s*{_NUMBER}\s*€", re.IGNORECASE)
+_AVAILABLE_RE = re.compile(
+    r"Disponible\s+(?:à\s+partir\s+du|dès\s+le|le|au)\s+(\d{1,2}/\d{1,2}/\d{4})", re.IGNORECASE
+)
+_LATITUDE_RE = re.compile(r"data-lat(?:itude)?=\"(-?\d+(?:\.\d+)?)\"")
+_LONGITUDE_RE = re.compile(r"data-(?:lng|lon|longitude)=\"(-?\d+(?:\.\d+)?)\"")
+
+
+def _parse_number(text: str) -> Optional[float]:
+    try:
+        return float(re.sub(r"[\s\u00a0\u202f]", "", text).replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _search_number(pattern: re.Pattern, text: str) -> Optional[float]:
+    match = pattern.search(text)
+    return _parse_number(match.group(1)) if match else None
+
+
+def _parse_date(text: str) -> Optional[date]:
+    try:
+        return datetime.strptime(text, "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+
+def parse_detail_page(html: str) -> Optional[AccommodationDetails]:
+    """Extracts the fields of an accommodation detail page, None if none of them could be found.
+
+    The page is not documented: each field is looked up on its own in the text of
+    the page, and is left empty when it is missing.
+    """
+    text = html_lib.unescape(_TAG_RE.sub(" ", html))
+    available = _AVAILABLE_RE.search(text)
+    details = AccommodationDetails(
+        surface=_search_number(_SURFACE_RE, text),
+        rent=_search_number(_RENT_RE, text),
+        available_from=_parse_date(available.group(1)) if available else None,
+        latitude=_search_number(_LATITUDE_RE, html),
+        longitude=_search_number(_LONGITUDE_RE, html),
+    )
+    if details == AccommodationDetails():
+        return None
+    return details
+
+
+class DetailCache:
+    """On-disk (SQLite) LRU cache of the details of each accommodation, by id.
+
+    Entries expire `ttl_seconds` after the page was fetched, and the least
+    recently used entries are evicted beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS accommodation_details (
+                accommodation_id INTEGER PRIMARY KEY,
+                details TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS accommodation_details_used_at ON accommodation_details (used_at)"
+        )
+        self._connection.commit()
+
+    def get_many(self, accommodation_ids: Iterable[int]) -> dict[int, AccommodationDetails]:
+        """Returns the live details of the given accommodations, marking them as used."""
+        ids = list(accommodation_ids)
+        if not ids:
+            return {}
+
+        now = self.clock()
+        threshold = now - self.ttl_seconds if self.ttl_seconds is not None else float("-inf")
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            with self._connection:
+                rows = self._connection.execute(
+                    f"SELECT accommodation_id, details FROM accommodation_details "
+                    f"WHERE accommodation_id IN ({placeholders}) AND fetched_at >= ?",
+                    (*ids, threshold),
+                ).fetchall()
+                self._connection.executemany(
+                    "UPDATE accommodation_details SET used_at = ? WHERE accommodation_id = ?",
+                    [(now, accommodation_id) for accommodation_id, _ in rows],
+                )
+        return {
+            accommodation_id: AccommodationDetails.model_validate_json(details)
+            for accommodation_id, details in rows
+        }
+
+    def put_many(self, details: dict[int, AccommodationDetails]) -> None:
+        if not details:
+            return
+
+        now = self.clock()
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    """
+                    INSERT INTO accommodation_details (accommodation_id, details, fetched_at, used_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (accommodation_id)
+                    DO UPDATE SET details = excluded.details, fetched_at = excluded.fetched_at, used_at = excluded.used_at
+                    """,
+                    [(i, d.model_dump_json(), now, now) for i, d in details.items()],
+                )
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        if self.ttl_seconds is not None:
+            self._connection.execute(
+                "DELETE FROM accommodation_details WHERE fetched_at < ?", (now - self.ttl_seconds,)
+            )
+        if self.max_entries is not None:
+            self._connection.execute(
+                """
+                DELETE FROM accommodation_details WHERE accommodation_id IN (
+                    SELECT accommodation_id FROM accommodation_details ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM accommodation_details").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class DetailEnricher:
+    """Attaches the details of their detail page to accommodations, fetching at most `max_workers` pages at once."""
+
+    def __init__(
+        self,
+        http_fetcher: HttpFetcher,
+        cache: DetailCache,
+        base_url: str,
+        max_workers: int = 4,
+        rate_limiter: HostRateLimiter | None = None,
+    ):
+        self.http_fetcher = http_fetcher
+        self.cache = cache
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="details")
+
+    def detail_url(self, accommodation_id: int) -> str:
+        return f"{self.base_url}/tools/42/accommodations/{accommodation_id}"
+
+    def enrich(self, accommodations: List[Accommodation]) -> List[Accommodation]:
+        """Returns copies of the accommodations with their details, when they could be found.
+
+        Only the pages of accommodations missing from the cache are fetched.
+        """
+        ids = {a.id for a in accommodations if a.id is not None and a.details is None}
+        if not ids:
+            return accommodations
+
+        details = self.cache.get_many(ids)
+        missing = sorted(ids - details.keys())
+        metrics.inc("crous_detail_cache_hits_total", len(details))
+        if missing:
+            fetched = {
+                accommodation_id: result
+                for accommodation_id, result in zip(missing, self._executor.map(self._fetch, missing))
+                if result is not None
+            }
+            self.cache.put_many(fetched)
+            details.update(fetched)
+
+        return [_with_details(a, details.get(a.id)) if a.id is not None else a for a in accommodations]
+
+    def _fetch(self, accommodation_id: int) -> Optional[AccommodationDetails]:
+        url = self.detail_url(accommodation_id)
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(url)
+        with metrics.timer("crous_detail_fetch_seconds") as labels:
+            response = self.http_fetcher.fetch_html(url)
+            if response is None:
+                labels["outcome"] = "error"
+                return None
+            details = parse_detail_page(response.text)
+            if details is None:
+                labels["outcome"] = "miss"
+                logger.warning(f"No details found on the page of accommodation {accommodation_id}")
+            return details
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _with_details(accommodation: Accommodation, details: Optional[AccommodationDetails]) -> Accommodation:
+    if details is None:
+        return accommodation
+    update: dict = {"details": details}
+    # Also locates accommodations whose card has no coordinates
+    if accommodation.latitude is None and details.latitude is not None and details.longitude is not None:
+        update.update(latitude=details.latitude, longitude=details.longitude)
+    return accommodation.model_copy(update=update)
@@ -0,0 +1,204 @@
+import logging
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+from src.card_fields import Amenity, Occupation, parse_range
+from src.models import Accommodation, UserConf
+
+logger = logging.getLogger(__name__)
+
+
+class AccommodationFeatures(NamedTuple):
+    """Filterable values of an accommodation: its price bounds, and the typed fields parsed with its card.
+
+    Flags are plain ints, operations on enum members being much slower.
+    """
+
+    price: Optional[tuple[float, float]]
+    surface: Optional[tuple[float, float]]
+    occupations: int
+    amenities: int
+
+
+def extract_features(accommodation: Accommodation) -> AccommodationFeatures:
+    return AccommodationFeatures(
+        price=parse_range(accommodation.price),
+        surface=accommodation.surface,
+        occupations=accommodation.occupations.value,
+        amenities=accommodation.amenities.value,
+    )
+
+
+def _format_number(value: float) -> str:
+    return f"{value:g}".replace(".", ",")
+
+
+@dataclass(frozen=True)
+class CompiledFilter:
+    """Predicate of a configuration, with its criteria normalized once.
+
+    Ranges match when they overlap the bounds: "de 418,4 à 481,2 €" matches a
+    maximum price of 450 €. When a bound is set, accommodations whose value is
+    unknown do not match.
+    """
+
+    is_colocative: bool = False
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_surface: Optional[float] = None
+    max_surface: Optional[float] = None
+    occupations: Occupation = Occupation(0)
+    amenities: Amenity = Amenity(0)
+    # Required amenities without a flag, looked up in the overview details
+    other_amenities: frozenset[str] = frozenset()
+    ignored_ids: frozenset[int] = frozenset()
+
+    @classmethod
+    def from_conf(cls, conf: UserConf) -> "CompiledFilter":
+        for mode in conf.occupation_modes:
+            if Occupation.parse(mode) is None:
+                logger.warning(f"Unknown occupation mode {mode!r} in configuration {conf.conf_title!r}")
+        return cls(
+            is_colocative=conf.is_colocative,
+            min_price=conf.min_price,
+            max_price=conf.max_price,
+            min_surface=conf.min_surface,
+            max_surface=conf.max_surface,
+            occupations=Occupation.from_labels(conf.occupation_modes),
+            amenities=Amenity.from_labels(conf.required_amenities),
+            other_amenities=frozenset(
+                amenity.strip().casefold()
+                for amenity in conf.required_amenities
+                if Amenity.parse(amenity) is None
+            ),
+            ignored_ids=frozenset(conf.ignored_ids),
+        )
+
+    def matches(self, accommodation: Accommodation, features: AccommodationFeatures) -> bool:
+        return (
+            accommodation.is_colocative == self.is_colocative
+            and (self.max_price is None or (features.price is not None and features.price[0] <= self.max_price))
+            and self._matches_details(accommodation, features)
+        )
+
+    def _matches_details(self, accommodation: Accommodation, features: AccommodationFeatures) -> bool:
+        """Checks every criterion but colocation and the maximum price, which the batch index already applied."""
+        if accommodation.id in self.ignored_ids:
+            return False
+        if self.min_price is not None and (features.price is None or features.price[1] < self.min_price):
+            return False
+        if self.min_surface is not None or self.max_surface is not None:
+            if features.surface is None:
+                return False
+            if self.min_surface is not None and features.surface[1] < self.min_surface:
+                return False
+            if self.max_surface is not None and features.surface[0] > self.max_surface:
+                return False
+        if self.occupations and not self.occupations.value & features.occupations:
+            return False
+        if self.amenities.value & ~features.amenities:
+            return False
+        if self.other_amenities:
+            details = (accommodation.overview_details or "").casefold()
+            return all(amenity in details for amenity in self.other_amenities)
+        return True
+
+    def describe(self) -> str:
+        """Returns a short French description of the criteria, for notifications."""
+        parts = []
+        if self.min_price is not None:
+            parts.append(f"prix min = {_format_number(self.min_price)}€")
+        if self.max_price is not None:
+            parts.append(f"prix max = {_format_number(self.max_price)}€")
+        if self.min_surface is not None:
+            parts.append(f"surface min = {_format_number(self.min_surface)} m²")
+        if self.max_surface is not None:
+            parts.append(f"surface max = {_format_number(self.max_surface)} m²")
+        if self.occupations:
+            parts.append(f"occupation = {' ou '.join(self.occupations.labels())}")
+        if self.amenities or self.other_amenities:
+            amenities = self.amenities.labels() + sorted(self.other_amenities)
+            parts.append(f"équipements = {', '.join(amenities)}")
+        parts.append(f"colocation = {'oui' if self.is_colocative else 'non'}")
+        return ", ".join(parts)
+
+
+class _Group:
+    """Accommodations sharing the same `is_colocative` value, also sorted by minimum price."""
+
+    def __init__(self) -> None:
+        self.positions: List[int] = []
+        self._priced: List[tuple[float, int]] = []
+        self.prices: List[float] = []
+        self.positions_by_price: List[int] = []
+
+    def add(self, position: int, features: AccommodationFeatures) -> None:
+        self.positions.append(position)
+        if features.price is not None:
+            self._priced.append((features.price[0], position))
+
+    def freeze(self) -> None:
+        self._priced.sort()
+        self.prices = [price for price, _ in self._priced]
+        self.positions_by_price = [position for _, position in self._priced]
+
+
+class FilterEngine:
+    """Evaluates the filters of many configurations against a batch of accommodations.
+
+    Each configuration is compiled once into a `CompiledFilter`, and configurations
+    sharing the same criteria are evaluated once. The price of each accommodation
+    is parsed once per batch, and accommodations are indexed by colocation and price
+    so that a filter only looks at the accommodations under its maximum price.
+    """
+
+    def __init__(self) -> None:
+        # id(conf) -> (conf, compiled filter); the conf is kept to detect reused ids
+        self._compiled: dict[int, tuple[UserConf, CompiledFilter]] = {}
+
+    def compile(self, conf: UserConf) -> CompiledFilter:
+        cached = self._compiled.get(id(conf))
+        if cached is not None and cached[0] is conf:
+            return cached[1]
+        compiled = CompiledFilter.from_conf(conf)
+        self._compiled[id(conf)] = (conf, compiled)
+        return compiled
+
+    def forget_others(self, confs: Iterable[UserConf]) -> None:
+        """Drops the compiled filters of configurations that are not listed anymore (e.g. after a reload)."""
+        keep = {id(conf) for conf in confs}
+        for key in [key for key in self._compiled if key not in keep]:
+            del self._compiled[key]
+
+    def filter_batch(
+        self, accommodations: Sequence[Accommodation], confs: Sequence[UserConf]
+    ) -> List[List[Accommodation]]:
+        """Returns, for each configuration, the accommodations it matches, in their original order."""
+        compiled_filters = [self.compile(conf) for conf in confs]
+        features = [extract_features(accommodation) for accommodation in accommodations]
+        groups: dict[bool | None, _Group] = {}
+        for position, accommodation in enumerate(accommodations):
+            groups.setdefault(accommodation.is_colocative, _Group()).add(position, features[position])
+        for group in groups.values():
+            group.freeze()
+
+        results: dict[CompiledFilter, List[Accommodation]] = {}
+        matched: List[List[Accommodation]] = []
+        for compiled in compiled_filters:
+            if compiled not in results:
+                results[compiled] = [
+                    accommodations[i]
+                    for i in self._candidates(groups.get(compiled.is_colocative), compiled)
+                    if compiled._matches_details(accommodations[i], features[i])
+                ]
+            matched.append(results[compiled])
+        return matched
+
+    @staticmethod
+    def _candidates(group: _Group | None, compiled: CompiledFilter) -> List[int]:
+        if group is None:
+            return []
+        if compiled.max_price is None:
+            return group.positions
+        return sorted(group.positions_by_price[: bisect_right(group.prices, compiled.max_price)])
@@ -0,0 +1,137 @@
+import logging
+import threading
+from typing import TYPE_CHECKING, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+logger = logging.getLogger(__name__)
+
+
+class HttpFetcher:
+    """Fetches CROUS pages with pooled `requests.Session`s reusing the cookies of an authenticated WebDriver.
+
+    Each thread gets its own session (sessions are not thread-safe), all of them
+    sharing the cookies loaded from the browser.
+    """
+
+    def __init__(self, timeout: float = 15, pool_size: int = 10):
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self._lock = threading.Lock()
+        self._cookies = requests.cookies.RequestsCookieJar()
+        self._headers: dict[str, str] = {}
+        # Bumped every time cookies are loaded, so that thread sessions know when to resync
+        self._generation = 0
+        self._local = threading.local()
+        self._sessions: list[requests.Session] = []
+
+    @property
+    def has_cookies(self) -> bool:
+        return len(self._cookies) > 0
+
+    @property
+    def session(self) -> requests.Session:
+        """Returns the session of the current thread, synced with the latest cookies."""
+        session: requests.Session | None = getattr(self._local, "session", None)
+        if session is None:
+            session = self._create_session()
+            self._local.session = session
+            self._local.generation = -1
+            with self._lock:
+                self._sessions.append(session)
+
+        if self._local.generation != self._generation:
+            with self._lock:
+                session.cookies.clear()
+                session.cookies.update(self._cookies)
+                session.headers.update(self._headers)
+                self._local.generation = self._generation
+
+        return session
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(total=2, connect=2, read=0, backoff_factor=0.5),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def load_cookies(self, driver: "WebDriver") -> None:
+        """Copies the cookies and user agent of the given (authenticated) WebDriver into the HTTP sessions."""
+        cookies = requests.cookies.RequestsCookieJar()
+        for cookie in driver.get_cookies():
+            cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain"),
+                path=cookie.get("path", "/"),
+            )
+
+        headers = {}
+        try:
+            user_agent = driver.execute_script("return navigator.userAgent;")
+            if user_agent:
+                headers["User-Agent"] = user_agent
+        except Exception:
+            logger.debug("Could not read the browser user agent", exc_info=True)
+
+        with self._lock:
+            self._cookies = cookies
+            self._headers = headers
+            self._generation += 1
+
+        logger.info(f"Loaded {len(cookies)} cookies from the browser session")
+
+    def fetch_html(self, url: str, headers: dict[str, str] | None = None) -> requests.Response | None:
+        """GETs the given page. Returns None on network errors or non-200 responses.
+
+        With conditional `headers` (If-None-Match, If-Modified-Since), a 304 response is returned as well.
+        """
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+        except requests.RequestException as e:
+            logger.warning(f"HTTP fetch of {url} failed: {e}")
+            return None
+
+        if response.status_code == 304 and headers:
+            return response
+        if response.status_code != 200:
+            logger.warning(f"HTTP fetch of {url} returned status {response.status_code}")
+            return None
+
+        return response
+
+    def post(self, url: str, payload: dict[str, Any]) -> requests.Response | None:
+        """POSTs a JSON payload expecting a JSON response. Returns None on network errors or non-200 responses."""
+        try:
+            response = self.session.post(
+                url,
+                json=payload,
+                timeout=self.timeout,
+                headers={"Accept": "application/json"},
+            )
+        except requests.RequestException as e:
+            logger.warning(f"HTTP POST to {url} failed: {e}")
+            return None
+
+        if response.status_code != 200:
+            logger.warning(f"HTTP POST to {url} returned status {response.status_code}")
+            return None
+
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
@@ -0,0 +1,92 @@
+"""lxml parser backend, several times faster than BeautifulSoup on large result pages.
+
+The page is parsed once, and cards are extracted with precompiled XPath expressions
+selecting exactly the same elements as the BeautifulSoup backend, so both backends
+return the same `Accommodation` objects.
+"""
+
+from typing import List
+
+from lxml import etree, html as lxml_html
+
+from src.models import Accommodation
+from src.parser import (
+    RESULTS_HEADING_CLASS,
+    ParsedPage,
+    _parse_price_text,
+    build_accommodation,
+    parse_accommodations_count,
+    parse_page_count,
+)
+
+
+def _has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+_RESULTS_HEADING = etree.XPath(
+    f"(//h2[normalize-space(@class) = '{RESULTS_HEADING_CLASS}'])[1]"
+)
+_FIRST_PRICE_BADGE = etree.XPath(f"(//p[{_has_class('fr-badge')}])[1]")
+_PAGINATION_HREFS = etree.XPath(f"//nav[{_has_class('fr-pagination')}]//a/@href")
+_CARDS = etree.XPath(f"//div[{_has_class('fr-card')}]")
+
+_CARD_TITLE = etree.XPath(f"(.//h3[{_has_class('fr-card__title')}])[1]")
+_TITLE_URL = etree.XPath("(.//a)[1]/@href")
+_CARD_IMAGE_URL = etree.XPath(f"(.//img[{_has_class('fr-responsive-img')}])[1]/@src")
+_CARD_ADDRESS = etree.XPath(f"(.//p[{_has_class('fr-card__desc')}])[1]")
+_CARD_DETAILS = etree.XPath(f".//p[{_has_class('fr-card__detail')}]")
+_CARD_PRICE = etree.XPath(f"(.//p[{_has_class('fr-badge')}])[1]")
+
+
+def _first(elements: list):
+    return elements[0] if elements else None
+
+
+def _text(element) -> str:
+    return element.text_content()
+
+
+def parse_card(card) -> Accommodation | None:
+    title_card = _first(_CARD_TITLE(card))
+    if title_card is None:
+        return None
+
+    address = _first(_CARD_ADDRESS(card))
+    price = _first(_CARD_PRICE(card))
+
+    return build_accommodation(
+        title=_text(title_card).strip(),
+        url=_first(_TITLE_URL(title_card)),
+        image_url=_first(_CARD_IMAGE_URL(card)),
+        address=_text(address).strip() if address is not None else None,
+        details=[_text(detail).strip() for detail in _CARD_DETAILS(card)],
+        price=_parse_price_text(_text(price)) if price is not None else None,
+    )
+
+
+class LxmlPageParser:
+    """Parser backend based on lxml and precompiled XPath expressions."""
+
+    def parse(self, html: str) -> ParsedPage:
+        document = lxml_html.fromstring(html)
+
+        results_heading = _first(_RESULTS_HEADING(document))
+        if results_heading is None:
+            return ParsedPage(False, None, [])
+
+        price_badge = _first(_FIRST_PRICE_BADGE(document))
+        count = parse_accommodations_count(
+            _text(results_heading),
+            _text(price_badge) if price_badge is not None else None,
+        )
+
+        accommodations: List[Accommodation] = []
+        for card in _CARDS(document):
+            accommodation = parse_card(card)
+            if accommodation:
+                accommodations.append(accommodation)
+
+        return ParsedPage(
+            True, count, accommodations, parse_page_count(_PAGINATION_HREFS(document))
+        )
@@ -0,0 +1,208 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (in seconds) of the histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Metric name -> (type, help)
+METRICS: Dict[str, Tuple[str, str]] = {
+    "crous_driver_start_seconds": ("histogram", "Time to start a browser"),
+    "crous_authentication_seconds": ("histogram", "Time to log in to MSE, by outcome"),
+    "crous_wait_seconds": ("histogram", "Time spent in each named browser wait, by step and outcome"),
+    "crous_page_fetch_seconds": ("histogram", "Time to fetch one search results page, by backend and outcome"),
+    "crous_page_parse_seconds": ("histogram", "Time to parse one search results page, by backend"),
+    "crous_unchanged_pages_total": ("counter", "Results pages not parsed again as their fingerprint did not change, by backend"),
+    "crous_unchanged_searches_total": ("counter", "Searches whose results did not change, skipping filtering and notifications"),
+    "crous_cards_parsed_total": ("counter", "Accommodations received from the search results pages"),
+    "crous_cards_announced_total": ("counter", "Accommodations announced by the search results headings"),
+    "crous_incomplete_searches_total": ("counter", "Searches whose received count differs from the announced one"),
+    "crous_unlocated_accommodations_total": ("counter", "Accommodations of a tile without coordinates, sent to all its configurations"),
+    "crous_detail_fetch_seconds": ("histogram", "Time to fetch and parse one accommodation detail page, by outcome"),
+    "crous_detail_cache_hits_total": ("counter", "Accommodation details found in the cache instead of being fetched"),
+    "crous_archive_seconds": ("histogram", "Time to archive the accommodations of one search"),
+    "crous_filter_seconds": ("histogram", "Time to filter the accommodations of one search for all its configurations"),
+    "crous_notification_build_seconds": ("histogram", "Time to build a notification"),
+    "crous_time_to_first_alert_seconds": ("histogram", "Time from a results page being received to the first alert about it being sent"),
+    "crous_notification_send_seconds": ("histogram", "Time to send one message to Telegram, by outcome"),
+    "crous_cycle_seconds": ("histogram", "Duration of a polling cycle"),
+    "crous_cycle_overruns_total": ("counter", "Polling cycles that took longer than the poll interval"),
+    "crous_component_restarts_total": ("counter", "Crashed runtime components restarted by the supervisor, by component"),
+    "crous_poll_interval_seconds": ("gauge", "Configured poll interval"),
+    "crous_last_cycle_seconds": ("gauge", "Duration of the last polling cycle"),
+    "crous_shard_searches": ("gauge", "Searches assigned to this worker, in sharded mode"),
+    "crous_shard_leader": ("gauge", "Whether this worker assigns the searches to the workers, in sharded mode"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms, rendered in the Prometheus text format.
+
+    Besides the cumulative values served to Prometheus, the registry keeps what
+    was observed since the last `end_cycle`, to write one summary per polling cycle.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        # Series key -> [count, sum] since the last end_cycle
+        self._cycle: Dict[Tuple[str, Labels], list] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Labels]:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            cycle = self._cycle.setdefault(key, [0, 0.0])
+            cycle[0] += 1
+            cycle[1] += value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+            cycle = self._cycle.setdefault(key, [0, 0.0])
+            cycle[0] += 1
+            cycle[1] += value
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[Dict[str, Any]]:
+        """Observes the duration of the block. Labels can be changed from inside the block (e.g. the outcome)."""
+        labels.setdefault("outcome", "ok")
+        start = time.perf_counter()
+        try:
+            yield labels
+        except BaseException:
+            if labels["outcome"] == "ok":
+                labels["outcome"] = "error"
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def end_cycle(self) -> Dict[str, Dict[str, float]]:
+        """Returns the count and sum of each series observed since the previous call."""
+        with self._lock:
+            cycle, self._cycle = self._cycle, {}
+        return {
+            _series_name(name, labels): {"count": count, "sum": round(total, 6)}
+            for (name, labels), (count, total) in sorted(cycle.items())
+        }
+
+    def render(self) -> str:
+        """Returns all the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.count, h.sum)) for key, h in self._histograms.items()
+            )
+
+        lines: list[str] = []
+        described: set[str] = set()
+
+        def describe(name: str, default_type: str) -> None:
+            if name in described:
+                return
+            described.add(name)
+            metric_type, help_text = METRICS.get(name, (default_type, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{_series_name(name, labels)} {value:g}")
+        for (name, labels), value in gauges:
+            describe(name, "gauge")
+            lines.append(f"{_series_name(name, labels)} {value:g}")
+        for (name, labels), (counts, count, total) in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{_series_name(name + '_bucket', labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{_series_name(name + '_bucket', labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{_series_name(name + '_sum', labels)} {total:g}")
+            lines.append(f"{_series_name(name + '_count', labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _series_name(name: str, labels: Labels) -> str:
+    if not labels:
+        return name
+    formatted = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels)
+    return f"{name}{{{formatted}}}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = MetricsRegistry()
+
+
+def start_metrics_server(
+    port: int, host: str = "127.0.0.1", registry: MetricsRegistry = metrics
+) -> ThreadingHTTPServer:
+    """Serves the metrics on http://host:port/metrics from a background thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def write_cycle_record(path: str, record: Dict[str, Any]) -> None:
+    """Appends one JSON line describing a polling cycle to `path`."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -1,7 +1,22 @@
+from datetime import date
 from typing import List, Optional
 
 from pydantic import Field, HttpUrl, BaseModel
 
+from src.card_fields import Amenity, Occupation
+
+
+class AccommodationDetails(BaseModel):
+    """Fields only found on the detail page of an accommodation (see `src.details`)."""
+
+    # Exact floor area, in m²
+    surface: Optional[float] = None
+    # Monthly rent, charges included, in euros
+    rent: Optional[float] = None
+    available_from: Optional[date] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
 
 class Accommodation(BaseModel):
     id: int | None
@@ -10,16 +25,32 @@ class Accommodation(BaseModel):
     overview_details: str | None = None
     image_url: HttpUrl | None = None
     is_colocative: bool | None = None
+    # Typed fields of the card, extracted once when it is parsed (see `src.card_fields`)
+    surface: Optional[tuple[float, float]] = None
+    occupations: Occupation = Occupation(0)
+    bed_count: Optional[int] = None
+    amenities: Amenity = Amenity(0)
+    postal_code: Optional[str] = None
+    city: Optional[str] = None
+    # Location of the residence, when the source gives it
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    # Fetched from the detail page of newly seen accommodations, when enrichment is enabled
+    details: Optional[AccommodationDetails] = None
 
 
 class SearchResults(BaseModel):
     search_url: HttpUrl
     count: Optional[tuple[int, Optional[float]]]
     accommodations: List[Accommodation]
+    # Every results page was the same as the last time it was fetched
+    unchanged: bool = False
 
 
 class Notification(BaseModel):
     message: str
+    # Photos sent along with the message, as a single album when possible
+    image_urls: List[str] = Field(default_factory=list)
 
 
 class UserConf(BaseModel):
@@ -27,5 +58,15 @@ class UserConf(BaseModel):
     telegram_id: str
     search_url: HttpUrl
     ignored_ids: List[int] = Field(default_factory=list)
+    min_price: Optional[float] = None
     max_price: Optional[float] = None
     is_colocative: bool = False
+    # Surface bounds, in m²
+    min_surface: Optional[float] = None
+    max_surface: Optional[float] = None
+    # Accepted occupation modes ("Individuel", "Couple", "Colocation"), any when empty
+    occupation_modes: List[str] = Field(default_factory=list)
+    # Amenities that must all be listed (e.g. "Frigo", "Balcon")
+    required_amenities: List[str] = Field(default_factory=list)
+    # Base polling interval of this configuration, defaults to POLL_INTERVAL_SECONDS
+    poll_interval_seconds: Optional[int] = None
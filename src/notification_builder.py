@@ -1,7 +1,9 @@
 import logging
 from html import escape as html_escape
-from src.models import Accommodation, Notification, SearchResults
-
+from src.bot_api_client import MEDIA_GROUP_MAX_SIZE
+from src.filters import CompiledFilter
+from src.models import Accommodation, AccommodationDetails, Notification, SearchResults
+from src.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
@@ -12,48 +14,22 @@ class NotificationBuilder:
     def __init__(
         self,
         notify_when_no_results: bool = False,
-        max_price_eur: float | None = None,
-        colocative: bool = False,
+        include_photos: bool = True,
     ):
         self.notify_when_no_results = notify_when_no_results
-        # Only send notifications for accommodations strictly cheaper than this value
-        # If None, no price filtering is applied
-        self.max_price_eur = max_price_eur
-        self.colocative = colocative
+        # Attach the photos of the accommodations, at most one album per notification
+        self.include_photos = include_photos
 
     def search_results_notification(
-        self, search_results: SearchResults
+        self,
+        search_results: SearchResults,
+        applied_filter: CompiledFilter | None = None,
     ) -> Notification | None:
-        accommodations = search_results.accommodations
+        """Builds the notification of (already filtered) search results.
 
-        # Apply price filter if enabled
-        if self.max_price_eur is not None:
-            before = len(accommodations)
-            filtered: list[Accommodation] = [
-                a
-                for a in accommodations
-                if isinstance(a.price, float) and a.price < float(self.max_price_eur)
-            ]
-            logger.debug(
-                "Price filter: kept %d/%d accommodations with price < %.2f",
-                len(filtered),
-                before,
-                self.max_price_eur,
-            )
-            accommodations = filtered
-
-        # Apply colocative filter if enabled
-        if self.colocative:
-            before = len(accommodations)
-            filtered: list[Accommodation] = [
-                a for a in accommodations if a.is_colocative
-            ]
-            logger.debug(
-                "Colocative filter: kept %d/%d colocative accommodations",
-                len(filtered),
-                before,
-            )
-            accommodations = filtered
+        `applied_filter` is only used to describe the filter in the message, filtering is done by `FilterEngine`.
+        """
+        accommodations = search_results.accommodations
 
         # Check if we should notify when no accommodations are found
         if not accommodations and not self.notify_when_no_results:
@@ -64,25 +40,18 @@ class NotificationBuilder:
         else:
             s = "s" if len(accommodations) > 1 else ""
             verb = "sont" if len(accommodations) > 1 else "est"
-            message = (
-                f"Bonne nouvelle ! {len(accommodations)} logement{s} {verb} disponible{s} :\n"
-                f"Filtre appliqué : prix max = {self.max_price_eur}€, colocation = {self.colocative}\n\n"
-            )
+            message = f"Bonne nouvelle ! {len(accommodations)} logement{s} {verb} disponible{s} :\n"
+            if applied_filter is not None:
+                message += f"Filtre appliqué : {applied_filter.describe()}\n"
+            message += "\n"
 
         def format_one_accommodation(accommodation: Accommodation) -> str:
-            title = accommodation.title or "Sans titre"
-            price_val = (
-                f"{accommodation.price}€"
-                if isinstance(accommodation.price, float)
-                else (accommodation.price or "")
-            )
-            title_html = html_escape(title)
-            price_html = html_escape(str(price_val))
-            link = (
-                f"https://trouverunlogement.lescrous.fr/tools/42/accommodations/{accommodation.id}"
-            )
-            # Use HTML to avoid Telegram Markdown entity parsing issues
-            return f"<a href=\"{link}\"><b>{title_html}</b></a> ({price_html})"
+            line = format_accommodation_link(accommodation)
+            if accommodation.details is not None:
+                details = format_details(accommodation.details)
+                if details:
+                    line += f"\n{html_escape(details)}"
+            return line
 
         message += "\n\n".join(map(format_one_accommodation, accommodations))
 
@@ -90,4 +59,51 @@ class NotificationBuilder:
             f"\n\n<a href=\"{search_results.search_url}\">{html_escape(str(search_results.search_url))}</a>"
         )
 
-        return Notification(message=message)
+        image_urls = (
+            [str(a.image_url) for a in accommodations if a.image_url is not None][
+                :MEDIA_GROUP_MAX_SIZE
+            ]
+            if self.include_photos
+            else []
+        )
+
+        return Notification(message=message, image_urls=image_urls)
+
+    def alert_notification(self, accommodation: Accommodation, details_pending: bool = True) -> Notification:
+        """Builds the short alert sent as soon as a new accommodation is found, before the full notification.
+
+        Without `details_pending`, the alert is final: no notification will replace it.
+        """
+        message = f"Nouveau logement : {format_accommodation_link(accommodation)}"
+        return Notification(message=f"{message}\nDétails à suivre…" if details_pending else message)
+
+
+def format_accommodation_link(accommodation: Accommodation) -> str:
+    """Returns the title of the accommodation linking to its page, followed by its price."""
+    title = accommodation.title or "Sans titre"
+    price_val = (
+        f"{accommodation.price}€"
+        if isinstance(accommodation.price, float)
+        else (accommodation.price or "")
+    )
+    title_html = html_escape(title)
+    price_html = html_escape(str(price_val))
+    link = f"{get_settings().CROUS_BASE_URL}/tools/42/accommodations/{accommodation.id}"
+    # Use HTML to avoid Telegram Markdown entity parsing issues
+    return f"<a href=\"{link}\"><b>{title_html}</b></a> ({price_html})"
+
+
+def _format_number(value: float) -> str:
+    return f"{value:g}".replace(".", ",")
+
+
+def format_details(details: AccommodationDetails) -> str:
+    """Returns the fields of a detail page on one line, e.g. "19 m² · loyer 393,46 € · disponible le 01/09/2026"."""
+    parts = []
+    if details.surface is not None:
+        parts.append(f"{_format_number(details.surface)} m²")
+    if details.rent is not None:
+        parts.append(f"loyer {_format_number(details.rent)} €")
+    if details.available_from is not None:
+        parts.append(f"disponible le {details.available_from:%d/%m/%Y}")
+    return " · ".join(parts)
@@ -0,0 +1,90 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Generic, NamedTuple, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Start and end markers of the region of a search page holding the results (heading, cards and pagination)
+RESULTS_REGION_START = "SearchResults-desktop"
+RESULTS_REGION_END = "</main>"
+
+
+def fingerprint(content: str | bytes) -> str:
+    """Returns a short hash of the given content."""
+    if isinstance(content, str):
+        content = content.encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def page_fingerprint(html: str) -> Optional[str]:
+    """Returns the fingerprint of the results region of a search page, or None if the page has no results heading.
+
+    The rest of the page (scripts, tokens, ...) can change on every request without
+    the results changing, so it is left out.
+    """
+    start = html.find(RESULTS_REGION_START)
+    if start == -1:
+        return None
+    end = html.find(RESULTS_REGION_END, start)
+    return fingerprint(html[start : end if end != -1 else len(html)])
+
+
+class CachedPage(NamedTuple, Generic[T]):
+    fingerprint: Optional[str]
+    # HTTP validators of the response, sent back with conditional requests
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content: T
+    stored_at: float
+
+
+class PageCache(Generic[T]):
+    """Last fingerprint and parsed content of each fetched page, so that unchanged pages are not parsed again.
+
+    Entries older than `max_age_seconds` are ignored, so that the whole pipeline
+    still runs from time to time even when nothing changes (e.g. to keep the seen
+    accommodations from expiring).
+    """
+
+    def __init__(
+        self,
+        max_age_seconds: float | None = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._pages: dict[str, CachedPage[T]] = {}
+
+    def get(self, key: str) -> Optional[CachedPage[T]]:
+        with self._lock:
+            cached = self._pages.get(key)
+        if cached is None:
+            return None
+        if self.max_age_seconds is not None and self.clock() - cached.stored_at > self.max_age_seconds:
+            return None
+        return cached
+
+    def match(self, key: str, page_fingerprint: Optional[str]) -> Optional[T]:
+        """Returns the cached content of the page if its fingerprint did not change, None otherwise."""
+        if page_fingerprint is None:
+            return None
+        cached = self.get(key)
+        if cached is None or cached.fingerprint != page_fingerprint:
+            return None
+        return cached.content
+
+    def put(
+        self,
+        key: str,
+        page_fingerprint: Optional[str],
+        content: T,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self._pages[key] = CachedPage(page_fingerprint, etag, last_modified, content, self.clock())
@@ -1,89 +1,563 @@
 import logging
-from time import sleep
-from typing import List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from math import ceil
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, NamedTuple, Optional, Protocol
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse, urlunparse
 from bs4 import BeautifulSoup
 from pydantic import HttpUrl
-from selenium.webdriver.remote.webdriver import WebDriver
 
+from src.card_fields import Occupation, parse_card_fields
+from src.http_fetcher import HttpFetcher
+from src.metrics import metrics
 from src.models import Accommodation, SearchResults
-from src.settings import Settings
+from src.page_cache import CachedPage, PageCache, fingerprint, page_fingerprint
+from src.rate_limiter import HostRateLimiter
+from src.search_api import build_search_payload, parse_search_api_response
+from src.session_manager import BrowserSession, SessionExpiredError
+from src.settings import get_settings
+from src.waits import timed_wait
 
-settings = Settings()
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
 
 logger = logging.getLogger(__name__)
 
+RESULTS_HEADING_CLASS = "SearchResults-desktop fr-h4 svelte-11sc5my"
+API_PAGE_SIZE = 24
+
+
+class ParsedPage(NamedTuple):
+    """Everything extracted from one search results page."""
+
+    has_results_heading: bool
+    count: Optional[tuple[int, Optional[float]]]
+    accommodations: List[Accommodation]
+    # Number of result pages according to the pagination bar, None if there is none
+    page_count: Optional[int] = None
+    # The page did not change since it was last fetched: it was not parsed again
+    unchanged: bool = False
+
+
+class PageParser(Protocol):
+    """A backend turning the HTML of a search results page into a `ParsedPage`."""
+
+    def parse(self, html: str) -> ParsedPage: ...
+
+
+# Called with the new accommodations of each changed page, and the time.monotonic() at which the page was received
+PageCallback = Callable[[List[Accommodation], float], None]
+
+
+class AccommodationStream:
+    """Iterable over the accommodations of a search, yielded page by page as they are fetched.
+
+    `count` is the number of accommodations announced by the first page. Once the
+    stream is exhausted, `received` holds the number of distinct accommodations
+    actually yielded, `complete` tells whether both match, and `unchanged` whether
+    every page was the same as when it was last fetched. `on_page` is called with
+    the accommodations of each page that changed, before they are yielded.
+    """
+
+    def __init__(
+        self,
+        search_url: str,
+        count: Optional[tuple[int, Optional[float]]],
+        pages: Iterator[ParsedPage],
+        on_page: PageCallback | None = None,
+    ):
+        self.search_url = search_url
+        self.count = count
+        self.received = 0
+        self.complete: bool | None = None
+        self.unchanged: bool | None = None
+        self._pages = pages
+        self._on_page = on_page
+
+    def __iter__(self) -> Iterator[Accommodation]:
+        # A listing can move from one page to another while pages are being fetched
+        seen_ids: set[int | None] = set()
+        unchanged = True
+        for page in self._pages:
+            received_at = time.monotonic()
+            unchanged = unchanged and page.unchanged
+            page_accommodations = []
+            for accommodation in page.accommodations:
+                if accommodation.id in seen_ids:
+                    continue
+                seen_ids.add(accommodation.id)
+                page_accommodations.append(accommodation)
+            self.received += len(page_accommodations)
+            if self._on_page is not None and not page.unchanged and page_accommodations:
+                self._on_page(page_accommodations, received_at)
+            yield from page_accommodations
+
+        expected = self.count[0] if self.count else None
+        self.complete = expected is None or expected == self.received
+        self.unchanged = unchanged
+        metrics.inc("crous_cards_parsed_total", self.received)
+        if expected is not None:
+            metrics.inc("crous_cards_announced_total", expected)
+        if not self.complete:
+            metrics.inc("crous_incomplete_searches_total")
+            logger.warning(
+                f"Expected {expected} accommodations but got {self.received} for {self.search_url}"
+            )
+
 
 class Parser:
     """Class to parse the CROUS website and get the available accommodations"""
 
-    def __init__(self, authenticated_driver: WebDriver):
-        self.driver = authenticated_driver
+    def __init__(
+        self,
+        session: BrowserSession,
+        http_fetcher: HttpFetcher | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        page_parser: PageParser | None = None,
+        page_cache: PageCache[ParsedPage] | None = None,
+    ):
+        settings = get_settings()
+        # The browser is only started (and authenticated) when a page has to be fetched with Selenium
+        self.session = session
+        # When set, search pages are fetched over plain HTTP and the browser is only used as a fallback
+        self.http_fetcher = http_fetcher
+        self.rate_limiter = rate_limiter
+        self.page_parser = page_parser or get_page_parser(settings.PARSER_BACKEND)
+        # When set, pages whose fingerprint did not change since the last fetch are not parsed again
+        self.page_cache = page_cache
+        self._page_executor = ThreadPoolExecutor(
+            max_workers=settings.PAGE_FETCH_CONCURRENCY, thread_name_prefix="page"
+        )
 
-    def get_accommodations(self, search_url: HttpUrl) -> SearchResults:
+    def get_accommodations(
+        self, search_url: HttpUrl | str, on_page: PageCallback | None = None
+    ) -> SearchResults:
         """Returns the accommodations found on the CROUS website for the given search URL"""
+        stream = self.stream_accommodations(search_url, on_page)
+        accommodations = list(stream)
+
+        return SearchResults(
+            search_url=search_url,  # type: ignore
+            count=stream.count,
+            accommodations=accommodations,
+            unchanged=bool(stream.unchanged),
+        )
+
+    def stream_accommodations(
+        self, search_url: HttpUrl | str, on_page: PageCallback | None = None
+    ) -> AccommodationStream:
+        """Fetches the first results page of the given search URL, and returns a stream over all its accommodations.
+
+        The remaining pages are fetched concurrently and their accommodations are
+        yielded as soon as each page arrives.
+        """
+        settings = get_settings()
         logger.info(f"Getting accommodations from the search URL: {search_url}")
-        self.driver.get(str(search_url))
-        sleep(2)
-        html = self.driver.page_source
+        search_url = str(search_url)
+
+        first_page: ParsedPage | None = None
+        fetch_page: Callable[[int], ParsedPage] = partial(self._fetch_page_selenium, search_url)
+
+        if self.http_fetcher is not None and self.http_fetcher.has_cookies:
+            if settings.CROUS_SEARCH_API_URL:
+                first_page = self._fetch_page_api(search_url, 1)
+                fetch_http = partial(self._fetch_page_api, search_url)
+            if first_page is None:
+                first_page = self._fetch_page_http(search_url, 1)
+                fetch_http = partial(self._fetch_page_http, search_url)
+
+            if first_page is not None:
+                fetch_page = partial(self._fetch_page_with_fallback, fetch_http, search_url)
+            else:
+                logger.info("HTTP fetch did not return a results page, falling back to Selenium")
+
+        if first_page is None:
+            first_page = fetch_page(1)
+
+        logger.info(f"Found {first_page.count} accommodations")
+
+        page_count = _page_count(first_page)
+        if page_count > settings.MAX_RESULT_PAGES:
+            logger.warning(
+                f"{page_count} result pages for {search_url}, only fetching the first {settings.MAX_RESULT_PAGES}"
+            )
+            page_count = settings.MAX_RESULT_PAGES
+
+        return AccommodationStream(
+            search_url,
+            first_page.count,
+            self._iter_pages(first_page, fetch_page, page_count),
+            on_page,
+        )
+
+    def _iter_pages(
+        self,
+        first_page: ParsedPage,
+        fetch_page: Callable[[int], ParsedPage],
+        page_count: int,
+    ) -> Iterator[ParsedPage]:
+        yield first_page
+
+        if page_count <= 1:
+            return
+
+        logger.info(f"Fetching {page_count - 1} more result pages")
+        futures = {
+            self._page_executor.submit(fetch_page, page): page
+            for page in range(2, page_count + 1)
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception:
+                    logger.exception(f"Could not fetch result page {futures[future]}")
+                    # The page may have changed, the whole search has to be handled
+                    yield ParsedPage(True, None, [])
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _throttle(self, url: str) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(url)
+
+    def _fetch_page_with_fallback(
+        self,
+        fetch_http: Callable[[int], ParsedPage | None],
+        search_url: str,
+        page: int,
+    ) -> ParsedPage:
+        parsed_page = fetch_http(page)
+        if parsed_page is None:
+            logger.info(f"HTTP fetch of page {page} failed, falling back to Selenium")
+            parsed_page = self._fetch_page_selenium(search_url, page)
+        return parsed_page
+
+    def _timed_fetch(
+        self, backend: str, load: Callable[..., ParsedPage | None], *args
+    ) -> ParsedPage | None:
+        with metrics.timer("crous_page_fetch_seconds", backend=backend) as labels:
+            parsed_page = load(*args)
+            if parsed_page is None:
+                labels["outcome"] = "miss"
+            return parsed_page
+
+    def _parse_page(self, html: str, backend: str) -> ParsedPage:
+        with metrics.timer("crous_page_parse_seconds", backend=backend):
+            return self.page_parser.parse(html)
+
+    def _parse_or_reuse(
+        self,
+        page_url: str,
+        html: str,
+        backend: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> ParsedPage:
+        """Parses a search page, unless its results are the same as the last time it was fetched."""
+        if self.page_cache is None:
+            return self._parse_page(html, backend)
+
+        html_fingerprint = page_fingerprint(html)
+        cached = self.page_cache.match(page_url, html_fingerprint)
+        if cached is not None:
+            metrics.inc("crous_unchanged_pages_total", backend=backend)
+            return cached._replace(unchanged=True)
+
+        parsed_page = self._parse_page(html, backend)
+        if parsed_page.has_results_heading:
+            self.page_cache.put(page_url, html_fingerprint, parsed_page, etag, last_modified)
+        return parsed_page
+
+    def _fetch_page_selenium(self, search_url: str, page: int) -> ParsedPage:
+        page_url = _page_url(search_url, page)
+        return self.session.run(
+            lambda driver: self._timed_fetch("selenium", self._load_page_selenium, driver, page_url)  # type: ignore
+        )
+
+    def _load_page_selenium(self, driver: "WebDriver", page_url: str) -> ParsedPage:
+        from selenium.common.exceptions import TimeoutException
+
+        self._throttle(page_url)
+        driver.get(page_url)
+        try:
+            timed_wait(
+                driver,
+                _search_page_rendered,
+                get_settings().WAIT_RESULTS_TIMEOUT,
+                "search_results",
+            )
+        except TimeoutException:
+            logger.warning("Search results did not show up within timeout")
+
+        current_url = driver.current_url
+        if _is_login_url(current_url):
+            raise SessionExpiredError(f"redirected to the login page: {current_url}")
+
+        html = driver.page_source
         # Debug: log a short snapshot of the page HTML to help diagnose parsing issues
         # logger.info(f"Page HTML length: {len(html)}")
         # logger.info("Page HTML (first 2000 chars): %s", html[:2000])
-        search_results_soup = BeautifulSoup(html, "html.parser")
-        num_accommodations = self._get_accomodations_count(search_results_soup)
-        logger.info(f"Found {num_accommodations} accommodations")
+        parsed_page = self._parse_or_reuse(page_url, html, "selenium")
+        if not parsed_page.has_results_heading:
+            raise SessionExpiredError("results heading not found on the search page")
 
-        return SearchResults(
-            search_url=search_url,
-            count=num_accommodations,
-            accommodations=parse_accommodations_summaries(search_results_soup),
-        )
+        if self.http_fetcher is not None:
+            # The browser session is valid: refresh the cookies used by the HTTP backend
+            self.http_fetcher.load_cookies(driver)
 
-    """Parses the number of accommodations from the search results page, along with its price if available"""
-    def _get_accomodations_count(
-        self, search_results_soup: BeautifulSoup
-    ) -> Optional[tuple[int, Optional[float]]]:
-        results_heading = search_results_soup.find(
-            "h2", class_="SearchResults-desktop fr-h4 svelte-11sc5my"
-        )
+        return parsed_page
+
+    def _fetch_page_http(self, search_url: str, page: int) -> ParsedPage | None:
+        return self._timed_fetch("http", self._load_page_http, search_url, page)
+
+    def _load_page_http(self, search_url: str, page: int) -> ParsedPage | None:
+        assert self.http_fetcher is not None
 
-        if not results_heading:
-            logger.error("Could not find results heading to parse number of accommodations")
+        page_url = _page_url(search_url, page)
+        cached = self.page_cache.get(page_url) if self.page_cache is not None else None
+        self._throttle(page_url)
+        response = self.http_fetcher.fetch_html(page_url, headers=_conditional_headers(cached))
+        if response is None or _is_login_url(response.url):
             return None
 
-        # Show the raw heading text and first token for debugging (may contain NBSPs or localization)
-        raw_text = results_heading.text or ""
-        number_or_aucun = raw_text.strip().split()[0] if raw_text.strip() else ""
-        logger.info("Results heading raw text: %r, first token: %r", raw_text, number_or_aucun)
+        if cached is not None and response.status_code == 304:
+            metrics.inc("crous_unchanged_pages_total", backend="http")
+            return cached.content._replace(unchanged=True)
 
-        if number_or_aucun == "Aucun":
-            return 0, None
+        # Cheap check before parsing: the heading is only rendered for authenticated sessions
+        if "SearchResults-desktop" not in response.text:
+            return None
 
-        try:
-            number = int(number_or_aucun)
-            price = self._get_accommodation_price(search_results_soup)
-            return number, price
-        except ValueError:
-            logger.error(f"Could not parse number of accommodations: {number_or_aucun}")
+        parsed_page = self._parse_or_reuse(
+            page_url,
+            response.text,
+            "http",
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        if not parsed_page.has_results_heading:
             return None
-        
-    def _get_accommodation_price(
-        self, search_results_soup: BeautifulSoup
-    ) -> Optional[float]:
-        price_badge = search_results_soup.find("p", class_="fr-badge")
 
-        if not price_badge:
-            logger.info("No price badge found on results page")
+        return parsed_page
+
+    def _fetch_page_api(self, search_url: str, page: int) -> ParsedPage | None:
+        return self._timed_fetch("api", self._load_page_api, search_url, page)
+
+    def _load_page_api(self, search_url: str, page: int) -> ParsedPage | None:
+        assert self.http_fetcher is not None
+
+        payload = build_search_payload(search_url, page=page, page_size=API_PAGE_SIZE)
+        if payload is None:
             return None
 
-        price_text = price_badge.text.strip().strip("€").strip().replace(",", ".")
-        try:
-            price = float(price_text)
-            logger.info(f"Parsed accommodation price: {price}")
-            return price
-        except ValueError:
-            logger.error(f"Could not parse accommodation price: {price_text}")
+        api_url = get_settings().CROUS_SEARCH_API_URL.format(tool_id=payload["idTool"])  # type: ignore
+        self._throttle(api_url)
+        response = self.http_fetcher.post(api_url, payload)
+        if response is None:
             return None
 
+        # The payload only depends on the search URL and the page
+        cache_key = f"api:{_page_url(search_url, page)}"
+        response_fingerprint = fingerprint(response.content)
+        if self.page_cache is not None:
+            cached = self.page_cache.match(cache_key, response_fingerprint)
+            if cached is not None:
+                metrics.inc("crous_unchanged_pages_total", backend="api")
+                return cached._replace(unchanged=True)
+
+        with metrics.timer("crous_page_parse_seconds", backend="api"):
+            try:
+                parsed = parse_search_api_response(response.json())
+            except ValueError:
+                logger.warning(f"HTTP POST to {api_url} did not return JSON")
+                return None
+        if parsed is None:
+            return None
+
+        total, accommodations = parsed
+        parsed_page = ParsedPage(
+            has_results_heading=True,
+            count=(total, None),
+            accommodations=accommodations,
+            page_count=max(1, ceil(total / API_PAGE_SIZE)),
+        )
+        if self.page_cache is not None:
+            self.page_cache.put(cache_key, response_fingerprint, parsed_page)
+        return parsed_page
+
+    def close(self) -> None:
+        self._page_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _page_url(search_url: str, page: int) -> str:
+    """Returns the URL of the given results page of a search."""
+    if page == 1:
+        return search_url
+
+    parsed = urlparse(search_url)
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if k != "page"]
+    query.append(("page", str(page)))
+    return urlunparse(parsed._replace(query=urlencode(query, safe="_,.")))
+
+
+def _conditional_headers(cached: CachedPage | None) -> dict[str, str] | None:
+    """Returns the headers of a conditional request revalidating the cached page, if it has validators."""
+    if cached is None:
+        return None
+    headers = {}
+    if cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+    return headers or None
+
+
+def _page_count(first_page: ParsedPage) -> int:
+    """Returns the number of result pages of a search, given its first page."""
+    if first_page.page_count is not None:
+        return first_page.page_count
+
+    # No pagination links: guess from the announced total and the size of the first page
+    total = first_page.count[0] if first_page.count else 0
+    per_page = len(first_page.accommodations)
+    if per_page == 0 or total <= per_page:
+        return 1
+    return ceil(total / per_page)
+
+
+def parse_page_count(pagination_hrefs: Iterable[str]) -> Optional[int]:
+    """Returns the highest `page` parameter among the links of the pagination bar, if any."""
+    pages = []
+    for href in pagination_hrefs:
+        values = parse_qs(urlparse(href).query).get("page")
+        if values and values[0].isdigit():
+            pages.append(int(values[0]))
+    return max(pages) if pages else None
+
+
+class SoupPageParser:
+    """Reference parser backend, based on BeautifulSoup."""
+
+    def __init__(self, features: str = "html.parser"):
+        self.features = features
+
+    def parse(self, html: str) -> ParsedPage:
+        search_results_soup = BeautifulSoup(html, self.features)
+        results_heading = _find_results_heading(search_results_soup)
+        if results_heading is None:
+            return ParsedPage(False, None, [])
+
+        price_badge = search_results_soup.find("p", class_="fr-badge")
+        count = parse_accommodations_count(
+            results_heading.text,
+            price_badge.text if price_badge is not None else None,
+        )
+        page_count = parse_page_count(
+            link["href"] for link in search_results_soup.select("nav.fr-pagination a[href]")
+        )
+        return ParsedPage(
+            True, count, parse_accommodations_summaries(search_results_soup), page_count
+        )
+
+
+def get_page_parser(backend: str = "auto") -> PageParser:
+    """Returns the parser backend with the given name: 'html.parser', 'lxml' or 'auto'.
+
+    'auto' picks lxml when it is installed, and falls back to BeautifulSoup otherwise.
+    """
+    if backend == "html.parser":
+        return SoupPageParser()
+
+    if backend not in ("lxml", "auto"):
+        raise ValueError("Unsupported parser backend. Use 'html.parser', 'lxml' or 'auto'.")
+
+    try:
+        from src.lxml_parser import LxmlPageParser
+    except ImportError:
+        if backend == "lxml":
+            raise
+        logger.info("lxml is not installed, using the html.parser backend")
+        return SoupPageParser()
+
+    return LxmlPageParser()
+
+
+def parse_accommodations_count(
+    heading_text: str | None, price_badge_text: str | None
+) -> Optional[tuple[int, Optional[float]]]:
+    """Parses the number of accommodations from the search results heading, along with its price if available"""
+    if heading_text is None:
+        logger.error("Could not find results heading to parse number of accommodations")
+        return None
+
+    # Show the raw heading text and first token for debugging (may contain NBSPs or localization)
+    raw_text = heading_text or ""
+    number_or_aucun = raw_text.strip().split()[0] if raw_text.strip() else ""
+    logger.info("Results heading raw text: %r, first token: %r", raw_text, number_or_aucun)
+
+    if number_or_aucun == "Aucun":
+        return 0, None
+
+    try:
+        number = int(number_or_aucun)
+    except ValueError:
+        logger.error(f"Could not parse number of accommodations: {number_or_aucun}")
+        return None
+
+    return number, _parse_accommodation_price(price_badge_text)
+
+
+def _parse_accommodation_price(price_badge_text: str | None) -> Optional[float]:
+    if price_badge_text is None:
+        logger.info("No price badge found on results page")
+        return None
+
+    price_text = price_badge_text.strip().strip("€").strip().replace(",", ".")
+    try:
+        price = float(price_text)
+        logger.info(f"Parsed accommodation price: {price}")
+        return price
+    except ValueError:
+        logger.error(f"Could not parse accommodation price: {price_text}")
+        return None
+
+
+def _find_results_heading(search_results_soup: BeautifulSoup):
+    return search_results_soup.find("h2", class_=RESULTS_HEADING_CLASS)
+
+
+def _search_page_rendered(driver: "WebDriver") -> bool:
+    """Whether the search page shows its accommodations, says there are none, or redirected to the login page.
+
+    The results heading is rendered before the cards: it alone only means the page is done when there are no results.
+    """
+    # Only imported when the Selenium backend is actually used, the WebDriver client being slow to import
+    from selenium.common.exceptions import StaleElementReferenceException
+    from selenium.webdriver.common.by import By
+
+    if _is_login_url(driver.current_url) or driver.find_elements(By.CSS_SELECTOR, "div.fr-card"):
+        return True
+    try:
+        return any(
+            heading.text.strip().startswith("Aucun")
+            for heading in driver.find_elements(By.CSS_SELECTOR, "h2.SearchResults-desktop")
+        )
+    except StaleElementReferenceException:
+        # Re-rendered meanwhile
+        return False
+
+
+def _is_login_url(url: str) -> bool:
+    settings = get_settings()
+    login_host = urlparse(settings.MSE_INITIAL_LOGIN_URL).netloc
+    crous_host = urlparse(settings.CROUS_BASE_URL).netloc
+    parsed = urlparse(url)
+    # Both websites can be served by the same (mock) host
+    return (parsed.netloc == login_host and login_host != crous_host) or "login" in parsed.path
+
 
 def _try_parse_url(title_card) -> HttpUrl | None:
     try:
@@ -111,15 +585,48 @@ def _try_parse_image_url(image):
         return None
 
 
-def _try_parse_price(price) -> float | str | None:
-    if not price:
+def _parse_price_text(price_text: str | None) -> float | str | None:
+    if price_text is None:
         return None
     try:
-        return float(price.text.strip().strip("€").strip().replace(",", "."))
+        return float(price_text.strip().strip("€").strip().replace(",", "."))
     except Exception:
         pass
 
-    return price.text.strip()
+    return price_text.strip()
+
+
+def _try_parse_price(price) -> float | str | None:
+    if not price:
+        return None
+    return _parse_price_text(price.text)
+
+
+def build_accommodation(
+    title: str,
+    url: str | None,
+    image_url: str | None,
+    address: str | None,
+    details: List[str],
+    price: float | str | None,
+) -> Accommodation | None:
+    """Builds an `Accommodation` from the raw values extracted from a card, whatever the parser backend."""
+    accommodation_id = _try_parse_id(str(url))
+    if accommodation_id is None:
+        return None
+
+    fields = parse_card_fields(address, details)
+    overview_details = [address, *details] if address is not None else details
+
+    return Accommodation(
+        id=accommodation_id,
+        title=title,
+        image_url=image_url,  # type: ignore
+        price=price,
+        overview_details="\n".join(overview_details),
+        is_colocative=Occupation.COLOCATION in fields.occupations,
+        **fields._asdict(),
+    )
 
 
 def parse_accommodation_card(card: BeautifulSoup) -> Accommodation | None:
@@ -129,38 +636,18 @@ def parse_accommodation_card(card: BeautifulSoup) -> Accommodation | None:
 
     title = title_card.text.strip()
     url = _try_parse_url(title_card)
-    accommodation_id = _try_parse_id(str(url))
 
     image = card.find("img", class_="fr-responsive-img")
     image_url = _try_parse_image_url(image)
 
-    overview_details = []
-
-    # Add address
     address = card.find("p", class_="fr-card__desc")
-    if address:
-        overview_details.append(address.text.strip())
-
-    # Add other details
-    details = card.find_all("p", class_="fr-card__detail")
-    for detail in details:
-        overview_details.append(detail.text.strip())
+    details = [detail.text.strip() for detail in card.find_all("p", class_="fr-card__detail")]
 
     price = card.find("p", class_="fr-badge")
     price = _try_parse_price(price)
 
-    is_colocative = any("Colocation" in detail for detail in overview_details)
-
-    if accommodation_id is None:
-        return None
-
-    return Accommodation(
-        id=accommodation_id,
-        title=title,
-        image_url=image_url,  # type: ignore
-        price=price,
-        overview_details="\n".join(overview_details),
-        is_colocative=is_colocative,
+    return build_accommodation(
+        title, url, image_url, address.text.strip() if address else None, details, price
     )
 
 
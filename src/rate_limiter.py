@@ -0,0 +1,28 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    """Thread-safe limiter spacing out requests sent to the same host by at least `min_interval` seconds."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot: dict[str, float] = {}
+
+    def wait(self, url: str) -> None:
+        """Blocks until a request to the host of `url` is allowed."""
+        if self.min_interval <= 0:
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            # Reserve the slot before sleeping so concurrent callers queue up behind it
+            self._next_slot[host] = slot + self.min_interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
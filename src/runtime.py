@@ -0,0 +1,568 @@
+"""Asynchronous polling runtime.
+
+Searches, matching and delivery run as separate stages connected by bounded
+queues, each stage being supervised and restarted on its own when it crashes:
+
+    scheduler -> searches (threads) -> results queue -> matcher -> notifications queue -> deliverer
+
+A failing search or configuration only affects itself, and stopping the runtime
+lets the items already queued go through before returning. Each due search runs
+as its own task, so a slow search does not hold back the others; the results of
+the searches that were due together are still queued in plan order when they
+share a user, so that each user gets the notifications of their configurations
+in order.
+
+With fast alerts, each results page is also matched as soon as it is parsed, from
+the search thread: the first new accommodation of a configuration is alerted right
+away, and the full notification built by the matcher later replaces that alert.
+Alerts without a full notification (e.g. the configuration failed) are edited
+into a final alert instead.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Protocol, Sequence
+
+from src.archive import ListingArchive
+from src.delivery_queue import DeliveryQueue
+from src.details import DetailEnricher
+from src.filters import CompiledFilter, FilterEngine
+from src.metrics import metrics
+from src.models import Accommodation, Notification, SearchResults, UserConf
+from src.notification_builder import NotificationBuilder
+from src.parser import PageCallback
+from src.scheduler import AdaptiveScheduler
+from src.seen_store import SeenStore, conf_key
+
+logger = logging.getLogger(__name__)
+
+
+class Searcher(Protocol):
+    async def search(self, search_url: str, on_page: PageCallback | None = None) -> SearchResults: ...
+
+
+class Restartable(Protocol):
+    def close(self) -> None: ...
+
+
+# (search URL, configurations, accommodations matched by each of them) -> accommodations to notify to each of them
+Router = Callable[[str, Sequence[UserConf], Sequence[List[Accommodation]]], List[List[Accommodation]]]
+
+
+class _Alert(NamedTuple):
+    id: int
+    chat_id: str
+    accommodation: Accommodation
+
+
+@dataclass
+class _Cycle:
+    """Searches that were due together."""
+
+    searches: List[str]
+    started_at: float
+    # Search URL -> set once its results are queued (or it failed)
+    queued: dict[str, asyncio.Event]
+    # Search URL -> searches before it in plan order sharing a user with it, queued first
+    queued_after: dict[str, List[str]]
+    failed: int = 0
+    remaining: int = 0
+
+
+@dataclass
+class _Delivery:
+    conf: UserConf
+    key: str
+    notification: Optional[Notification]
+    # Accommodations matched by the configuration, marked as seen once the notification is queued
+    accommodations: List[Accommodation]
+    # Configurations up to date with the results of the search, this one is added once delivered
+    handled: set[tuple[str, CompiledFilter]]
+    # Alert replaced by the notification, when one was sent
+    replaces: Optional[int] = None
+
+
+class Supervisor:
+    """Runs components as asyncio tasks, restarting a component that crashes without touching the others.
+
+    A component is restarted after a delay that doubles after each consecutive
+    crash (from `min_backoff` up to `max_backoff`), and goes back to `min_backoff`
+    once it ran for `reset_after` seconds without crashing.
+    """
+
+    def __init__(self, min_backoff: float = 1, max_backoff: float = 60, reset_after: float = 300):
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.reset_after = reset_after
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, component: Callable[[], Awaitable[None]]) -> None:
+        self._tasks[name] = asyncio.create_task(self._supervise(name, component), name=name)
+
+    async def _supervise(self, name: str, component: Callable[[], Awaitable[None]]) -> None:
+        backoff = self.min_backoff
+        while True:
+            started = time.monotonic()
+            try:
+                await component()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if time.monotonic() - started > self.reset_after:
+                    backoff = self.min_backoff
+                logger.exception(f"Component {name} crashed, restarting it in {backoff:.0f}s")
+                metrics.inc("crous_component_restarts_total", component=name)
+                await asyncio.sleep(backoff)
+                backoff = min(self.max_backoff, backoff * 2)
+
+    async def stop(self) -> None:
+        """Cancels all the components and waits for them to finish."""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+
+class PollingRuntime:
+    """Polls the searches of the configurations and notifies their new accommodations.
+
+    `plan` returns the configurations to serve, grouped by search URL; it is called
+    before each scheduling decision so that configuration reloads are picked up.
+    When `max_consecutive_failures` searches fail in a row, the browser `session`
+    is closed so that the next search starts a fresh one. `route` narrows down the
+    accommodations matched by the configurations of a search, e.g. to the ones
+    located in their own area when searches are geographic tiles. With an
+    `enricher`, the accommodations to notify are completed with their detail page
+    before the notifications are built. With `fast_alerts`, a short alert is sent
+    as soon as a page holds a new accommodation for a configuration. With an
+    `archive`, the results of every search are also archived.
+    """
+
+    def __init__(
+        self,
+        plan: Callable[[], dict[str, List[UserConf]]],
+        scheduler: AdaptiveScheduler,
+        searcher: Searcher,
+        filter_engine: FilterEngine,
+        seen_store: SeenStore,
+        notification_builder: NotificationBuilder,
+        delivery_queue: DeliveryQueue,
+        default_interval: float,
+        session: Restartable | None = None,
+        end_cycle: Callable[[], None] | None = None,
+        on_cycle: Callable[..., None] | None = None,
+        route: Router | None = None,
+        enricher: DetailEnricher | None = None,
+        fast_alerts: bool = False,
+        archive: ListingArchive | None = None,
+        reload_interval: float | None = None,
+        queue_size: int = 100,
+        max_consecutive_failures: int = 3,
+        supervisor: Supervisor | None = None,
+    ):
+        self.plan = plan
+        self.scheduler = scheduler
+        self.searcher = searcher
+        self.filter_engine = filter_engine
+        self.seen_store = seen_store
+        self.notification_builder = notification_builder
+        self.delivery_queue = delivery_queue
+        self.default_interval = default_interval
+        self.session = session
+        self.end_cycle = end_cycle
+        self.on_cycle = on_cycle
+        self.route = route
+        self.enricher = enricher
+        self.fast_alerts = fast_alerts
+        self.archive = archive
+        self.reload_interval = reload_interval
+        self.queue_size = queue_size
+        self.max_consecutive_failures = max_consecutive_failures
+        self.supervisor = supervisor or Supervisor()
+
+        self._stopping: asyncio.Event | None = None
+        # Set when the runtime stops or a search completes: the next due searches are computed again
+        self._wakeup: asyncio.Event | None = None
+        self._search_tasks: set[asyncio.Task] = set()
+        # Searches running, which are not started again until they complete
+        self._running: set[str] = set()
+        # The browser is only recycled when no search uses it
+        self._end_cycle_pending = False
+        # (search URL, results, conf key -> alert sent for it)
+        self._results: asyncio.Queue[tuple[str, SearchResults, dict[str, _Alert]]] | None = None
+        self._deliveries: asyncio.Queue[_Delivery] | None = None
+        self._current_plan: dict[str, List[UserConf]] = {}
+        # Search URL -> configurations whose notifications are up to date with the last results of the search
+        self._handled_confs: dict[str, set[tuple[str, CompiledFilter]]] = {}
+        self._consecutive_failures = 0
+
+    def stop(self) -> None:
+        """Asks the runtime to stop: no new search is started, and queued results are still notified."""
+        if self._stopping is not None and not self._stopping.is_set():
+            logger.info("Stopping: finishing the current searches and notifications")
+            self._stopping.set()
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def run(self) -> None:
+        """Runs until `stop` is called."""
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._results = asyncio.Queue(self.queue_size)
+        self._deliveries = asyncio.Queue(self.queue_size)
+
+        self.supervisor.start("matcher", self._match_results)
+        self.supervisor.start("deliverer", self._deliver_notifications)
+        try:
+            await self._poll_searches()
+            if self._search_tasks:
+                await asyncio.wait(self._search_tasks)
+            # Let the queued results go through the pipeline before stopping it
+            await self._results.join()
+            await self._deliveries.join()
+        finally:
+            await self.supervisor.stop()
+
+    # --- Searches ----------------------------------------------------------------
+
+    async def _poll_searches(self) -> None:
+        assert self._stopping is not None
+        backoff = 1.0
+        while not self._stopping.is_set():
+            try:
+                await self._poll_due_searches()
+                backoff = 1.0
+            except Exception:
+                # e.g. a broken configuration reload: keep the last plan and try again later
+                logger.exception(f"Error while scheduling searches, retrying in {backoff:.0f}s")
+                metrics.inc("crous_component_restarts_total", component="poller")
+                await self._sleep(backoff)
+                backoff = min(60.0, backoff * 2)
+                continue
+
+            wait = self.scheduler.seconds_until_next()
+            if self.reload_interval is not None:
+                # Wake up regularly to pick up configuration changes
+                wait = min(wait, self.reload_interval)
+            logger.debug(f"Sleeping {wait:.0f}s before next check...")
+            await self._sleep(wait)
+
+    async def _sleep(self, seconds: float) -> None:
+        """Sleeps, waking up early when the runtime is stopped or a search completes."""
+        assert self._wakeup is not None
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _poll_due_searches(self) -> None:
+        self._current_plan = self.plan()
+        self.scheduler.sync(
+            {
+                search_url: min(conf.poll_interval_seconds or self.default_interval for conf in confs)
+                for search_url, confs in self._current_plan.items()
+            }
+        )
+        for search_url in [url for url in self._handled_confs if url not in self._current_plan]:
+            del self._handled_confs[search_url]
+
+        # In plan order; a search slower than its interval is due again before it completes
+        plan_order = {search_url: i for i, search_url in enumerate(self._current_plan)}
+        due_searches = sorted(
+            (search_url for search_url in self.scheduler.pop_due() if search_url not in self._running),
+            key=lambda search_url: plan_order.get(search_url, len(plan_order)),
+        )
+        if not due_searches:
+            return
+
+        users = {
+            search_url: {conf.telegram_id for conf in self._current_plan.get(search_url, [])}
+            for search_url in due_searches
+        }
+        cycle = _Cycle(
+            due_searches,
+            time.perf_counter(),
+            {search_url: asyncio.Event() for search_url in due_searches},
+            {
+                search_url: [earlier for earlier in due_searches[:i] if users[earlier] & users[search_url]]
+                for i, search_url in enumerate(due_searches)
+            },
+            remaining=len(due_searches),
+        )
+        for search_url in due_searches:
+            self._running.add(search_url)
+            task = asyncio.create_task(self._run_search(cycle, search_url))
+            self._search_tasks.add(task)
+            task.add_done_callback(self._search_tasks.discard)
+
+    async def _run_search(self, cycle: _Cycle, search_url: str) -> None:
+        assert self._wakeup is not None
+        try:
+            if not await self._search(search_url, cycle):
+                cycle.failed += 1
+        finally:
+            cycle.queued[search_url].set()
+            self._running.discard(search_url)
+            cycle.remaining -= 1
+            if not cycle.remaining:
+                await self._end_cycle(cycle)
+            self._wakeup.set()
+
+    async def _end_cycle(self, cycle: _Cycle) -> None:
+        try:
+            self.seen_store.purge_expired()
+            if self.end_cycle is not None:
+                self._end_cycle_pending = True
+            if self._end_cycle_pending and not self._running:
+                # Keep the browser alive for the next cycle, unless it has to be recycled
+                self._end_cycle_pending = False
+                await asyncio.to_thread(self.end_cycle)  # type: ignore[arg-type]
+            if self.on_cycle is not None:
+                self.on_cycle(
+                    time.perf_counter() - cycle.started_at,
+                    searches=len(cycle.searches),
+                    failed_searches=cycle.failed,
+                    pending_messages=self.delivery_queue.pending_count(),
+                )
+        except Exception:
+            logger.exception("Could not end the polling cycle")
+
+    async def _search(self, search_url: str, cycle: _Cycle) -> bool:
+        """Runs one search and queues its results, after the ones it is ordered after. Returns whether it succeeded."""
+        assert self._results is not None
+        alerts: dict[str, _Alert] = {}
+        try:
+            if self.fast_alerts:
+                search_results = await self.searcher.search(
+                    search_url,
+                    lambda accommodations, received_at: self._alert(search_url, accommodations, received_at, alerts),
+                )
+            else:
+                search_results = await self.searcher.search(search_url)
+        except Exception:
+            logger.exception(f"Search failed for {search_url}")
+            await asyncio.to_thread(self._resolve_alerts, alerts)
+            self.scheduler.report(search_url, None)
+            await self._search_failed()
+            return False
+
+        self._consecutive_failures = 0
+        self.scheduler.report(
+            search_url,
+            frozenset((a.id, a.price) for a in search_results.accommodations),
+        )
+        for earlier in cycle.queued_after[search_url]:
+            await cycle.queued[earlier].wait()
+        # Waits when the matcher is behind
+        await self._results.put((search_url, search_results, alerts))
+        return True
+
+    def _alert(
+        self,
+        search_url: str,
+        accommodations: List[Accommodation],
+        received_at: float,
+        alerts: dict[str, _Alert],
+    ) -> None:
+        """Sends an alert to each configuration without one yet for which the page holds a new accommodation.
+
+        Runs in the search thread, as soon as the page is parsed.
+        """
+        try:
+            confs = [conf for conf in self._current_plan.get(search_url, []) if conf_key(conf) not in alerts]
+            if self.route is not None:
+                # Accommodations are only located by their detail page later on: they are left to the full notification
+                accommodations = [a for a in accommodations if a.latitude is not None and a.longitude is not None]
+            if not confs or not accommodations:
+                return
+            all_matched = self.filter_engine.filter_batch(accommodations, confs)
+            if self.route is not None:
+                all_matched = self.route(search_url, confs, all_matched)
+            for conf, matched in zip(confs, all_matched):
+                key = conf_key(conf)
+                new_accommodations = self.seen_store.filter_new(key, matched, conf.ignored_ids)
+                if new_accommodations and key not in alerts:
+                    alert_id = self.delivery_queue.enqueue_alert(
+                        conf.telegram_id,
+                        self.notification_builder.alert_notification(new_accommodations[0]),
+                        received_at=received_at,
+                    )
+                    alerts[key] = _Alert(alert_id, conf.telegram_id, new_accommodations[0])
+        except Exception:
+            # The full notification is still sent
+            logger.exception(f"Could not send the alerts of {search_url}")
+
+    async def _search_failed(self) -> None:
+        self._consecutive_failures += 1
+        if self.session is None or self._consecutive_failures < self.max_consecutive_failures:
+            return
+        logger.warning(f"{self._consecutive_failures} searches failed in a row, restarting the browser")
+        metrics.inc("crous_component_restarts_total", component="browser")
+        self._consecutive_failures = 0
+        # The session starts a new browser the next time it is used
+        await asyncio.to_thread(self.session.close)
+
+    # --- Matching ----------------------------------------------------------------
+
+    async def _match_results(self) -> None:
+        assert self._results is not None
+        while True:
+            search_url, search_results, alerts = await self._results.get()
+            try:
+                await self._match(search_url, search_results, alerts)
+            except Exception:
+                logger.exception(f"Could not handle the results of {search_url}")
+            finally:
+                self._results.task_done()
+
+    async def _match(self, search_url: str, search_results: SearchResults, alerts: dict[str, _Alert]) -> None:
+        try:
+            await self._match_confs(search_url, search_results, alerts)
+        finally:
+            # Alerts of configurations that failed, left the plan or have nothing to notify
+            if alerts:
+                await asyncio.to_thread(self._resolve_alerts, alerts)
+
+    async def _match_confs(self, search_url: str, search_results: SearchResults, alerts: dict[str, _Alert]) -> None:
+        assert self._deliveries is not None
+        if self.archive is not None:
+            await self._archive(search_results)
+        if not search_results.unchanged:
+            self._handled_confs[search_url] = set()
+        handled = self._handled_confs.setdefault(search_url, set())
+        # When the results did not change, only configurations added or edited since then are handled
+        confs = [
+            conf
+            for conf in self._current_plan.get(search_url, [])
+            if (conf_key(conf), self.filter_engine.compile(conf)) not in handled
+        ]
+        if not confs:
+            metrics.inc("crous_unchanged_searches_total")
+            return
+
+        with metrics.timer("crous_filter_seconds"):
+            all_matched = self.filter_engine.filter_batch(search_results.accommodations, confs)
+
+        # Only notify accommodations that appeared (or whose price changed) since last time
+        all_new: List[Optional[List[Accommodation]]] = []
+        for conf, matched in zip(confs, all_matched):
+            try:
+                all_new.append(self.seen_store.filter_new(conf_key(conf), matched, conf.ignored_ids))
+            except Exception:
+                # Only this configuration is affected, it is handled again with the next results
+                logger.exception(f"Could not handle configuration {conf.conf_title!r} of {conf.telegram_id}")
+                all_new.append(None)
+
+        if self.enricher is not None:
+            # Before routing: the detail page also locates the accommodations whose card has no coordinates
+            enriched = await self._enrich(all_new)
+            all_matched = [[enriched.get(a.id, a) for a in matched] for matched in all_matched]
+            all_new = [[enriched.get(a.id, a) for a in new] if new is not None else None for new in all_new]
+
+        if self.route is not None:
+            all_matched = self.route(search_url, confs, all_matched)
+            routed_ids = [{a.id for a in matched} for matched in all_matched]
+            all_new = [
+                [a for a in new if a.id in ids] if new is not None else None
+                for ids, new in zip(routed_ids, all_new)
+            ]
+
+        if self.seen_store.shared:
+            # Other processes may notify the same accommodations: only the one claiming them does
+            all_new = [self._claim(conf, new) if new is not None else None for conf, new in zip(confs, all_new)]
+
+        for conf, matched, new_accommodations in zip(confs, all_matched, all_new):
+            if new_accommodations is None:
+                continue
+            try:
+                delivery = self._prepare_delivery(conf, search_results, matched, new_accommodations, handled)
+                if delivery.notification and delivery.key in alerts:
+                    delivery.replaces = alerts.pop(delivery.key).id
+            except Exception:
+                logger.exception(f"Could not handle configuration {conf.conf_title!r} of {conf.telegram_id}")
+                continue
+            await self._deliveries.put(delivery)
+
+    def _resolve_alerts(self, alerts: dict[str, _Alert]) -> None:
+        """Edits the alerts no notification will replace, so that they no longer announce details."""
+        for alert in alerts.values():
+            try:
+                self.delivery_queue.enqueue(
+                    alert.chat_id,
+                    self.notification_builder.alert_notification(alert.accommodation, details_pending=False),
+                    replaces=alert.id,
+                )
+            except Exception:
+                logger.exception(f"Could not resolve the alert sent to {alert.chat_id}")
+        alerts.clear()
+
+    def _claim(self, conf: UserConf, new_accommodations: List[Accommodation]) -> Optional[List[Accommodation]]:
+        try:
+            return self.seen_store.claim(conf_key(conf), new_accommodations)
+        except Exception:
+            logger.exception(f"Could not handle configuration {conf.conf_title!r} of {conf.telegram_id}")
+            return None
+
+    async def _archive(self, search_results: SearchResults) -> None:
+        assert self.archive is not None
+        try:
+            with metrics.timer("crous_archive_seconds"):
+                await asyncio.to_thread(self.archive.append, search_results)
+        except Exception:
+            # The results are still notified
+            logger.exception(f"Could not archive the results of {search_results.search_url}")
+
+    async def _enrich(self, all_new: List[Optional[List[Accommodation]]]) -> dict[int | None, Accommodation]:
+        """Returns the new accommodations with their details, by id, each detail page being fetched once for all configurations."""
+        assert self.enricher is not None
+        unique = list({a.id: a for new in all_new if new for a in new}.values())
+        if not unique:
+            return {}
+        try:
+            enriched = await asyncio.to_thread(self.enricher.enrich, unique)
+        except Exception:
+            # Notifications are still sent, without the details
+            logger.exception("Could not fetch the details of the new accommodations")
+            return {}
+        return {a.id: a for a in enriched}
+
+    def _prepare_delivery(
+        self,
+        conf: UserConf,
+        search_results: SearchResults,
+        matched: List[Accommodation],
+        new_accommodations: List[Accommodation],
+        handled: set[tuple[str, CompiledFilter]],
+    ) -> _Delivery:
+        logger.debug(f"Handling configuration : {conf}")
+        with metrics.timer("crous_notification_build_seconds"):
+            notification = self.notification_builder.search_results_notification(
+                # Links to the search of the user, rather than to the tile it is part of
+                search_results.model_copy(update={"search_url": conf.search_url, "accommodations": new_accommodations}),
+                self.filter_engine.compile(conf),
+            )
+        return _Delivery(conf, conf_key(conf), notification, matched, handled)
+
+    # --- Delivery ----------------------------------------------------------------
+
+    async def _deliver_notifications(self) -> None:
+        assert self._deliveries is not None
+        while True:
+            delivery = await self._deliveries.get()
+            try:
+                await asyncio.to_thread(self._deliver, delivery)
+                delivery.handled.add((delivery.key, self.filter_engine.compile(delivery.conf)))
+            except Exception:
+                logger.exception(f"Could not queue the notification of {delivery.conf.telegram_id}")
+            finally:
+                self._deliveries.task_done()
+
+    def _deliver(self, delivery: _Delivery) -> None:
+        if delivery.notification:
+            # Persisted before returning, so it can safely be marked as seen
+            self.delivery_queue.enqueue(delivery.conf.telegram_id, delivery.notification, replaces=delivery.replaces)
+        self.seen_store.mark_seen(delivery.key, delivery.accommodations)
@@ -0,0 +1,154 @@
+import heapq
+import logging
+import random
+import time
+from typing import Callable, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveScheduler:
+    """Decides when each search is polled next.
+
+    Every search key has its own interval, starting at its base interval. The
+    interval is divided by `speedup` each time a poll finds changes (down to
+    `min_interval`), and multiplied by `backoff` each time nothing changed (up to
+    `max_interval`). Due times are randomized by +/- `jitter` (a fraction of the
+    interval), and a token bucket caps the number of polls per minute across all keys.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        jitter: float = 0.1,
+        max_polls_per_minute: float | None = None,
+        speedup: float = 2.0,
+        backoff: float = 1.25,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.max_polls_per_minute = max_polls_per_minute
+        self.speedup = speedup
+        self.backoff = backoff
+        self.clock = clock
+        self.rng = rng or random.Random()
+
+        self._heap: list[tuple[float, int, str]] = []
+        self._counter = 0
+        self._due: dict[str, float] = {}
+        self._base_intervals: dict[str, float] = {}
+        self._intervals: dict[str, float] = {}
+        self._last_state: dict[str, Hashable] = {}
+
+        self._tokens = max_polls_per_minute or 0.0
+        self._tokens_updated_at = clock()
+
+    def interval(self, key: str) -> float | None:
+        """Returns the current polling interval of the given key, in seconds."""
+        return self._intervals.get(key)
+
+    def sync(self, base_intervals: dict[str, float]) -> None:
+        """Sets the keys to schedule along with their base interval.
+
+        New keys are due immediately, and keys that are not listed anymore are dropped.
+        """
+        for key in list(self._due):
+            if key not in base_intervals:
+                del self._due[key]
+                self._base_intervals.pop(key, None)
+                self._intervals.pop(key, None)
+                self._last_state.pop(key, None)
+
+        for key, base_interval in base_intervals.items():
+            base_interval = self._clamp(base_interval)
+            if key not in self._due:
+                self._intervals[key] = base_interval
+                self._push(key, self.clock())
+            elif self._base_intervals.get(key) != base_interval:
+                # The configuration changed: start over from the new base interval
+                self._intervals[key] = base_interval
+            self._base_intervals[key] = base_interval
+
+    def pop_due(self) -> List[str]:
+        """Returns the keys that are due now, within the global polls-per-minute budget.
+
+        Returned keys are provisionally rescheduled one interval later, `report` then
+        adjusts their interval once the poll is done.
+        """
+        now = self.clock()
+        self._refill_tokens(now)
+
+        due: List[str] = []
+        while self._heap and self._heap[0][0] <= now:
+            if self.max_polls_per_minute is not None and self._tokens < 1:
+                break
+            due_time, _, key = heapq.heappop(self._heap)
+            if self._due.get(key) != due_time:
+                continue  # Stale entry
+            due.append(key)
+            if self.max_polls_per_minute is not None:
+                self._tokens -= 1
+            self._push(key, now + self._jittered(self._intervals[key]))
+        return due
+
+    def report(self, key: str, state: Optional[Hashable]) -> None:
+        """Reports the outcome of a poll: `state` summarizes the results (None if the poll failed).
+
+        The interval of the key tightens when the state changed since the previous
+        poll, and backs off otherwise.
+        """
+        if key not in self._due:
+            return
+
+        if state is not None:
+            previous = self._last_state.get(key)
+            self._last_state[key] = state
+            interval = self._intervals[key]
+            if previous is not None and previous != state:
+                interval = interval / self.speedup
+            elif previous is not None:
+                interval = interval * self.backoff
+            self._intervals[key] = self._clamp(interval)
+            logger.debug(f"Next poll of {key} in ~{self._intervals[key]:.0f}s")
+
+        self._push(key, self.clock() + self._jittered(self._intervals[key]))
+
+    def seconds_until_next(self) -> float:
+        """Returns how long to wait before `pop_due` can return something."""
+        now = self.clock()
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)  # Drop stale entries
+        if not self._heap:
+            return self.max_interval
+
+        wait = max(0.0, self._heap[0][0] - now)
+        if self.max_polls_per_minute is not None:
+            self._refill_tokens(now)
+            if self._tokens < 1:
+                wait = max(wait, (1 - self._tokens) * 60 / self.max_polls_per_minute)
+        return wait
+
+    def _push(self, key: str, due_time: float) -> None:
+        self._due[key] = due_time
+        self._counter += 1
+        heapq.heappush(self._heap, (due_time, self._counter, key))
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def _refill_tokens(self, now: float) -> None:
+        if self.max_polls_per_minute is None:
+            return
+        elapsed = now - self._tokens_updated_at
+        self._tokens = min(
+            self.max_polls_per_minute,
+            self._tokens + elapsed * self.max_polls_per_minute / 60,
+        )
+        self._tokens_updated_at = now
@@ -0,0 +1,178 @@
+"""Helpers for the JSON search endpoint called by the Svelte front end of trouverunlogement.lescrous.fr.
+
+The endpoint is not documented: every accessor below is defensive and
+`parse_search_api_response` returns None as soon as the payload does not have the
+expected shape, so that callers can fall back to the HTML search page.
+"""
+
+import logging
+from typing import Any, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from src.card_fields import API_OCCUPATIONS, Amenity, Occupation, parse_address
+from src.models import Accommodation
+
+logger = logging.getLogger(__name__)
+
+Bounds = tuple[float, float, float, float]
+
+
+def parse_bounds(search_url: str) -> Optional[Bounds]:
+    """Returns the (lon1, lat1, lon2, lat2) rectangle of the `bounds=` parameter of a search URL."""
+    values = parse_qs(urlparse(search_url).query).get("bounds")
+    if not values:
+        return None
+    try:
+        lon1, lat1, lon2, lat2 = (float(v) for v in values[0].split("_"))
+    except ValueError:
+        return None
+    return lon1, lat1, lon2, lat2
+
+
+def parse_tool_id(search_url: str) -> Optional[int]:
+    """Returns the tool id of a search URL such as https://trouverunlogement.lescrous.fr/tools/42/search"""
+    parts = urlparse(search_url).path.strip("/").split("/")
+    try:
+        return int(parts[parts.index("tools") + 1])
+    except (ValueError, IndexError):
+        return None
+
+
+def build_search_payload(
+    search_url: str, page: int = 1, page_size: int = 24
+) -> Optional[dict[str, Any]]:
+    """Builds the JSON body of a search API request equivalent to the given search URL.
+
+    Returns None when the URL has no bounds (e.g. a search by residence), as those
+    cannot be expressed with this payload.
+    """
+    bounds = parse_bounds(search_url)
+    tool_id = parse_tool_id(search_url)
+    if bounds is None or tool_id is None:
+        return None
+
+    lon1, lat1, lon2, lat2 = bounds
+    return {
+        "idTool": tool_id,
+        "need_aggregation": False,
+        "page": page,
+        "pageSize": page_size,
+        "sector": None,
+        "occupationModes": [],
+        "location": [{"lon": lon1, "lat": lat1}, {"lon": lon2, "lat": lat2}],
+        "residence": None,
+        "precision": 6,
+        "equipment": [],
+        "price": {"max": 10000000},
+        "area": {"min": 0},
+        "toolMechanism": "residual",
+    }
+
+
+def _format_number(value: float) -> str:
+    return f"{value:g}".replace(".", ",")
+
+
+def _parse_price(item: dict[str, Any]) -> float | str | None:
+    # Rents are expressed in cents
+    rents = [
+        mode.get("rent") or {}
+        for mode in item.get("occupationModes") or []
+        if isinstance(mode, dict)
+    ]
+    mins = [r["min"] / 100 for r in rents if isinstance(r.get("min"), (int, float))]
+    maxs = [r["max"] / 100 for r in rents if isinstance(r.get("max"), (int, float))]
+    if not mins:
+        return None
+
+    low, high = min(mins), max(maxs or mins)
+    if low == high:
+        return float(low)
+    return f"de {_format_number(low)} à {_format_number(high)} €"
+
+
+def _parse_location(residence: dict[str, Any]) -> tuple[Optional[float], Optional[float]]:
+    """Returns the (latitude, longitude) of a residence, (None, None) when it is missing."""
+    location = residence.get("location")
+    if not isinstance(location, dict):
+        return None, None
+    latitude, longitude = location.get("lat"), location.get("lon", location.get("lng"))
+    if not isinstance(latitude, (int, float)) or not isinstance(longitude, (int, float)):
+        return None, None
+    return float(latitude), float(longitude)
+
+
+def _parse_api_item(item: Any) -> Optional[Accommodation]:
+    if not isinstance(item, dict) or not isinstance(item.get("id"), int):
+        return None
+
+    residence = item.get("residence") or {}
+    title = residence.get("label") or item.get("label")
+
+    medias = item.get("medias") or []
+    image_url = medias[0].get("src") if medias and isinstance(medias[0], dict) else None
+
+    overview_details = []
+    if residence.get("address"):
+        overview_details.append(residence["address"])
+    area = item.get("area") or {}
+    surface = None
+    if isinstance(area.get("min"), (int, float)):
+        low = float(area["min"])
+        high = float(area["max"]) if isinstance(area.get("max"), (int, float)) else low
+        surface = (min(low, high), max(low, high))
+        if high != low:
+            overview_details.append(f"de {_format_number(low)} à {_format_number(high)} m²")
+        else:
+            overview_details.append(f"{_format_number(low)} m²")
+    equipments = [
+        e.get("label") for e in item.get("equipments") or [] if isinstance(e, dict) and e.get("label")
+    ]
+    if equipments:
+        overview_details.append(", ".join(equipments))
+
+    occupations = Occupation(0)
+    for mode in item.get("occupationModes") or []:
+        if isinstance(mode, dict):
+            occupations |= API_OCCUPATIONS.get(mode.get("type"), Occupation(0))  # type: ignore[arg-type]
+    postal_code, city = parse_address(residence.get("address"))
+    latitude, longitude = _parse_location(residence)
+
+    return Accommodation(
+        id=item["id"],
+        title=title,
+        price=_parse_price(item),
+        image_url=image_url,  # type: ignore
+        overview_details="\n".join(overview_details),
+        is_colocative=Occupation.COLOCATION in occupations,
+        surface=surface,
+        occupations=occupations,
+        amenities=Amenity.from_labels(equipments),
+        postal_code=postal_code,
+        city=city,
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+def parse_search_api_response(
+    data: Any,
+) -> Optional[tuple[int, List[Accommodation]]]:
+    """Returns the total number of results and the accommodations of a search API response.
+
+    Returns None if the response does not have the expected shape.
+    """
+    try:
+        results = data["results"]
+        items = results["items"]
+        total = results["total"]["value"]
+    except (KeyError, TypeError):
+        logger.warning("Unexpected search API response shape")
+        return None
+
+    if not isinstance(items, list) or not isinstance(total, int):
+        logger.warning("Unexpected search API response shape")
+        return None
+
+    accommodations = [a for a in map(_parse_api_item, items) if a is not None]
+    return total, accommodations
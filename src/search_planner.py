@@ -0,0 +1,38 @@
+from typing import List
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from pydantic import HttpUrl
+
+from src.models import UserConf
+
+
+def normalize_search_url(search_url: HttpUrl | str) -> str:
+    """Returns a canonical form of a search URL, so that equivalent searches compare equal.
+
+    The scheme and host are lowercased, the fragment and empty parameters are dropped,
+    and the query parameters are sorted.
+    """
+    parsed = urlparse(str(search_url))
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query) if v != "")
+    return urlunparse(
+        (
+            parsed.scheme.lower(),
+            parsed.netloc.lower(),
+            parsed.path.rstrip("/") or "/",
+            "",
+            urlencode(query, safe="_,."),
+            "",
+        )
+    )
+
+
+def plan_searches(user_confs: List[UserConf]) -> dict[str, List[UserConf]]:
+    """Groups configurations by normalized search URL, so that each distinct search is fetched once.
+
+    Groups are ordered by the first configuration using them.
+    """
+    plan: dict[str, List[UserConf]] = {}
+    for conf in user_confs:
+        plan.setdefault(normalize_search_url(conf.search_url), []).append(conf)
+    return plan
+
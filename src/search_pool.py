@@ -0,0 +1,35 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import HttpUrl
+
+from src.models import SearchResults
+from src.parser import PageCallback, Parser
+
+
+class SearchPool:
+    """Runs the searches of several configurations concurrently with a bounded number of workers.
+
+    Searches block on the browser or the network, so they run in worker threads and
+    are awaited from the event loop.
+    """
+
+    def __init__(self, parser: Parser, max_workers: int):
+        self.parser = parser
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="search"
+        )
+
+    async def search(
+        self, search_url: HttpUrl | str, on_page: PageCallback | None = None
+    ) -> SearchResults:
+        """Searches the given URL in one of the workers, without blocking the event loop.
+
+        `on_page` is called from the worker as soon as each results page is parsed.
+        """
+        return await asyncio.wrap_future(
+            self.executor.submit(self.parser.get_accommodations, search_url, on_page)
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,214 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Iterable, List
+
+from src.models import Accommodation, UserConf
+from src.search_planner import normalize_search_url
+
+logger = logging.getLogger(__name__)
+
+
+def conf_key(conf: UserConf) -> str:
+    """Returns the key under which the accommodations seen by a configuration are stored."""
+    return f"{conf.telegram_id}:{normalize_search_url(conf.search_url)}"
+
+
+def _price_key(accommodation: Accommodation) -> str:
+    return "" if accommodation.price is None else str(accommodation.price)
+
+
+class SeenStore:
+    """On-disk (SQLite) store of the accommodations already notified to each configuration.
+
+    All live entries are loaded in memory at startup, so lookups never hit the disk.
+    An entry expires `ttl_seconds` after the accommodation was last seen, so that a
+    relisted unit is notified again.
+
+    When the store is `shared` by several processes, the entries of the
+    accommodations being checked are read again from the disk first, so that those
+    seen by the other processes are not notified again, and `claim` settles which
+    process notifies an accommodation.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float | None = None, shared: bool = False):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seen_accommodations (
+                conf_key TEXT NOT NULL,
+                accommodation_id INTEGER NOT NULL,
+                price TEXT NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (conf_key, accommodation_id)
+            ) WITHOUT ROWID
+            """
+        )
+        self._connection.commit()
+
+        # conf_key -> accommodation id -> (price, last_seen)
+        self._index: dict[str, dict[int, tuple[str, float]]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        self.purge_expired()
+        rows = self._connection.execute(
+            "SELECT conf_key, accommodation_id, price, last_seen FROM seen_accommodations"
+        )
+        count = 0
+        for key, accommodation_id, price, last_seen in rows:
+            self._index.setdefault(key, {})[accommodation_id] = (price, last_seen)
+            count += 1
+        logger.info(f"Loaded {count} seen accommodations from {self.path}")
+
+    def _is_expired(self, last_seen: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - last_seen > self.ttl_seconds
+
+    def filter_new(
+        self,
+        key: str,
+        accommodations: Iterable[Accommodation],
+        ignored_ids: Iterable[int] = (),
+    ) -> List[Accommodation]:
+        """Returns the accommodations that should be notified for the given configuration key.
+
+        That is those that are not ignored, and that were never seen, have expired
+        or whose price changed since they were last seen.
+        """
+        ignored = set(ignored_ids)
+        now = time.time()
+        if self.shared:
+            accommodations = list(accommodations)
+            self._refresh(key, [a.id for a in accommodations if a.id is not None and a.id not in ignored])
+        with self._lock:
+            seen = self._index.get(key, {})
+            new_accommodations = []
+            for accommodation in accommodations:
+                if accommodation.id is None or accommodation.id in ignored:
+                    continue
+                entry = seen.get(accommodation.id)
+                if (
+                    entry is None
+                    or self._is_expired(entry[1], now)
+                    or entry[0] != _price_key(accommodation)
+                ):
+                    new_accommodations.append(accommodation)
+        return new_accommodations
+
+    def claim(self, key: str, accommodations: Iterable[Accommodation]) -> List[Accommodation]:
+        """Marks the accommodations that are still new as seen, and returns them.
+
+        The check and the write happen in one transaction locking the database, so
+        that when several processes claim the same accommodation, only one of them
+        gets it.
+        """
+        candidates = {a.id: a for a in accommodations if a.id is not None}
+        if not candidates:
+            return []
+
+        now = time.time()
+        placeholders = ",".join("?" * len(candidates))
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                existing = {
+                    accommodation_id: (price, last_seen)
+                    for accommodation_id, price, last_seen in self._connection.execute(
+                        f"SELECT accommodation_id, price, last_seen FROM seen_accommodations "
+                        f"WHERE conf_key = ? AND accommodation_id IN ({placeholders})",
+                        (key, *candidates),
+                    )
+                }
+                claimed = [
+                    accommodation
+                    for accommodation_id, accommodation in candidates.items()
+                    if accommodation_id not in existing
+                    or self._is_expired(existing[accommodation_id][1], now)
+                    or existing[accommodation_id][0] != _price_key(accommodation)
+                ]
+                rows = [(key, a.id, _price_key(a), now) for a in claimed]
+                self._connection.executemany(
+                    """
+                    INSERT INTO seen_accommodations (conf_key, accommodation_id, price, last_seen)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (conf_key, accommodation_id)
+                    DO UPDATE SET price = excluded.price, last_seen = excluded.last_seen
+                    """,
+                    rows,
+                )
+                self._connection.commit()
+            except BaseException:
+                self._connection.rollback()
+                raise
+            seen = self._index.setdefault(key, {})
+            seen.update(existing)
+            for _, accommodation_id, price, last_seen in rows:
+                seen[accommodation_id] = (price, last_seen)
+        return claimed
+
+    def _refresh(self, key: str, accommodation_ids: List[int]) -> None:
+        """Reads the entries of the given accommodations from the disk, where other processes may have written them."""
+        if not accommodation_ids:
+            return
+        placeholders = ",".join("?" * len(accommodation_ids))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT accommodation_id, price, last_seen FROM seen_accommodations "
+                f"WHERE conf_key = ? AND accommodation_id IN ({placeholders})",
+                (key, *accommodation_ids),
+            ).fetchall()
+            seen = self._index.setdefault(key, {})
+            for accommodation_id, price, last_seen in rows:
+                seen[accommodation_id] = (price, last_seen)
+
+    def mark_seen(self, key: str, accommodations: Iterable[Accommodation]) -> None:
+        """Records the given accommodations as seen now by the given configuration key."""
+        now = time.time()
+        rows = [
+            (key, accommodation.id, _price_key(accommodation), now)
+            for accommodation in accommodations
+            if accommodation.id is not None
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    """
+                    INSERT INTO seen_accommodations (conf_key, accommodation_id, price, last_seen)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (conf_key, accommodation_id)
+                    DO UPDATE SET price = excluded.price, last_seen = excluded.last_seen
+                    """,
+                    rows,
+                )
+            seen = self._index.setdefault(key, {})
+            for _, accommodation_id, price, last_seen in rows:
+                seen[accommodation_id] = (price, last_seen)
+
+    def purge_expired(self) -> None:
+        """Deletes the expired entries from the disk and the in-memory index."""
+        if self.ttl_seconds is None:
+            return
+
+        threshold = time.time() - self.ttl_seconds
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM seen_accommodations WHERE last_seen < ?", (threshold,)
+                )
+            for seen in self._index.values():
+                for accommodation_id in [i for i, (_, t) in seen.items() if t < threshold]:
+                    del seen[accommodation_id]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
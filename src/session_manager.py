@@ -0,0 +1,192 @@
+import logging
+import os
+import queue
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
+
+from src.metrics import metrics
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+    from src.authenticator import Authenticator
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SessionExpiredError(Exception):
+    """Raised when a page shows that the session is no longer authenticated."""
+
+
+def _children_pids(pid: int) -> list[int]:
+    children: list[int] = []
+    task_dir = f"/proc/{pid}/task"
+    try:
+        for tid in os.listdir(task_dir):
+            with open(f"{task_dir}/{tid}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def process_tree_rss_mb(pid: int) -> Optional[float]:
+    """Returns the resident memory (in MB) of a process and all its descendants.
+
+    Only supported on Linux (reads /proc), returns None elsewhere.
+    """
+    if not os.path.isdir(f"/proc/{pid}"):
+        return None
+
+    total = 0.0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += _rss_mb(current)
+        stack.extend(_children_pids(current))
+    return total
+
+
+class SessionManager:
+    """Keeps a single authenticated WebDriver alive across polling cycles.
+
+    The driver is only re-authenticated when the session is detected as expired,
+    and the browser is recycled after `max_cycles` cycles or when its memory usage
+    goes above `max_memory_mb`.
+    """
+
+    def __init__(
+        self,
+        driver_factory: Callable[[], "WebDriver"],
+        authenticator: "Authenticator",
+        max_cycles: int | None = None,
+        max_memory_mb: float | None = None,
+    ):
+        self.driver_factory = driver_factory
+        self.authenticator = authenticator
+        self.max_cycles = max_cycles
+        self.max_memory_mb = max_memory_mb
+
+        self._driver: "WebDriver | None" = None
+        self._cycles = 0
+
+    @property
+    def driver(self) -> "WebDriver":
+        """Returns the current driver, starting and authenticating a new one if needed."""
+        if self._driver is None:
+            logger.info("Starting a new browser session")
+            with metrics.timer("crous_driver_start_seconds"):
+                self._driver = self.driver_factory()
+            self._cycles = 0
+            try:
+                self.authenticator.authenticate_driver(self._driver)
+            except Exception:
+                self.close()
+                raise
+        return self._driver
+
+    def run(self, action: Callable[["WebDriver"], T]) -> T:
+        """Runs `action` with the authenticated driver.
+
+        If the action reports an expired session, the driver is re-authenticated
+        and the action is retried once.
+        """
+        try:
+            return action(self.driver)
+        except SessionExpiredError as e:
+            logger.warning(f"Session expired ({e}), re-authenticating")
+            self.reauthenticate()
+            return action(self.driver)
+
+    def reauthenticate(self) -> None:
+        """Re-authenticates the current driver, or starts a new one if authentication fails."""
+        if self._driver is None:
+            return
+        try:
+            self.authenticator.authenticate_driver(self._driver)
+        except Exception:
+            logger.exception("Re-authentication failed, restarting the browser")
+            self.close()
+
+    def end_cycle(self) -> None:
+        """Marks the end of a polling cycle, recycling the browser if a limit is reached."""
+        if self._driver is None:
+            return
+
+        self._cycles += 1
+
+        if self.max_cycles is not None and self._cycles >= self.max_cycles:
+            logger.info(f"Recycling the browser after {self._cycles} cycles")
+            self.close()
+            return
+
+        if self.max_memory_mb is not None:
+            memory_mb = self._driver_memory_mb()
+            if memory_mb is not None and memory_mb > self.max_memory_mb:
+                logger.info(
+                    f"Recycling the browser: using {memory_mb:.0f} MB (limit {self.max_memory_mb:.0f} MB)"
+                )
+                self.close()
+
+    def close(self) -> None:
+        if self._driver is None:
+            return
+        try:
+            self._driver.quit()
+        except Exception:
+            logger.exception("Error while closing the browser")
+        finally:
+            self._driver = None
+
+    def _driver_memory_mb(self) -> float | None:
+        service = getattr(self._driver, "service", None)
+        process = getattr(service, "process", None)
+        if process is None:
+            return None
+        return process_tree_rss_mb(process.pid)
+
+
+class SessionPool:
+    """Pool of browser sessions, each used by a single thread at a time.
+
+    WebDriver objects are not thread-safe, so concurrent searches check out a
+    session for the duration of one action and wait when all of them are busy.
+    """
+
+    def __init__(self, sessions: list[SessionManager]):
+        if not sessions:
+            raise ValueError("A session pool needs at least one session")
+        self.sessions = sessions
+        self._available: queue.Queue[SessionManager] = queue.Queue()
+        for session in sessions:
+            self._available.put(session)
+
+    def run(self, action: Callable[["WebDriver"], T]) -> T:
+        session = self._available.get()
+        try:
+            return session.run(action)
+        finally:
+            self._available.put(session)
+
+    def end_cycle(self) -> None:
+        for session in self.sessions:
+            session.end_cycle()
+
+    def close(self) -> None:
+        for session in self.sessions:
+            session.close()
+
+
+BrowserSession = SessionManager | SessionPool
@@ -1,5 +1,7 @@
 # pydantic-settings class
 
+from functools import lru_cache
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -12,6 +14,9 @@ class Settings(BaseSettings):
         extra="ignore",
     )
 
+    # Base URL of the CROUS accommodation website (can point to a local mock server)
+    CROUS_BASE_URL: str = "https://trouverunlogement.lescrous.fr"
+
     # Initial login URL (will redirect to dispatcher with a fresh login_challenge)
     MSE_INITIAL_LOGIN_URL: str = (
         "https://messervices.etudiant.gouv.fr/oauth2/login"
@@ -26,4 +31,120 @@ class Settings(BaseSettings):
     MSE_PASSWORD: str = Field(default=...)
 
     TELEGRAM_BOT_TOKEN: str = Field(default=...)
+    # Base URL of the Telegram Bot API (can point to a local mock server)
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
     MY_TELEGRAM_ID: str = Field(default=...)
+    # Maximum number of keep-alive connections to the Bot API (botapi backend)
+    TELEGRAM_POOL_SIZE: int = Field(default=20)
+
+    # Users configurations (.json, .yaml or .sqlite3), reloaded when they change. When None, a single
+    # configuration is built from the command line options
+    USERS_CONFIG_PATH: str | None = Field(default=None)
+    # Maximum delay before a configuration change is picked up
+    USERS_CONFIG_RELOAD_SECONDS: float = Field(default=10)
+
+    # Browser session reuse: recycle the browser after this many polling cycles
+    SESSION_MAX_CYCLES: int | None = Field(default=50)
+    # ...or when the browser process tree uses more than this amount of memory (MB)
+    SESSION_MAX_MEMORY_MB: float | None = Field(default=1500)
+    # ...or when this many searches failed in a row
+    SESSION_MAX_CONSECUTIVE_FAILURES: int = Field(default=3)
+    # Remote Selenium server driving the browser (e.g. http://chrome:4444), a local browser is started when None
+    SELENIUM_REMOTE_URL: str | None = Field(default=None)
+    # Whether a browser is installed locally (false in the slim Docker image): SELENIUM_REMOTE_URL is required otherwise
+    LOCAL_BROWSER: bool = Field(default=True)
+
+    # HTTP fetch backend
+    HTTP_TIMEOUT_SECONDS: float = Field(default=15)
+    # JSON search endpoint used by the website front end, e.g.
+    # "https://trouverunlogement.lescrous.fr/api/fr/search/{tool_id}". Disabled when empty.
+    CROUS_SEARCH_API_URL: str | None = Field(default=None)
+
+    # Per-step timeouts (seconds) for the browser waits
+    WAIT_LOGIN_CHALLENGE_TIMEOUT: float = Field(default=15)
+    WAIT_LOGIN_FORM_TIMEOUT: float = Field(default=10)
+    WAIT_LOGIN_REDIRECT_TIMEOUT: float = Field(default=15)
+    WAIT_RESULTS_TIMEOUT: float = Field(default=15)
+
+    # Concurrent searches
+    SEARCH_CONCURRENCY: int = Field(default=4)
+    # Number of browsers used for concurrent Selenium searches (each one logs in separately)
+    SEARCH_BROWSERS: int = Field(default=1)
+    # Split the search areas into shared tiles of this size (degrees), each tile being searched once for
+    # all the configurations overlapping it; disabled when None. Accommodations are routed to the
+    # configurations whose area contains them, which needs their coordinates: ENRICH_DETAILS, or the search API
+    # (CROUS_SEARCH_API_URL with the HTTP backend)
+    SEARCH_TILE_DEGREES: float | None = Field(default=None)
+    # Areas spanning more tiles than this keep their own search
+    SEARCH_TILE_MAX_TILES: int = Field(default=16)
+    # Minimum delay between two requests sent to the same host (seconds)
+    RATE_LIMIT_PER_HOST_SECONDS: float = Field(default=1.0)
+
+    # Accommodations already notified, so that only new ones are sent
+    SEEN_STORE_PATH: str = Field(default="seen_accommodations.sqlite3")
+    # Forget accommodations that were not seen for this long, so that they are notified again when relisted
+    SEEN_TTL_HOURS: float | None = Field(default=72)
+
+    # Sharded mode: the searches are split among the workers sharing this lease store (disabled when empty).
+    # SEEN_STORE_PATH must then be shared by the workers too.
+    SHARD_STORE_PATH: str | None = Field(default=None)
+    # Id of this worker, required in sharded mode. It must stay the same across restarts: the messages still pending
+    # in the delivery queue of the worker are only sent when a worker with the same id starts again
+    SHARD_WORKER_ID: str | None = Field(default=None)
+    # A worker that did not renew its lease for this long is considered dead, and its searches go to the others
+    SHARD_LEASE_SECONDS: float = Field(default=30)
+
+    # Fetch the detail page of newly seen accommodations (floor area, rent, availability date) for the notifications
+    ENRICH_DETAILS: bool = Field(default=False)
+    DETAIL_FETCH_CONCURRENCY: int = Field(default=4)
+    # Details already fetched, so that each detail page is only fetched once
+    DETAIL_CACHE_PATH: str = Field(default="accommodation_details.sqlite3")
+    DETAIL_CACHE_TTL_HOURS: float | None = Field(default=72)
+    DETAIL_CACHE_MAX_ENTRIES: int | None = Field(default=20000)
+    # Archive of every accommodation found by the searches, queried with `python -m src.archive` (disabled when empty)
+    LISTING_ARCHIVE_PATH: str | None = Field(default=None)
+
+    # Send a short alert as soon as a results page holds a new accommodation, edited into the full notification later
+    FAST_ALERTS: bool = Field(default=False)
+
+    # HTML parser backend: "auto" (lxml when installed), "lxml" or "html.parser"
+    PARSER_BACKEND: str = Field(default="auto")
+
+    # Skip parsing and notifying when the results of a search did not change since the last poll (page fingerprints,
+    # ETag/Last-Modified). The whole pipeline still runs at least once every PAGE_CACHE_MAX_AGE_SECONDS
+    PAGE_FINGERPRINTS: bool = Field(default=True)
+    PAGE_CACHE_MAX_AGE_SECONDS: float | None = Field(default=3600)
+
+    # Result pages of a single search fetched concurrently, and maximum number of pages crawled
+    PAGE_FETCH_CONCURRENCY: int = Field(default=4)
+    MAX_RESULT_PAGES: int = Field(default=50)
+
+    # Adaptive polling: per-search intervals tighten when listings change and back off otherwise
+    POLL_MIN_INTERVAL_SECONDS: int = Field(default=60)
+    POLL_MAX_INTERVAL_SECONDS: int = Field(default=1800)
+    # Random variation of each interval, as a fraction of it
+    POLL_JITTER: float = Field(default=0.1)
+    # Global cap on the number of searches polled per minute
+    MAX_POLLS_PER_MINUTE: float | None = Field(default=20)
+
+    # Outbound Telegram messages waiting to be delivered
+    DELIVERY_QUEUE_PATH: str = Field(default="delivery_queue.sqlite3")
+    # Messages sent concurrently to different chats, they share the Bot API connection pool
+    DELIVERY_WORKERS: int = Field(default=8)
+    # Telegram limits: about one message per second per chat, and 30 per second overall
+    DELIVERY_PER_CHAT_INTERVAL_SECONDS: float = Field(default=1.0)
+    DELIVERY_GLOBAL_PER_SECOND: float = Field(default=25)
+    # Seconds to wait for pending messages to be sent when shutting down
+    DELIVERY_DRAIN_TIMEOUT_SECONDS: float = Field(default=30)
+
+    # Prometheus metrics endpoint (http://METRICS_HOST:METRICS_PORT/metrics), disabled when METRICS_PORT is None
+    METRICS_HOST: str = Field(default="127.0.0.1")
+    METRICS_PORT: int | None = Field(default=None)
+    # One JSON line per polling cycle is appended to this file (e.g. metrics.jsonl), disabled when None
+    METRICS_JSONL_PATH: str | None = Field(default=None)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Returns the settings, read from the environment and the .env file the first time they are needed."""
+    return Settings()
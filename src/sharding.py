@@ -0,0 +1,226 @@
+"""Distribution of the searches among several worker processes.
+
+Workers share a small SQLite lease store (on a disk they can all lock, so a local
+or reliably locked shared disk). Each worker renews its heartbeat in it every
+third of `lease_seconds`. One of them holds the leader lease, and assigns each
+search URL of the plan to exactly one live worker, which only runs the searches
+assigned to it.
+
+A worker whose heartbeat expired is considered dead: its searches go to the
+others right away. When a worker joins, the leader moves searches to it from the
+busiest workers, giving the current owner `lease_seconds` to let them go before
+the new owner starts running them.
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ShardCoordinator:
+    """Lease-based assignment of the searches to the live workers of a shared SQLite store.
+
+    `owned` keeps the searches of a plan assigned to this worker, and tells the
+    leader which searches there are. Heartbeats are renewed by a background
+    thread once `start` is called, or by calling `heartbeat`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        worker_id: str,
+        lease_seconds: float = 30,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Search URLs of the last plan, None until a plan was seen
+        self._search_urls: Optional[List[str]] = None
+        self._owned: set[str] = set()
+        self.is_leader = False
+
+        # Transactions are started explicitly, so that they lock the store from their start
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS shard_workers (
+                worker_id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS shard_leader (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                worker_id TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS shard_assignments (
+                search_url TEXT PRIMARY KEY,
+                worker_id TEXT NOT NULL,
+                not_before REAL NOT NULL
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def owned(self, plan: Dict[str, T]) -> Dict[str, T]:
+        """Returns the searches of the plan assigned to this worker."""
+        with self._lock:
+            self._search_urls = sorted(plan)
+            owned = self._owned
+        return {search_url: value for search_url, value in plan.items() if search_url in owned}
+
+    def heartbeat(self) -> None:
+        """Renews the lease of this worker, rebalances the searches when leader, and reads its assignments."""
+        now = self.clock()
+        with self._lock:
+            search_urls = self._search_urls
+
+        with self._transaction():
+            self._connection.execute(
+                "INSERT INTO shard_workers (worker_id, heartbeat) VALUES (?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (self.worker_id, now),
+            )
+            self._connection.execute(
+                "DELETE FROM shard_workers WHERE heartbeat < ?", (now - self.lease_seconds,)
+            )
+            self.is_leader = self._acquire_leadership(now)
+            if self.is_leader and search_urls is not None:
+                self._rebalance(search_urls, now)
+            owned = {
+                search_url
+                for (search_url,) in self._connection.execute(
+                    "SELECT search_url FROM shard_assignments WHERE worker_id = ? AND not_before <= ?",
+                    (self.worker_id, now),
+                )
+            }
+
+        with self._lock:
+            if owned != self._owned:
+                logger.info(f"Worker {self.worker_id} now runs {len(owned)} searches")
+            self._owned = owned
+        metrics.set("crous_shard_searches", len(owned))
+        metrics.set("crous_shard_leader", int(self.is_leader))
+
+    def _acquire_leadership(self, now: float) -> bool:
+        self._connection.execute(
+            """
+            INSERT INTO shard_leader (id, worker_id, expires_at) VALUES (0, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at
+            WHERE shard_leader.worker_id = excluded.worker_id OR shard_leader.expires_at < ?
+            """,
+            (self.worker_id, now + self.lease_seconds, now),
+        )
+        (leader,) = self._connection.execute("SELECT worker_id FROM shard_leader WHERE id = 0").fetchone()
+        return leader == self.worker_id
+
+    def _rebalance(self, search_urls: List[str], now: float) -> None:
+        workers = [w for (w,) in self._connection.execute("SELECT worker_id FROM shard_workers ORDER BY worker_id")]
+        assignments: dict[str, str] = dict(
+            self._connection.execute("SELECT search_url, worker_id FROM shard_assignments").fetchall()
+        )
+        # Searches removed from the plan, or assigned to dead workers, are released
+        live = set(workers)
+        wanted = set(search_urls)
+        released = [u for u, w in assignments.items() if u not in wanted or w not in live]
+        for search_url in released:
+            del assignments[search_url]
+        self._connection.executemany(
+            "DELETE FROM shard_assignments WHERE search_url = ?", [(u,) for u in released]
+        )
+
+        load: dict[str, List[str]] = {w: [] for w in workers}
+        for search_url, worker in sorted(assignments.items()):
+            load[worker].append(search_url)
+        target = math.ceil(len(search_urls) / len(workers))
+
+        moves: list[tuple[str, str, float]] = []
+        # Unassigned searches can start right away
+        for search_url in (u for u in search_urls if u not in assignments):
+            worker = min(workers, key=lambda w: len(load[w]))
+            load[worker].append(search_url)
+            moves.append((search_url, worker, now))
+        # Searches moved from a live worker only start once it had time to let them go
+        for worker in workers:
+            while len(load[worker]) > target:
+                receiver = min(workers, key=lambda w: len(load[w]))
+                if len(load[receiver]) + 1 >= len(load[worker]):
+                    break
+                search_url = load[worker].pop()
+                load[receiver].append(search_url)
+                moves.append((search_url, receiver, now + self.lease_seconds))
+
+        self._connection.executemany(
+            "INSERT INTO shard_assignments (search_url, worker_id, not_before) VALUES (?, ?, ?) "
+            "ON CONFLICT (search_url) DO UPDATE SET worker_id = excluded.worker_id, not_before = excluded.not_before",
+            moves,
+        )
+        if moves or released:
+            logger.info(
+                f"Rebalanced {len(search_urls)} searches among {len(workers)} workers "
+                f"({len(moves)} assigned, {len(released)} released)"
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """`BEGIN IMMEDIATE` transaction: the store is locked from its start, so workers never act on stale reads."""
+        with self._db_lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def workers(self) -> List[str]:
+        """Returns the live workers, as of the last heartbeats."""
+        with self._db_lock:
+            return [w for (w,) in self._connection.execute("SELECT worker_id FROM shard_workers ORDER BY worker_id")]
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="shard-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.heartbeat()
+            except Exception:
+                # The current assignments are kept until the lease can be renewed
+                logger.exception("Could not renew the shard lease")
+            self._stop.wait(self.lease_seconds / 3)
+
+    def stop(self) -> None:
+        """Stops the heartbeats and hands the searches of this worker over to the others."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._transaction():
+            self._connection.execute("DELETE FROM shard_workers WHERE worker_id = ?", (self.worker_id,))
+            self._connection.execute("DELETE FROM shard_assignments WHERE worker_id = ?", (self.worker_id,))
+            self._connection.execute("DELETE FROM shard_leader WHERE worker_id = ?", (self.worker_id,))
+        with self._lock:
+            self._owned = set()
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._connection.close()
@@ -1,14 +1,127 @@
+import logging
+from typing import TYPE_CHECKING, Protocol
+
+from src.bot_api_client import MEDIA_GROUP_MAX_SIZE, BotApiClient, EventLoopThread
 from src.models import Notification
-from telepot import Bot  # type: ignore
+
+if TYPE_CHECKING:
+    from telepot import Bot  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+def set_bot_api_url(base_url: str) -> None:
+    """Makes telepot send its requests to the given Bot API base URL (e.g. a local mock server)."""
+    # telepot is only imported when it is the selected backend
+    import telepot.api  # type: ignore
+
+    base_url = base_url.rstrip("/")
+
+    def _methodurl(req, **user_kw):
+        token, method, params, files = req
+        return f"{base_url}/bot{token}/{method}"
+
+    telepot.api._methodurl = _methodurl
+
+
+class Notifier(Protocol):
+    def send_notification(
+        self, telegramId: str, notification: Notification, parse_mode: str = "HTML"
+    ) -> int | None:
+        """Sends the notification, returns the id of its text message when known."""
+        ...
+
+    def edit_notification(
+        self, telegramId: str, message_id: int, notification: Notification, parse_mode: str = "HTML"
+    ) -> None:
+        """Replaces the text of a message already sent with the notification, then sends its photos."""
+        ...
 
 
 class TelegramNotifier:
     """Class that sends notifications to a Telegram user."""
 
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: "Bot"):
         self.bot = bot
 
     def send_notification(
         self, telegramId: str, notification: Notification, parse_mode: str = "HTML"
+    ) -> int | None:
+        message = self.bot.sendMessage(telegramId, notification.message, parse_mode=parse_mode)
+        self._send_photos(telegramId, notification)
+        return message.get("message_id") if isinstance(message, dict) else None
+
+    def edit_notification(
+        self, telegramId: str, message_id: int, notification: Notification, parse_mode: str = "HTML"
     ) -> None:
-        self.bot.sendMessage(telegramId, notification.message, parse_mode=parse_mode)
+        self.bot.editMessageText((telegramId, message_id), notification.message, parse_mode=parse_mode)
+        self._send_photos(telegramId, notification)
+
+    def _send_photos(self, telegramId: str, notification: Notification) -> None:
+        if notification.image_urls:
+            from telepot.namedtuple import InputMediaPhoto  # type: ignore
+
+            try:
+                for start in range(0, len(notification.image_urls), MEDIA_GROUP_MAX_SIZE):
+                    group = notification.image_urls[start : start + MEDIA_GROUP_MAX_SIZE]
+                    if len(group) == 1:
+                        self.bot.sendPhoto(telegramId, group[0])
+                    else:
+                        self.bot.sendMediaGroup(
+                            telegramId, [InputMediaPhoto(type="photo", media=url) for url in group]
+                        )
+            except Exception as e:
+                # The text holds all the information, photos are a best effort
+                logger.warning(f"Could not send photos to {telegramId}: {e}")
+
+
+class BotApiNotifier:
+    """Sends notifications through the Bot API with a pooled asynchronous client.
+
+    The client runs in its own event loop thread: the synchronous `send_notification`
+    can be called concurrently from many delivery workers, and all their requests
+    share the same keep-alive connections.
+    """
+
+    def __init__(self, client: BotApiClient):
+        self.client = client
+        self._loop_thread = EventLoopThread(name="telegram")
+
+    def get_me(self) -> dict:
+        return self._loop_thread.run(self.client.get_me())
+
+    def send_notification(
+        self, telegramId: str, notification: Notification, parse_mode: str = "HTML"
+    ) -> int | None:
+        return self._loop_thread.run(self.send_notification_async(telegramId, notification, parse_mode))
+
+    def edit_notification(
+        self, telegramId: str, message_id: int, notification: Notification, parse_mode: str = "HTML"
+    ) -> None:
+        self._loop_thread.run(self.edit_notification_async(telegramId, message_id, notification, parse_mode))
+
+    async def send_notification_async(
+        self, telegramId: str, notification: Notification, parse_mode: str = "HTML"
+    ) -> int | None:
+        message = await self.client.send_message(telegramId, notification.message, parse_mode=parse_mode)
+        await self._send_photos(telegramId, notification)
+        return message.get("message_id") if isinstance(message, dict) else None
+
+    async def edit_notification_async(
+        self, telegramId: str, message_id: int, notification: Notification, parse_mode: str = "HTML"
+    ) -> None:
+        await self.client.edit_message_text(telegramId, message_id, notification.message, parse_mode=parse_mode)
+        await self._send_photos(telegramId, notification)
+
+    async def _send_photos(self, telegramId: str, notification: Notification) -> None:
+        if notification.image_urls:
+            try:
+                await self.client.send_media_group(telegramId, notification.image_urls)
+            except Exception as e:
+                # The text holds all the information, photos are a best effort
+                logger.warning(f"Could not send photos to {telegramId}: {e}")
+
+    def close(self) -> None:
+        if not self._loop_thread.loop.is_closed():
+            self._loop_thread.run(self.client.close())
+        self._loop_thread.close()
@@ -0,0 +1,243 @@
+"""Geographic tiling of the searches.
+
+The `bounds=` rectangles of the configurations are split along a shared grid of
+canonical tiles, and each tile is searched once for all the configurations
+overlapping it: overlapping areas are not fetched several times, so the number of
+requests grows with the covered area rather than with the number of subscribers.
+
+The accommodations found in a tile are then routed to the configurations whose
+rectangle contains them, looked up in a grid-bucketed index of the rectangles.
+"""
+
+import logging
+from math import floor
+from typing import Generic, Iterable, Iterator, List, NamedTuple, Optional, Sequence, TypeVar
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from src.metrics import metrics
+from src.models import Accommodation, UserConf
+from src.search_api import parse_bounds
+from src.search_planner import normalize_search_url
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+Tile = tuple[int, int]
+
+
+class Rect(NamedTuple):
+    """A longitude/latitude rectangle."""
+
+    west: float
+    south: float
+    east: float
+    north: float
+
+    @classmethod
+    def from_search_url(cls, search_url: str) -> Optional["Rect"]:
+        """Returns the rectangle of the `bounds=` parameter of a search URL, whatever the order of its corners."""
+        bounds = parse_bounds(search_url)
+        if bounds is None:
+            return None
+        lon1, lat1, lon2, lat2 = bounds
+        return cls(min(lon1, lon2), min(lat1, lat2), max(lon1, lon2), max(lat1, lat2))
+
+    def contains(self, longitude: float, latitude: float) -> bool:
+        return self.west <= longitude <= self.east and self.south <= latitude <= self.north
+
+    def covers(self, other: "Rect") -> bool:
+        return (
+            self.west <= other.west
+            and self.south <= other.south
+            and other.east <= self.east
+            and other.north <= self.north
+        )
+
+    def to_bounds(self) -> str:
+        """Formats the rectangle as a `bounds=` value (north-west corner, then south-east corner)."""
+        return "_".join(_format_coordinate(v) for v in (self.west, self.north, self.east, self.south))
+
+
+def _format_coordinate(value: float) -> str:
+    return f"{value:.6f}".rstrip("0").rstrip(".")
+
+
+class TileGrid:
+    """Grid of square tiles of `size` degrees, aligned on the origin."""
+
+    def __init__(self, size: float):
+        if size <= 0:
+            raise ValueError("The tile size must be positive")
+        self.size = size
+
+    def tile_of(self, longitude: float, latitude: float) -> Tile:
+        return floor(longitude / self.size), floor(latitude / self.size)
+
+    def tiles(self, rect: Rect) -> Iterator[Tile]:
+        """Yields the tiles overlapping the rectangle."""
+        west, south = self.tile_of(rect.west, rect.south)
+        east, north = self.tile_of(rect.east, rect.north)
+        for x in range(west, east + 1):
+            for y in range(south, north + 1):
+                yield x, y
+
+    def tile_count(self, rect: Rect) -> int:
+        west, south = self.tile_of(rect.west, rect.south)
+        east, north = self.tile_of(rect.east, rect.north)
+        return (east - west + 1) * (north - south + 1)
+
+    def rect(self, tile: Tile) -> Rect:
+        x, y = tile
+        return Rect(x * self.size, y * self.size, (x + 1) * self.size, (y + 1) * self.size)
+
+
+class RectIndex(Generic[T]):
+    """Spatial index of rectangles, bucketed by the cells of a grid they overlap.
+
+    A point lookup only checks the rectangles of the cell holding the point.
+    """
+
+    def __init__(self, grid: TileGrid):
+        self.grid = grid
+        self._cells: dict[Tile, List[tuple[Rect, T]]] = {}
+
+    def add(self, rect: Rect, item: T) -> None:
+        for cell in self.grid.tiles(rect):
+            self._cells.setdefault(cell, []).append((rect, item))
+
+    def query(self, longitude: float, latitude: float) -> List[T]:
+        """Returns the items whose rectangle contains the point."""
+        return [
+            item
+            for rect, item in self._cells.get(self.grid.tile_of(longitude, latitude), [])
+            if rect.contains(longitude, latitude)
+        ]
+
+
+def _without_bounds(search_url: str) -> str:
+    """Returns the normalized search URL without its `bounds=` parameter: the criteria shared by its tiles."""
+    parsed = urlparse(normalize_search_url(search_url))
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if k != "bounds"]
+    return urlunparse(parsed._replace(query=urlencode(query, safe="_,.")))
+
+
+def _with_bounds(search_url: str, rect: Rect) -> str:
+    parsed = urlparse(search_url)
+    query = sorted([*parse_qsl(parsed.query), ("bounds", rect.to_bounds())])
+    return urlunparse(parsed._replace(query=urlencode(query, safe="_,.")))
+
+
+class TilePlan:
+    """Searches to run once the rectangles of the configurations are split into tiles.
+
+    `searches` maps each search URL (a tile, or the URL of a configuration that is
+    not tiled) to the configurations it serves, like `plan_searches`. Configurations
+    without bounds, or whose rectangle spans more than `max_tiles` tiles, keep their
+    own search URL: splitting them would cost more requests than it saves.
+    """
+
+    def __init__(self, grid: TileGrid, user_confs: Sequence[UserConf], max_tiles: int = 16):
+        self.grid = grid
+        self.searches: dict[str, List[UserConf]] = {}
+        # Rectangles of the tiled configurations, in cells smaller than the tiles
+        self._index: RectIndex[UserConf] = RectIndex(TileGrid(grid.size / 4))
+        self._rects: dict[int, Rect] = {}
+        # Tile search URL -> rectangle of the tile
+        self._tile_rects: dict[str, Rect] = {}
+
+        for conf in user_confs:
+            search_url = str(conf.search_url)
+            rect = Rect.from_search_url(search_url)
+            if rect is None or grid.tile_count(rect) > max_tiles:
+                self.searches.setdefault(normalize_search_url(search_url), []).append(conf)
+                continue
+
+            self._index.add(rect, conf)
+            self._rects[id(conf)] = rect
+            base_url = _without_bounds(search_url)
+            for tile in grid.tiles(rect):
+                tile_rect = grid.rect(tile)
+                tile_url = _with_bounds(base_url, tile_rect)
+                self.searches.setdefault(tile_url, []).append(conf)
+                self._tile_rects[tile_url] = tile_rect
+
+    def route(
+        self,
+        search_url: str,
+        confs: Sequence[UserConf],
+        all_matched: Sequence[List[Accommodation]],
+    ) -> List[List[Accommodation]]:
+        """Keeps, for each configuration, the accommodations of a tile located inside its own rectangle.
+
+        `all_matched` holds the accommodations matched by each configuration of
+        `confs`. Accommodations without coordinates cannot be placed: they are kept
+        for every configuration of the tile rather than missed.
+        """
+        tile_rect = self._tile_rects.get(search_url)
+        if tile_rect is None:
+            return list(all_matched)
+
+        # id(accommodation) -> ids of the configurations whose rectangle contains it
+        subscribers: dict[int, Optional[set[int]]] = {}
+        routed: List[List[Accommodation]] = []
+        for conf, matched in zip(confs, all_matched):
+            rect = self._rects.get(id(conf))
+            if rect is None or rect.covers(tile_rect):
+                # Everything found in the tile is inside the rectangle
+                routed.append(matched)
+                continue
+            kept = []
+            for accommodation in matched:
+                if id(accommodation) not in subscribers:
+                    subscribers[id(accommodation)] = self._subscribers(accommodation)
+                located_in = subscribers[id(accommodation)]
+                if located_in is None or id(conf) in located_in:
+                    kept.append(accommodation)
+            routed.append(kept)
+
+        unlocated = sum(1 for located_in in subscribers.values() if located_in is None)
+        if unlocated:
+            metrics.inc("crous_unlocated_accommodations_total", unlocated)
+        return routed
+
+    def _subscribers(self, accommodation: Accommodation) -> Optional[set[int]]:
+        """Returns the ids of the configurations whose rectangle contains the accommodation, None if it has no coordinates."""
+        if accommodation.latitude is None or accommodation.longitude is None:
+            return None
+        return {id(conf) for conf in self._index.query(accommodation.longitude, accommodation.latitude)}
+
+
+class TilePlanner:
+    """Builds the tile plan of the configurations, again only when they change.
+
+    `route` uses the last plan built, so that it matches the searches being run.
+    """
+
+    def __init__(self, tile_size: float, max_tiles: int = 16):
+        self.grid = TileGrid(tile_size)
+        self.max_tiles = max_tiles
+        self._plan: TilePlan | None = None
+        self._confs: tuple[int, ...] = ()
+
+    def plan(self, user_confs: Iterable[UserConf]) -> dict[str, List[UserConf]]:
+        user_confs = list(user_confs)
+        confs_ids = tuple(id(conf) for conf in user_confs)
+        if self._plan is None or confs_ids != self._confs:
+            self._plan = TilePlan(self.grid, user_confs, self.max_tiles)
+            self._confs = confs_ids
+            logger.info(
+                f"{len(user_confs)} configurations planned as {len(self._plan.searches)} searches "
+                f"({self.grid.size:g}° tiles)"
+            )
+        return self._plan.searches
+
+    def route(
+        self,
+        search_url: str,
+        confs: Sequence[UserConf],
+        all_matched: Sequence[List[Accommodation]],
+    ) -> List[List[Accommodation]]:
+        if self._plan is None:
+            return list(all_matched)
+        return self._plan.route(search_url, confs, all_matched)
@@ -0,0 +1,59 @@
+import logging
+from collections import deque
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
+
+from src.metrics import metrics
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WaitRecorder:
+    """Keeps track of how long each named wait actually took."""
+
+    def __init__(self, history_size: int = 100):
+        self.history: deque[tuple[str, float, bool]] = deque(maxlen=history_size)
+
+    def record(self, step: str, seconds: float, succeeded: bool) -> None:
+        self.history.append((step, seconds, succeeded))
+        metrics.observe(
+            "crous_wait_seconds", seconds, step=step, outcome="ok" if succeeded else "timeout"
+        )
+
+
+wait_recorder = WaitRecorder()
+
+
+def timed_wait(
+    driver: "WebDriver",
+    condition: Callable[[Any], T],
+    timeout: float,
+    step: str,
+    poll_frequency: float = 0.1,
+) -> T:
+    """Waits until `condition` is truthy and records how long it took under `step`.
+
+    Raises selenium's TimeoutException if the condition is not met within `timeout` seconds.
+    """
+    # Importing the Selenium wait helpers pulls in the whole WebDriver client, only do it once a browser is used
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    start = perf_counter()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(condition)
+    except TimeoutException:
+        elapsed = perf_counter() - start
+        wait_recorder.record(step, elapsed, succeeded=False)
+        logger.warning(f"Wait '{step}' timed out after {elapsed:.2f}s")
+        raise
+
+    elapsed = perf_counter() - start
+    wait_recorder.record(step, elapsed, succeeded=True)
+    logger.debug(f"Wait '{step}' took {elapsed:.2f}s")
+    return result
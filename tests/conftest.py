@@ -0,0 +1,13 @@
+import pytest
+
+from src.settings import get_settings
+
+
+@pytest.fixture(autouse=True)
+def settings_env(monkeypatch):
+    """The tests never talk to the website or Telegram, but Settings requires credentials."""
+    for name in ("MSE_EMAIL", "MSE_PASSWORD", "TELEGRAM_BOT_TOKEN", "MY_TELEGRAM_ID"):
+        monkeypatch.setenv(name, "test")
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
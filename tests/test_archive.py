@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from src.archive import ListingArchive, PricePoint, main
+from src.models import Accommodation, SearchResults
+
+SEARCH_URL = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=4.8_45.8_4.9_45.7"
+HOUR = 3600
+
+
+def results(*accommodations: Accommodation) -> SearchResults:
+    return SearchResults(
+        search_url=SEARCH_URL,  # type: ignore
+        count=(len(accommodations), None),
+        accommodations=list(accommodations),
+    )
+
+
+def test_price_history_merges_observations_at_the_same_price(tmp_path):
+    now = [datetime(2026, 9, 1, 8).timestamp()]
+    archive = ListingArchive(str(tmp_path / "archive.sqlite3"), clock=lambda: now[0])
+    start = int(now[0])
+    for price in [400.0, 400.0, "de 380 à 420 €", None]:
+        archive.append(results(Accommodation(id=506, title="Résidence A", price=price)))
+        now[0] += HOUR
+
+    assert archive.price_history(506) == [
+        PricePoint(start, start + HOUR, 400.0),
+        PricePoint(start + 2 * HOUR, start + 2 * HOUR, 380.0),
+        PricePoint(start + 3 * HOUR, start + 3 * HOUR, None),
+    ]
+    assert archive.price_history(1) == []
+    assert len(archive) == 4
+    archive.close()
+
+
+def test_accommodations_appear_again_once_relisted(tmp_path):
+    path = str(tmp_path / "archive.sqlite3")
+    now = [datetime(2026, 9, 1, 8).timestamp()]
+    archive = ListingArchive(path, relist_after_seconds=6 * HOUR, clock=lambda: now[0])
+    archive.append(results(Accommodation(id=1, title="Résidence A - T1", price=300.0)))
+    now[0] += HOUR
+    archive.append(results(Accommodation(id=1, title="Résidence A - T1", price=300.0)))
+    archive.close()
+
+    # Restarted, and the accommodation was gone for a day
+    now[0] += 24 * HOUR
+    archive = ListingArchive(path, relist_after_seconds=6 * HOUR, clock=lambda: now[0])
+    archive.append(
+        results(
+            Accommodation(id=1, title="Résidence A - T1", price=300.0),
+            Accommodation(id=2, title="Résidence B - T2", price=500.0),
+        )
+    )
+
+    assert [i for i, _ in archive.appearances("résidence a")] == [1, 1]
+    # 08:00 on a Tuesday, then 09:00 on a Wednesday
+    assert archive.appearance_histogram("Résidence A") == {(1, 8): 1, (2, 9): 1}
+    archive.close()
+
+
+def test_cli(tmp_path, capsys):
+    path = str(tmp_path / "archive.sqlite3")
+    archive = ListingArchive(path)
+    archive.append(results(Accommodation(id=506, title="Résidence A", price=393.46)))
+    archive.close()
+
+    assert main(["--path", path, "price-history", "506"]) == 0
+    assert "393.46 €" in capsys.readouterr().out
+    assert main(["--path", path, "appearances", "Résidence A"]) == 0
+    assert "1 apparitions" in capsys.readouterr().out
+    assert main(["--path", path, "price-history", "1"]) == 1
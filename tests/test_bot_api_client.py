@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from src.bot_api_client import BotApiClient, EventLoopThread, TelegramApiError
+from src.delivery_queue import _is_permanent, _retry_after
+from src.models import Notification
+from src.telegram_notifier import BotApiNotifier
+
+
+async def start_fake_bot_api(calls: list, answers: dict) -> web.AppRunner:
+    async def handle(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        calls.append((method, await request.json()))
+        if method in answers:
+            status, body = answers[method]
+            return web.json_response(body, status=status)
+        return web.json_response({"ok": True, "result": {"message_id": len(calls)}})
+
+    app = web.Application()
+    app.router.add_post("/bottoken/{method}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def base_url(runner: web.AppRunner) -> str:
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}"
+
+
+def test_media_groups_are_split_in_albums_of_ten():
+    calls: list = []
+
+    async def scenario():
+        runner = await start_fake_bot_api(calls, {})
+        client = BotApiClient("token", base_url(runner))
+        try:
+            photos = [f"https://example.com/{i}.jpg" for i in range(11)]
+            await client.send_media_group("1", photos, caption="<b>Résidence</b>")
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+    assert [method for method, _ in calls] == ["sendMediaGroup", "sendPhoto"]
+    album = calls[0][1]["media"]
+    assert len(album) == 10
+    assert album[0]["caption"] == "<b>Résidence</b>"
+    assert "caption" not in album[1]
+    assert calls[1][1]["photo"] == "https://example.com/10.jpg"
+
+
+def test_api_errors_expose_code_and_retry_after():
+    calls: list = []
+    answers = {
+        "sendMessage": (
+            429,
+            {"ok": False, "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 3}},
+        ),
+        "getMe": (401, {"ok": False, "error_code": 401, "description": "Unauthorized"}),
+    }
+
+    async def scenario():
+        runner = await start_fake_bot_api(calls, answers)
+        client = BotApiClient("token", base_url(runner))
+        try:
+            with pytest.raises(TelegramApiError) as rate_limited:
+                await client.send_message("1", "hello")
+            with pytest.raises(TelegramApiError) as unauthorized:
+                await client.get_me()
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return rate_limited.value, unauthorized.value
+
+    rate_limited, unauthorized = asyncio.run(scenario())
+
+    assert _retry_after(rate_limited) == 3
+    assert not _is_permanent(rate_limited)
+    assert _is_permanent(unauthorized)
+
+
+def test_notifier_sends_text_then_photos_from_a_synchronous_caller():
+    calls: list = []
+    server_loop = EventLoopThread(name="fake-bot-api")
+    runner = server_loop.run(
+        start_fake_bot_api(calls, {"sendMediaGroup": (400, {"ok": False, "error_code": 400, "description": "Bad photo"})})
+    )
+    notifier = BotApiNotifier(BotApiClient("token", base_url(runner)))
+    try:
+        # A failing album does not fail the delivery of the text
+        notifier.send_notification(
+            "1",
+            Notification(message="hello", image_urls=["https://example.com/1.jpg", "https://example.com/2.jpg"]),
+        )
+    finally:
+        notifier.close()
+        server_loop.run(runner.cleanup())
+        server_loop.close()
+
+    assert [method for method, _ in calls] == ["sendMessage", "sendMediaGroup"]
+    assert calls[0][1] == {"chat_id": "1", "text": "hello", "parse_mode": "HTML", "disable_web_page_preview": True}
@@ -1,6 +1,12 @@
 import pytest
 from bs4 import BeautifulSoup
-from src.parser import Parser, parse_accommodation_card, parse_accommodations_summaries
+from src.parser import (
+    Parser,
+    SoupPageParser,
+    parse_accommodation_card,
+    parse_accommodations_summaries,
+)
+from src.card_fields import Amenity, Occupation, parse_card_fields
 from src.models import Accommodation
 from typing import Dict
 
@@ -40,3 +46,105 @@ def test_parse_accommodation_card(html: str, expected: Accommodation):
     assert result.title == expected.title
     assert result.image_url == expected.image_url
     assert result.price == expected.price
+
+
+def test_parse_accommodation_card_typed_fields():
+    html = next(html for html, expected in ground_truth.items() if expected.id == 1185)
+
+    result = parse_accommodation_card(BeautifulSoup(html, "html.parser"))
+
+    assert result is not None
+    assert result.surface == (35.0, 35.0)
+    assert result.occupations == Occupation.INDIVIDUEL | Occupation.COUPLE
+    assert result.bed_count == 2
+    assert result.amenities == (
+        Amenity.WC | Amenity.DOUCHE | Amenity.EVIER_PLAQUE | Amenity.FRIGO | Amenity.DUPLEX | Amenity.BALCON
+    )
+    assert (result.postal_code, result.city) == ("90000", "BELFORT")
+    assert not result.is_colocative
+
+
+@pytest.mark.parametrize(
+    "detail,occupations",
+    [
+        ("Colocation", Occupation.COLOCATION),
+        ("Colocation, Famille", Occupation.COLOCATION),
+        ("Colocation (3 places)", Occupation.COLOCATION),
+        ("Individuel, Couple", Occupation.INDIVIDUEL | Occupation.COUPLE),
+    ],
+)
+def test_occupations_are_found_among_unknown_labels(detail: str, occupations: Occupation):
+    fields = parse_card_fields(None, [detail, "WC, Douche"])
+
+    assert fields.occupations == occupations
+    assert fields.amenities == Amenity.WC | Amenity.DOUCHE
+
+
+def test_colocation_is_found_next_to_the_surface_or_the_beds():
+    assert parse_card_fields(None, ["Colocation 18 m²"]).occupations == Occupation.COLOCATION
+    fields = parse_card_fields(None, ["Colocation, 2 lits simples"])
+    assert (fields.occupations, fields.bed_count) == (Occupation.COLOCATION, 2)
+
+
+def test_labeled_flags():
+    assert Occupation.parse(" colocation ") == Occupation.COLOCATION
+    assert Amenity.parse("Micro-ondes") == Amenity.MICRO_ONDE
+    assert Amenity.parse("Piscine") is None
+    assert Amenity.from_labels(["WC", "wifi", "Piscine"]) == Amenity.WC | Amenity.INTERNET
+
+
+def make_search_page(cards_html: list[str], heading: str) -> str:
+    return (
+        "<html><body><main>"
+        f'<h2 class="SearchResults-desktop fr-h4 svelte-11sc5my">{heading}</h2>'
+        f'<ul class="fr-grid-row">{"".join(cards_html)}</ul>'
+        "</main></body></html>"
+    )
+
+
+@pytest.mark.parametrize(
+    "heading",
+    ["3 logements trouvés", "Aucun logement trouvé", "beaucoup de logements"],
+)
+def test_soup_page_parser(heading: str):
+    parsed = SoupPageParser().parse(make_search_page(list(ground_truth), heading))
+
+    assert parsed.has_results_heading
+    assert [a.id for a in parsed.accommodations] == [a.id for a in ground_truth.values()]
+    if heading.startswith("3"):
+        assert parsed.count == (3, 393.46)
+    elif heading.startswith("Aucun"):
+        assert parsed.count == (0, None)
+    else:
+        assert parsed.count is None
+
+
+def test_page_without_results_heading():
+    parsed = SoupPageParser().parse("<html><body><form id='login'></form></body></html>")
+
+    assert not parsed.has_results_heading
+
+
+@pytest.mark.parametrize("html", ground_truth.keys())
+def test_lxml_card_parser_matches_soup(html: str):
+    lxml_html = pytest.importorskip("lxml.html")
+    from src.lxml_parser import parse_card
+
+    expected = parse_accommodation_card(BeautifulSoup(html, "html.parser"))
+
+    assert parse_card(lxml_html.fromstring(html)) == expected
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        make_search_page(list(ground_truth), "3 logements trouvés"),
+        make_search_page([], "Aucun logement trouvé"),
+        "<html><body><p>Connexion</p></body></html>",
+    ],
+)
+def test_lxml_page_parser_matches_soup(html: str):
+    pytest.importorskip("lxml")
+    from src.lxml_parser import LxmlPageParser
+
+    assert LxmlPageParser().parse(html) == SoupPageParser().parse(html)
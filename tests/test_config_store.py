@@ -0,0 +1,81 @@
+import json
+import os
+import sqlite3
+
+from src.config_store import ConfigStore
+from src.models import UserConf
+
+LYON = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=4.67_45.94_5.06_45.52"
+PARIS = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=2.22_48.90_2.46_48.81"
+
+
+def write_json(path, data) -> None:
+    path.write_text(json.dumps(data))
+    # Make sure the change is visible even on filesystems with a coarse mtime
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_json_configurations_are_indexed_and_reloaded(tmp_path):
+    path = tmp_path / "users.json"
+    write_json(
+        path,
+        {
+            "users": [
+                {"conf_title": "A", "telegram_id": "1", "search_url": LYON, "max_price": 300},
+                {"conf_title": "B", "telegram_id": "2", "search_url": LYON + "#map"},
+                {"conf_title": "C", "telegram_id": "1", "search_url": PARIS},
+            ]
+        },
+    )
+    store = ConfigStore(str(path))
+
+    assert [c.conf_title for c in store.by_telegram_id["1"]] == ["A", "C"]
+    assert [len(confs) for confs in store.by_search_url.values()] == [2, 1]
+    assert not store.reload_if_changed()
+
+    write_json(path, [{"conf_title": "C", "telegram_id": "1", "search_url": PARIS}])
+
+    assert store.reload_if_changed()
+    assert [c.conf_title for c in store.confs] == ["C"]
+
+
+def test_invalid_entries_are_skipped_and_broken_files_ignored(tmp_path):
+    path = tmp_path / "users.json"
+    write_json(
+        path,
+        [
+            {"conf_title": "ok", "telegram_id": "1", "search_url": LYON},
+            {"conf_title": "no url", "telegram_id": "2"},
+        ],
+    )
+    store = ConfigStore(str(path))
+    assert [c.conf_title for c in store.confs] == ["ok"]
+
+    path.write_text('[{"conf_title": "half written"')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2_000_000_000))
+
+    assert not store.reload_if_changed()
+    assert [c.conf_title for c in store.confs] == ["ok"]
+
+
+def test_sqlite_store_picks_up_changes_from_other_connections(tmp_path):
+    path = str(tmp_path / "users.sqlite3")
+    store = ConfigStore(path)
+    store.add(UserConf(conf_title="A", telegram_id="1", search_url=LYON, max_price=250))  # type: ignore
+    assert store.confs[0].max_price == 250
+
+    other = sqlite3.connect(path)
+    with other:
+        other.execute(
+            "INSERT INTO user_confs (telegram_id, search_url, conf) VALUES (?, ?, ?)",
+            ("2", PARIS, json.dumps({"conf_title": "B", "is_colocative": True})),
+        )
+    other.close()
+
+    assert store.reload_if_changed()
+    assert store.by_telegram_id["2"][0].is_colocative
+
+    assert store.remove("1") == 1
+    assert list(store.by_telegram_id) == ["2"]
+    store.close()
@@ -0,0 +1,112 @@
+import time
+
+from src.delivery_queue import DeliveryQueue, split_message
+from src.models import Notification
+
+
+class TooManyRequests(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Too Many Requests")
+        self.json = {"parameters": {"retry_after": retry_after}}
+
+
+class FakeNotifier:
+    def __init__(self, failures: list[Exception] | None = None):
+        self.failures = failures or []
+        self.sent: list[tuple[str, str]] = []
+        self.edited: list[tuple[str, int, str]] = []
+
+    def send_notification(self, chat_id, notification, parse_mode="HTML"):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((chat_id, notification.message))
+        return len(self.sent)
+
+    def edit_notification(self, chat_id, message_id, notification, parse_mode="HTML"):
+        self.edited.append((chat_id, message_id, notification.message))
+
+
+def wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_split_message_keeps_paragraphs_together():
+    paragraphs = [f"<b>Residence {i}</b> " + "x" * 80 for i in range(100)]
+    text = "\n\n".join(paragraphs)
+
+    chunks = split_message(text, limit=1000)
+
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+    assert all(chunk.startswith("<b>Residence") for chunk in chunks)
+
+
+def test_split_message_hard_cuts_huge_lines():
+    chunks = split_message("a" * 2500, limit=1000)
+
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+
+
+def test_messages_are_delivered_in_order_and_retried(tmp_path):
+    notifier = FakeNotifier(failures=[TooManyRequests(retry_after=0.05)])
+    queue = DeliveryQueue(
+        notifier, str(tmp_path / "queue.sqlite3"), per_chat_interval=0, base_backoff=0.01
+    )
+    queue.start()
+
+    queue.enqueue("1", Notification(message="first"))
+    queue.enqueue("1", Notification(message="second"))
+    queue.enqueue("2", Notification(message="other chat"))
+
+    wait_for(lambda: len(notifier.sent) == 3)
+    queue.stop()
+
+    assert [m for chat, m in notifier.sent if chat == "1"] == ["first", "second"]
+    assert queue.pending_count() == 0
+
+
+def test_pending_messages_survive_restarts(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    queue = DeliveryQueue(FakeNotifier(), path)
+    queue.enqueue("1", Notification(message="not sent yet"))
+    queue.close()
+
+    notifier = FakeNotifier()
+    restarted = DeliveryQueue(notifier, path)
+    restarted.start()
+    wait_for(lambda: len(notifier.sent) == 1)
+    restarted.stop()
+
+    assert notifier.sent == [("1", "not sent yet")]
+
+
+def test_alerts_are_sent_first_then_edited_into_the_full_notification(tmp_path):
+    notifier = FakeNotifier()
+    queue = DeliveryQueue(notifier, str(tmp_path / "queue.sqlite3"), per_chat_interval=0)
+    queue.enqueue("2", Notification(message="older message"))
+    alert_id = queue.enqueue_alert("1", Notification(message="alert"), received_at=time.monotonic())
+    queue.enqueue("1", Notification(message="full notification"), replaces=alert_id)
+    queue.start()
+
+    wait_for(lambda: len(notifier.edited) == 1 and len(notifier.sent) == 2)
+    queue.stop()
+
+    assert notifier.sent == [("1", "alert"), ("2", "older message")]
+    assert notifier.edited == [("1", 1, "full notification")]
+
+
+def test_notifications_replacing_an_alert_already_sent_edit_it(tmp_path):
+    notifier = FakeNotifier()
+    queue = DeliveryQueue(notifier, str(tmp_path / "queue.sqlite3"), per_chat_interval=0)
+    queue.start()
+    alert_id = queue.enqueue_alert("1", Notification(message="alert"))
+    wait_for(lambda: len(notifier.sent) == 1)
+
+    queue.enqueue("1", Notification(message="full notification"), replaces=alert_id)
+    wait_for(lambda: len(notifier.edited) == 1)
+    queue.stop()
+
+    assert notifier.edited == [("1", 1, "full notification")]
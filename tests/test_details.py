@@ -0,0 +1,85 @@
+import threading
+from datetime import date
+from types import SimpleNamespace
+
+from src.details import DetailCache, DetailEnricher, parse_detail_page
+from src.models import Accommodation, AccommodationDetails, SearchResults
+from src.notification_builder import NotificationBuilder
+
+BASE_URL = "https://trouverunlogement.lescrous.fr"
+
+DETAIL_PAGE = (
+    "<html><body><main><h1>Logement 506</h1>"
+    '<div id="map" data-lat="45.757800" data-lng="4.832000"></div>'
+    "<p>Surface : 19 m²</p><p>Loyer : 393,46 €</p><p>Disponible à partir du 01/09/2026</p>"
+    "</main></body></html>"
+)
+
+
+class FakeHttpFetcher:
+    def __init__(self):
+        self.fetched: list[str] = []
+        self._lock = threading.Lock()
+
+    def fetch_html(self, url, headers=None):
+        with self._lock:
+            self.fetched.append(url)
+        return SimpleNamespace(url=url, text=DETAIL_PAGE, status_code=200, headers={})
+
+
+def test_parse_detail_page():
+    details = parse_detail_page(DETAIL_PAGE)
+
+    assert details == AccommodationDetails(
+        surface=19.0, rent=393.46, available_from=date(2026, 9, 1), latitude=45.7578, longitude=4.832
+    )
+    assert parse_detail_page("<h1>Page introuvable</h1>") is None
+
+
+def test_cache_expires_and_evicts_the_least_recently_used_entries(tmp_path):
+    now = [0.0]
+    cache = DetailCache(str(tmp_path / "details.sqlite3"), ttl_seconds=100, max_entries=2, clock=lambda: now[0])
+    cache.put_many({1: AccommodationDetails(surface=10), 2: AccommodationDetails(surface=20)})
+
+    now[0] = 10
+    assert cache.get_many([1]) == {1: AccommodationDetails(surface=10)}
+    now[0] = 20
+    cache.put_many({3: AccommodationDetails(surface=30)})
+
+    # 2 was used less recently than 1
+    assert sorted(cache.get_many([1, 2, 3])) == [1, 3]
+    now[0] = 115
+    assert sorted(cache.get_many([1, 3])) == [3]
+    cache.close()
+
+
+def test_enricher_only_fetches_the_pages_missing_from_the_cache(tmp_path):
+    fetcher = FakeHttpFetcher()
+    cache = DetailCache(str(tmp_path / "details.sqlite3"))
+    enricher = DetailEnricher(fetcher, cache, BASE_URL, max_workers=2)  # type: ignore
+    accommodations = [Accommodation(id=i, title=str(i), price=300.0) for i in (1, 2, 3)]
+    cache.put_many({2: AccommodationDetails(surface=25)})
+
+    enriched = enricher.enrich(accommodations)
+    enricher.enrich(accommodations)
+
+    assert sorted(fetcher.fetched) == [f"{BASE_URL}/tools/42/accommodations/{i}" for i in (1, 3)]
+    assert [a.details.surface for a in enriched] == [19.0, 25.0, 19.0]  # type: ignore
+    # The card had no coordinates, the detail page gives them
+    assert (enriched[0].latitude, enriched[0].longitude) == (45.7578, 4.832)
+    enricher.close()
+    cache.close()
+
+
+def test_notification_includes_the_details():
+    accommodation = Accommodation(
+        id=1, title="A", price=393.46, details=parse_detail_page(DETAIL_PAGE)
+    )
+    search_results = SearchResults(
+        search_url=f"{BASE_URL}/tools/42/search", count=(1, None), accommodations=[accommodation]  # type: ignore
+    )
+
+    notification = NotificationBuilder().search_results_notification(search_results)
+
+    assert notification is not None
+    assert "19 m² · loyer 393,46 € · disponible le 01/09/2026" in notification.message
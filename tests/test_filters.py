@@ -0,0 +1,132 @@
+from src.card_fields import Amenity, Occupation, parse_card_fields, parse_range
+from src.filters import CompiledFilter, FilterEngine, extract_features
+from src.models import Accommodation, UserConf
+
+LYON = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=4.67_45.94_5.06_45.52"
+
+
+def make_conf(**kwargs) -> UserConf:
+    return UserConf(conf_title=None, telegram_id="1", search_url=LYON, **kwargs)  # type: ignore
+
+
+def test_parse_range():
+    assert parse_range(393.46) == (393.46, 393.46)
+    assert parse_range("393,46 €") == (393.46, 393.46)
+    assert parse_range("de 418,4 à 481,2 €") == (418.4, 481.2)
+    assert parse_range("de 9,9 à 11,9 m²") == (9.9, 11.9)
+    assert parse_range("Prix non communiqué") is None
+    assert parse_range(None) is None
+
+
+def make_accommodation(id: int, price: float | str | None, details: str, **kwargs) -> Accommodation:
+    fields = parse_card_fields(None, details.split("\n"))
+    return Accommodation(
+        id=id, title=str(id), price=price, overview_details=details, **fields._asdict(), **kwargs
+    )
+
+
+def test_parse_card_fields():
+    fields = parse_card_fields(
+        "1, rue Gaston DEFERRE - 90000 BELFORT -",
+        ["de 18 à 22 m²", "Individuel, Couple", "1 lit simple, 1 lit rapprochable", "WC, Frigo, Balcon, Lave-vaisselle"],
+    )
+
+    assert fields.surface == (18.0, 22.0)
+    assert fields.occupations == Occupation.INDIVIDUEL | Occupation.COUPLE
+    assert fields.bed_count == 2
+    assert fields.amenities == Amenity.WC | Amenity.FRIGO | Amenity.BALCON
+    assert (fields.postal_code, fields.city) == ("90000", "BELFORT")
+
+
+def test_extract_features():
+    accommodation = make_accommodation(1, "de 418,4 à 481,2 €", "de 18 à 22 m²\nIndividuel, Couple\nFrigo, Balcon")
+
+    features = extract_features(accommodation)
+
+    assert features.price == (418.4, 481.2)
+    assert features.surface == (18.0, 22.0)
+    assert features.occupations == Occupation.INDIVIDUEL | Occupation.COUPLE
+    assert features.amenities == Amenity.FRIGO | Amenity.BALCON
+
+
+def test_price_ranges_match_when_they_overlap_the_bounds():
+    accommodation = Accommodation(id=1, title="A", price="de 418,4 à 481,2 €", is_colocative=False)
+    features = extract_features(accommodation)
+
+    assert CompiledFilter(max_price=450).matches(accommodation, features)
+    assert not CompiledFilter(max_price=400).matches(accommodation, features)
+    assert CompiledFilter(min_price=470).matches(accommodation, features)
+    assert not CompiledFilter(min_price=500).matches(accommodation, features)
+
+
+def test_filter_batch_matches_each_filter_on_its_own():
+    accommodations = [
+        make_accommodation(i, price, details, is_colocative=colocative)
+        for i, (price, details, colocative) in enumerate(
+            [
+                (400.0, "19 m²\nIndividuel\nFrigo", False),
+                (250.0, "25 m²\nColocation\nFrigo, Balcon", True),
+                ("de 300 à 400 €", "de 9 à 12 m²\nIndividuel, Couple", False),
+                (300.0, "Couple\nBalcon, Lave-vaisselle", False),
+                (None, "30 m²", True),
+                (250.0, "15 m²\nIndividuel\nFrigo, Balcon", False),
+            ]
+        )
+    ]
+    confs = [
+        make_conf(),
+        make_conf(max_price=300),
+        make_conf(max_price=300),
+        make_conf(min_price=350, ignored_ids=[0]),
+        make_conf(min_surface=18),
+        make_conf(max_surface=12, occupation_modes=["Couple"]),
+        make_conf(required_amenities=["balcon", "Frigo"]),
+        make_conf(required_amenities=["Balcon", "Lave-vaisselle"]),
+        make_conf(is_colocative=True, max_price=1000),
+    ]
+
+    matched = FilterEngine().filter_batch(accommodations, confs)
+
+    for conf, accommodations_matched in zip(confs, matched):
+        compiled = CompiledFilter.from_conf(conf)
+        expected = [a.id for a in accommodations if compiled.matches(a, extract_features(a))]
+        assert [a.id for a in accommodations_matched] == expected
+    assert [[a.id for a in m] for m in matched] == [
+        [0, 2, 3, 5],
+        [2, 3, 5],
+        [2, 3, 5],
+        [2],
+        [0],
+        [2],
+        [5],
+        [3],
+        [1],
+    ]
+
+
+def test_filter_batch_leaves_the_shared_accommodations_untouched():
+    accommodations = [
+        Accommodation(id=1, title="A", price=250.0, is_colocative=False),
+        Accommodation(id=2, title="B", price=350.0, is_colocative=False),
+    ]
+
+    matched = FilterEngine().filter_batch(accommodations, [make_conf(max_price=300), make_conf()])
+
+    assert [[a.id for a in m] for m in matched] == [[1], [1, 2]]
+    assert [a.id for a in accommodations] == [1, 2]
+
+
+def test_engine_compiles_each_configuration_once():
+    engine = FilterEngine()
+    conf = make_conf(max_price=300)
+
+    assert engine.compile(conf) is engine.compile(conf)
+
+    engine.forget_others([])
+    assert engine._compiled == {}
+
+
+def test_describe():
+    compiled = CompiledFilter.from_conf(make_conf(max_price=450.5, occupation_modes=["Individuel"]))
+
+    assert compiled.describe() == "prix max = 450,5€, occupation = Individuel, colocation = non"
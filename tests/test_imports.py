@@ -0,0 +1,8 @@
+import subprocess
+import sys
+
+
+def test_selenium_is_only_imported_once_a_browser_is_used():
+    # In a fresh interpreter, as other tests may already have imported Selenium
+    code = "import sys, main; sys.exit(any(name.startswith('selenium') for name in sys.modules))"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
@@ -0,0 +1,53 @@
+import urllib.request
+
+import pytest
+
+from src.metrics import MetricsRegistry, start_metrics_server
+
+
+def test_histograms_are_rendered_in_prometheus_format():
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.observe("crous_page_parse_seconds", 0.05, backend="lxml")
+    registry.observe("crous_page_parse_seconds", 0.5, backend="lxml")
+    registry.inc("crous_cards_parsed_total", 3)
+
+    text = registry.render()
+
+    assert "# TYPE crous_page_parse_seconds histogram" in text
+    assert 'crous_page_parse_seconds_bucket{backend="lxml",le="0.1"} 1' in text
+    assert 'crous_page_parse_seconds_bucket{backend="lxml",le="1"} 2' in text
+    assert 'crous_page_parse_seconds_bucket{backend="lxml",le="+Inf"} 2' in text
+    assert 'crous_page_parse_seconds_count{backend="lxml"} 2' in text
+    assert "crous_cards_parsed_total 3" in text
+
+
+def test_timer_records_the_outcome_and_cycles_are_reset():
+    registry = MetricsRegistry()
+    with registry.timer("crous_notification_send_seconds"):
+        pass
+    with pytest.raises(RuntimeError):
+        with registry.timer("crous_notification_send_seconds"):
+            raise RuntimeError("boom")
+
+    cycle = registry.end_cycle()
+
+    assert cycle['crous_notification_send_seconds{outcome="ok"}']["count"] == 1
+    assert cycle['crous_notification_send_seconds{outcome="error"}']["count"] == 1
+    assert registry.end_cycle() == {}
+    # The cumulative values are kept for Prometheus
+    assert 'crous_notification_send_seconds_count{outcome="error"} 1' in registry.render()
+
+
+def test_metrics_are_served_over_http():
+    registry = MetricsRegistry()
+    registry.set("crous_poll_interval_seconds", 350)
+    server = start_metrics_server(0, registry=registry)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert "crous_poll_interval_seconds 350" in body
@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+import requests
+
+from benchmarks.mock_server import MockServer, MockState
+from src.parser import SoupPageParser
+
+
+@pytest.fixture
+def base_url():
+    server = MockServer(("127.0.0.1", 0), MockState(results=30, page_size=24))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_search_pages_are_only_served_once_logged_in(base_url):
+    session = requests.Session()
+    response = session.get(f"{base_url}/tools/42/search?bounds=1_2_3_4")
+    assert "/login" in response.url
+
+    challenge = response.url.split("login_challenge=")[1]
+    session.post(f"{base_url}/login?login_challenge={challenge}", data={"login": "user", "password": "secret"})
+    pages = [
+        SoupPageParser().parse(session.get(f"{base_url}/tools/42/search?bounds=1_2_3_4&page={page}").text)
+        for page in (1, 2)
+    ]
+
+    assert pages[0].count is not None and pages[0].count[0] == 30
+    assert pages[0].page_count == 2
+    assert [len(page.accommodations) for page in pages] == [24, 6]
+    assert requests.get(f"{base_url}/__mock__/stats").json()["sessions"] == 1
+
+
+def test_telegram_messages_are_recorded(base_url):
+    response = requests.post(f"{base_url}/bot123:abc/sendMessage", json={"chat_id": "1", "text": "Bonjour"})
+    message_id = response.json()["result"]["message_id"]
+    response = requests.post(
+        f"{base_url}/bot123:abc/editMessageText", json={"chat_id": "1", "message_id": message_id, "text": "Modifié"}
+    )
+
+    assert response.json()["ok"]
+    stats = requests.get(f"{base_url}/__mock__/stats").json()
+    assert stats["telegram_messages"] == 2
+    assert stats["requests"]["telegram sendMessage"] == 1
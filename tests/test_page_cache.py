@@ -0,0 +1,29 @@
+from src.page_cache import PageCache, page_fingerprint
+
+
+def make_page(results: str, token: str) -> str:
+    return (
+        f'<html><head><meta name="csrf" content="{token}"></head><body><main>'
+        f'<h2 class="SearchResults-desktop">{results}</h2></main><script>{token}</script></body></html>'
+    )
+
+
+def test_page_fingerprint_only_covers_the_results():
+    assert page_fingerprint(make_page("3 logements", "a")) == page_fingerprint(make_page("3 logements", "b"))
+    assert page_fingerprint(make_page("3 logements", "a")) != page_fingerprint(make_page("4 logements", "a"))
+    assert page_fingerprint("<html><body>Connexion</body></html>") is None
+
+
+def test_page_cache_match():
+    now = [0.0]
+    cache: PageCache[str] = PageCache(max_age_seconds=60, clock=lambda: now[0])
+    cache.put("page", "abc", "parsed")
+
+    assert cache.match("page", "abc") == "parsed"
+    assert cache.match("page", "def") is None
+    assert cache.match("page", None) is None
+    assert cache.match("other", "abc") is None
+
+    # Old entries are ignored, so that the whole pipeline runs from time to time
+    now[0] = 61
+    assert cache.match("page", "abc") is None
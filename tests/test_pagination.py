@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+from src.page_cache import PageCache
+from src.parser import Parser, SoupPageParser, _search_page_rendered, parse_page_count
+from tests.test_card_parser import ground_truth, make_search_page
+
+SEARCH_URL = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=1_2_3_4"
+CARDS = list(ground_truth)
+
+
+class FakeHttpFetcher:
+    """Serves one card per page, with a pagination bar pointing to the last page."""
+
+    has_cookies = True
+
+    def __init__(self, pages: list[list[str]], announced: int):
+        self.pages = pages
+        self.announced = announced
+        self.fetched: list[int] = []
+
+    def fetch_html(self, url: str, headers=None):
+        page = int(parse_qs(urlparse(url).query).get("page", ["1"])[0])
+        self.fetched.append(page)
+        html = make_search_page(self.pages[page - 1], f"{self.announced} logements trouvés")
+        html = html.replace(
+            "</main>",
+            f'<nav class="fr-pagination"><a href="?bounds=1_2_3_4&page={len(self.pages)}">Dernière page</a></nav></main>',
+        )
+        return SimpleNamespace(url=url, text=html, status_code=200, headers={})
+
+
+class FailingSession:
+    def run(self, action):
+        raise AssertionError("The browser should not be used")
+
+
+def test_parse_page_count():
+    assert parse_page_count(["?page=2", "?bounds=1_2_3_4&page=5", "#"]) == 5
+    assert parse_page_count([]) is None
+
+
+def test_all_pages_are_streamed():
+    fetcher = FakeHttpFetcher([[card] for card in CARDS], announced=3)
+    parser = Parser(FailingSession(), fetcher, page_parser=SoupPageParser())  # type: ignore
+
+    stream = parser.stream_accommodations(SEARCH_URL)
+    ids = sorted(a.id for a in stream)
+
+    assert ids == sorted(a.id for a in ground_truth.values())
+    assert sorted(fetcher.fetched) == [1, 2, 3]
+    assert stream.complete
+    parser.close()
+
+
+def test_incomplete_results_are_detected():
+    # A listing moved from page 1 to page 2 while crawling: it is only yielded once
+    fetcher = FakeHttpFetcher([[CARDS[0]], [CARDS[0]]], announced=2)
+    parser = Parser(FailingSession(), fetcher, page_parser=SoupPageParser())  # type: ignore
+
+    results = parser.get_accommodations(SEARCH_URL)
+    stream = parser.stream_accommodations(SEARCH_URL)
+    list(stream)
+
+    assert len(results.accommodations) == 1
+    assert stream.received == 1
+    assert stream.complete is False
+    parser.close()
+
+
+def test_unchanged_pages_are_not_parsed_again():
+    fetcher = FakeHttpFetcher([[card] for card in CARDS], announced=3)
+    page_parser = SoupPageParser()
+    parsed_htmls = []
+    parse = page_parser.parse
+    page_parser.parse = lambda html: parsed_htmls.append(html) or parse(html)  # type: ignore
+    parser = Parser(FailingSession(), fetcher, page_parser=page_parser, page_cache=PageCache())  # type: ignore
+
+    first = parser.get_accommodations(SEARCH_URL)
+    second = parser.get_accommodations(SEARCH_URL)
+
+    assert not first.unchanged
+    assert second.unchanged
+    assert sorted(a.id for a in second.accommodations) == sorted(a.id for a in first.accommodations)
+    assert len(parsed_htmls) == 3
+
+    # A single changed page is parsed again, and the search is not unchanged anymore
+    fetcher.pages[1] = [CARDS[0]]
+    third = parser.get_accommodations(SEARCH_URL)
+
+    assert not third.unchanged
+    assert len(parsed_htmls) == 4
+    parser.close()
+
+
+class FakeDriver:
+    def __init__(self, current_url: str, elements: dict[str, list[str]]):
+        self.current_url = current_url
+        self.elements = elements
+
+    def find_elements(self, by, selector):
+        return [SimpleNamespace(text=text) for text in self.elements.get(selector, [])]
+
+
+def test_search_pages_are_only_rendered_once_their_cards_show_up():
+    heading = "h2.SearchResults-desktop"
+    assert not _search_page_rendered(FakeDriver(SEARCH_URL, {}))
+    # The heading is rendered before the cards
+    assert not _search_page_rendered(FakeDriver(SEARCH_URL, {heading: ["12 logements trouvés"]}))
+    assert _search_page_rendered(FakeDriver(SEARCH_URL, {heading: ["12 logements trouvés"], "div.fr-card": [""]}))
+    assert _search_page_rendered(FakeDriver(SEARCH_URL, {heading: ["Aucun logement trouvé"]}))
+    assert _search_page_rendered(FakeDriver("https://www.messervices.etudiant.gouv.fr/envole/login", {}))
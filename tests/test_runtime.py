@@ -0,0 +1,285 @@
+import asyncio
+
+from src.filters import FilterEngine
+from src.models import Accommodation, SearchResults, UserConf
+from src.notification_builder import NotificationBuilder
+from src.runtime import PollingRuntime, Supervisor
+from src.scheduler import AdaptiveScheduler
+from src.seen_store import SeenStore, conf_key
+
+LYON = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=4.67_45.94_5.06_45.52"
+PARIS = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=2.22_48.90_2.46_48.81"
+LYON_TILE = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=4.75_46_5_45.75"
+
+
+class FakeSearcher:
+    """Finds one accommodation in Lyon, fails in Paris after its first page, and stops the runtime after `searches` searches."""
+
+    def __init__(self, searches: int):
+        self.searches = searches
+        self.searched: list[str] = []
+        self.runtime: PollingRuntime | None = None
+
+    async def search(self, search_url: str, on_page=None) -> SearchResults:
+        self.searched.append(search_url)
+        if len(self.searched) >= self.searches and self.runtime is not None:
+            self.runtime.stop()
+        accommodations = [Accommodation(id=1, title="A", price=250.0, is_colocative=False)]
+        if on_page is not None:
+            on_page(accommodations, 0.0)
+        if search_url == PARIS:
+            raise RuntimeError("browser crashed")
+        return SearchResults(search_url=search_url, count=(1, None), accommodations=accommodations)  # type: ignore
+
+
+class FakeDeliveryQueue:
+    def __init__(self):
+        self.enqueued: list[tuple[str, str]] = []
+        self.alerts: list[tuple[str, str]] = []
+        self.replaced: list[int | None] = []
+
+    def enqueue(self, chat_id, notification, replaces=None) -> None:
+        self.enqueued.append((chat_id, notification.message))
+        self.replaced.append(replaces)
+
+    def enqueue_alert(self, chat_id, notification, received_at=None) -> int:
+        self.alerts.append((chat_id, notification.message))
+        return len(self.alerts)
+
+    def pending_count(self) -> int:
+        return len(self.enqueued)
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = 0
+
+    def close(self) -> None:
+        self.closed += 1
+
+
+def make_conf(telegram_id: str, search_url: str) -> UserConf:
+    return UserConf(conf_title=None, telegram_id=telegram_id, search_url=search_url)  # type: ignore
+
+
+def make_runtime(plan, searcher, delivery_queue, seen_store, **kwargs) -> PollingRuntime:
+    interval = kwargs.pop("interval", 60)
+    runtime = PollingRuntime(
+        plan=lambda: plan,
+        scheduler=AdaptiveScheduler(min_interval=interval, max_interval=interval, jitter=0),
+        searcher=searcher,
+        filter_engine=FilterEngine(),
+        seen_store=seen_store,
+        notification_builder=NotificationBuilder(),
+        delivery_queue=delivery_queue,  # type: ignore
+        default_interval=interval,
+        **kwargs,
+    )
+    searcher.runtime = runtime
+    return runtime
+
+
+def test_failed_searches_do_not_stop_the_others_and_queued_results_are_delivered(tmp_path):
+    confs = [make_conf("1", LYON), make_conf("2", PARIS)]
+    searcher = FakeSearcher(searches=2)
+    delivery_queue = FakeDeliveryQueue()
+    session = FakeSession()
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    cycles = []
+    runtime = make_runtime(
+        {LYON: [confs[0]], PARIS: [confs[1]]},
+        searcher,
+        delivery_queue,
+        seen_store,
+        session=session,
+        on_cycle=lambda duration, **details: cycles.append(details),
+        max_consecutive_failures=1,
+    )
+
+    asyncio.run(asyncio.wait_for(runtime.run(), timeout=5))
+
+    assert sorted(searcher.searched) == sorted([LYON, PARIS])
+    assert [chat_id for chat_id, _ in delivery_queue.enqueued] == ["1"]
+    # Marked as seen once queued, so it is not notified again
+    accommodation = Accommodation(id=1, title="A", price=250.0, is_colocative=False)
+    assert seen_store.filter_new(conf_key(confs[0]), [accommodation]) == []
+    assert session.closed == 1
+    assert [(cycle["searches"], cycle["failed_searches"]) for cycle in cycles] == [(2, 1)]
+    assert delivery_queue.alerts == []
+    seen_store.close()
+
+
+class SlowSearcher:
+    """Finds a new accommodation at every search, Lyon taking `lyon_seconds`, until Paris was searched `searches` times."""
+
+    def __init__(self, lyon_seconds: float, searches: int):
+        self.lyon_seconds = lyon_seconds
+        self.searches = searches
+        self.searched: list[str] = []
+        self.runtime: PollingRuntime | None = None
+
+    async def search(self, search_url: str, on_page=None) -> SearchResults:
+        self.searched.append(search_url)
+        if search_url == LYON:
+            await asyncio.sleep(self.lyon_seconds)
+        elif self.searched.count(PARIS) >= self.searches and self.runtime is not None:
+            self.runtime.stop()
+        accommodations = [Accommodation(id=len(self.searched), title="A", price=250.0, is_colocative=False)]
+        return SearchResults(search_url=search_url, count=(1, None), accommodations=accommodations)  # type: ignore
+
+
+def test_results_are_queued_in_plan_order(tmp_path):
+    # The same user, whose first configuration is the slowest to search
+    confs = [make_conf("1", LYON), make_conf("1", PARIS)]
+    searcher = SlowSearcher(lyon_seconds=0.2, searches=1)
+    delivery_queue = FakeDeliveryQueue()
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    runtime = make_runtime({LYON: confs[:1], PARIS: confs[1:]}, searcher, delivery_queue, seen_store)
+
+    asyncio.run(asyncio.wait_for(runtime.run(), timeout=5))
+
+    assert [LYON in message for _, message in delivery_queue.enqueued] == [True, False]
+    seen_store.close()
+
+
+def test_slow_searches_do_not_hold_back_the_others(tmp_path):
+    confs = [make_conf("1", LYON), make_conf("2", PARIS)]
+    searcher = SlowSearcher(lyon_seconds=1, searches=4)
+    delivery_queue = FakeDeliveryQueue()
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    runtime = make_runtime(
+        {LYON: confs[:1], PARIS: confs[1:]}, searcher, delivery_queue, seen_store, interval=0.05
+    )
+
+    asyncio.run(asyncio.wait_for(runtime.run(), timeout=5))
+
+    # Paris, searched for another user, was searched again while the first search of Lyon was still running
+    assert searcher.searched.count(LYON) == 1
+    assert searcher.searched.count(PARIS) == 4
+    seen_store.close()
+
+
+def test_fast_alerts_are_replaced_by_the_full_notification(tmp_path):
+    confs = [make_conf("1", LYON), make_conf("2", LYON)]
+    searcher = FakeSearcher(searches=1)
+    delivery_queue = FakeDeliveryQueue()
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    seen_store.mark_seen(conf_key(confs[1]), [Accommodation(id=1, title="A", price=250.0)])
+    runtime = make_runtime({LYON: confs}, searcher, delivery_queue, seen_store, fast_alerts=True)
+
+    asyncio.run(asyncio.wait_for(runtime.run(), timeout=5))
+
+    # The second configuration already saw the accommodation
+    assert [chat_id for chat_id, _ in delivery_queue.alerts] == ["1"]
+    assert "Nouveau logement" in delivery_queue.alerts[0][1]
+    assert [chat_id for chat_id, _ in delivery_queue.enqueued] == ["1"]
+    assert delivery_queue.replaced == [1]
+    seen_store.close()
+
+
+def test_alerts_without_a_full_notification_are_made_final(tmp_path):
+    confs = [make_conf("1", LYON), make_conf("2", LYON), make_conf("3", PARIS)]
+    searcher = FakeSearcher(searches=2)
+    delivery_queue = FakeDeliveryQueue()
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    runtime = make_runtime(
+        {LYON: confs[:2], PARIS: confs[2:]}, searcher, delivery_queue, seen_store, fast_alerts=True
+    )
+    filter_new = seen_store.filter_new
+    calls = []
+
+    def filter_new_failing_in_the_matcher(key, matched, ignored_ids=()):
+        calls.append(key)
+        if key == conf_key(confs[1]) and calls.count(key) > 1:
+            raise RuntimeError("database is locked")
+        return filter_new(key, matched, ignored_ids)
+
+    seen_store.filter_new = filter_new_failing_in_the_matcher  # type: ignore[method-assign]
+
+    asyncio.run(asyncio.wait_for(runtime.run(), timeout=5))
+
+    assert sorted(chat_id for chat_id, _ in delivery_queue.alerts) == ["1", "2", "3"]
+    alert_ids = {chat_id: i + 1 for i, (chat_id, _) in enumerate(delivery_queue.alerts)}
+    replaced = dict(zip((chat_id for chat_id, _ in delivery_queue.enqueued), delivery_queue.replaced))
+    # The first configuration gets its full notification, the failed configuration and search a final alert
+    assert replaced == alert_ids
+    for chat_id, message in delivery_queue.enqueued:
+        assert "Détails à suivre" not in message
+        assert ("Nouveau logement" in message) is (chat_id != "1")
+    seen_store.close()
+
+
+def test_accommodations_claimed_by_another_process_are_not_notified(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    confs = [make_conf("1", LYON), make_conf("2", LYON)]
+    other_process = SeenStore(path, shared=True)
+    seen_store = SeenStore(path, shared=True)
+    searcher = FakeSearcher(searches=1)
+    delivery_queue = FakeDeliveryQueue()
+    runtime = make_runtime({LYON: confs}, searcher, delivery_queue, seen_store)
+    filter_new = seen_store.filter_new
+
+    def filter_new_then_claimed_elsewhere(key, matched, ignored_ids=()):
+        new_accommodations = filter_new(key, matched, ignored_ids)
+        if key == conf_key(confs[1]):
+            # Claimed by the other process between the check and the notification
+            assert other_process.claim(key, new_accommodations) == new_accommodations != []
+        return new_accommodations
+
+    seen_store.filter_new = filter_new_then_claimed_elsewhere  # type: ignore[method-assign]
+
+    asyncio.run(asyncio.wait_for(runtime.run(), timeout=5))
+
+    assert [chat_id for chat_id, _ in delivery_queue.enqueued] == ["1"]
+    other_process.close()
+    seen_store.close()
+
+
+class LocatingEnricher:
+    def enrich(self, accommodations):
+        return [a.model_copy(update={"latitude": 45.75, "longitude": 4.85}) for a in accommodations]
+
+
+def test_tile_accommodations_are_located_by_their_detail_page_before_being_routed(tmp_path):
+    confs = [make_conf("1", LYON), make_conf("2", LYON)]
+    searcher = FakeSearcher(searches=1)
+    delivery_queue = FakeDeliveryQueue()
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    routed = []
+
+    def route(search_url, confs, all_matched):
+        routed.extend(a.latitude for matched in all_matched for a in matched)
+        # Only the first configuration covers the location
+        return [matched if conf.telegram_id == "1" else [] for conf, matched in zip(confs, all_matched)]
+
+    runtime = make_runtime(
+        {LYON_TILE: confs}, searcher, delivery_queue, seen_store, route=route, enricher=LocatingEnricher()
+    )
+
+    asyncio.run(asyncio.wait_for(runtime.run(), timeout=5))
+
+    assert routed == [45.75, 45.75]
+    assert [chat_id for chat_id, _ in delivery_queue.enqueued] == ["1"]
+    # The notification links to the search of the user, not to the tile
+    message = delivery_queue.enqueued[0][1]
+    assert LYON in message and LYON_TILE not in message
+    seen_store.close()
+
+
+def test_supervisor_restarts_a_crashed_component():
+    runs = []
+
+    async def component() -> None:
+        runs.append(len(runs))
+        if len(runs) < 3:
+            raise RuntimeError("crash")
+
+    async def scenario() -> None:
+        supervisor = Supervisor(min_backoff=0, max_backoff=0)
+        supervisor.start("component", component)
+        await asyncio.sleep(0.05)
+        await supervisor.stop()
+
+    asyncio.run(scenario())
+
+    assert runs == [0, 1, 2]
@@ -0,0 +1,78 @@
+import random
+
+from src.scheduler import AdaptiveScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_scheduler(clock: FakeClock, **kwargs) -> AdaptiveScheduler:
+    return AdaptiveScheduler(
+        min_interval=60,
+        max_interval=1000,
+        jitter=0,
+        clock=clock,
+        rng=random.Random(0),
+        **kwargs,
+    )
+
+
+def test_new_keys_are_due_immediately_then_after_their_interval():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync({"a": 100, "b": 200})
+
+    assert scheduler.pop_due() == ["a", "b"]
+    assert scheduler.pop_due() == []
+
+    clock.now = 100
+    assert scheduler.pop_due() == ["a"]
+    assert scheduler.seconds_until_next() == 100
+
+
+def test_interval_tightens_on_changes_and_backs_off_when_quiet():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync({"hot": 200, "quiet": 200})
+    scheduler.pop_due()
+
+    scheduler.report("hot", frozenset({1}))
+    scheduler.report("quiet", frozenset({1}))
+    scheduler.report("hot", frozenset({1, 2}))
+    scheduler.report("quiet", frozenset({1}))
+
+    assert scheduler.interval("hot") == 100
+    assert scheduler.interval("quiet") == 250
+
+    # Intervals stay within bounds
+    for i in range(10):
+        scheduler.report("hot", frozenset({i}))
+    assert scheduler.interval("hot") == 60
+
+
+def test_global_rate_limit():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_polls_per_minute=2)
+    scheduler.sync({"a": 100, "b": 100, "c": 100})
+
+    assert scheduler.pop_due() == ["a", "b"]
+    assert scheduler.seconds_until_next() == 30
+
+    clock.now = 30
+    assert scheduler.pop_due() == ["c"]
+
+
+def test_removed_keys_are_not_scheduled_anymore():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync({"a": 100, "b": 100})
+    scheduler.pop_due()
+    scheduler.sync({"b": 100})
+
+    clock.now = 100
+    assert scheduler.pop_due() == ["b"]
@@ -0,0 +1,67 @@
+from src.card_fields import Occupation
+from src.search_api import (
+    build_search_payload,
+    parse_bounds,
+    parse_search_api_response,
+)
+
+SEARCH_URL = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=4.67_45.94_5.06_45.52"
+
+
+def test_parse_bounds():
+    assert parse_bounds(SEARCH_URL) == (4.67, 45.94, 5.06, 45.52)
+    assert parse_bounds("https://trouverunlogement.lescrous.fr/tools/42/search") is None
+
+
+def test_build_search_payload():
+    payload = build_search_payload(SEARCH_URL, page=2)
+
+    assert payload is not None
+    assert payload["idTool"] == 42
+    assert payload["page"] == 2
+    assert payload["location"] == [{"lon": 4.67, "lat": 45.94}, {"lon": 5.06, "lat": 45.52}]
+
+
+def test_parse_search_api_response():
+    data = {
+        "results": {
+            "total": {"value": 2},
+            "items": [
+                {
+                    "id": 506,
+                    "residence": {
+                        "label": "LE VELUM",
+                        "address": "Avenue du Commandant CLERE",
+                        "location": {"lat": 45.7578, "lon": 4.8320},
+                    },
+                    "occupationModes": [{"type": "alone", "rent": {"min": 39346, "max": 39346}}],
+                    "medias": [{"src": "https://trouverunlogement.lescrous.fr/media/velum.jpg"}],
+                },
+                {
+                    "id": 1185,
+                    "residence": {"label": "Residence J.P. Sartre"},
+                    "occupationModes": [
+                        {"type": "alone", "rent": {"min": 41840, "max": 41840}},
+                        {"type": "couple", "rent": {"min": 48120, "max": 48120}},
+                    ],
+                },
+            ],
+        }
+    }
+
+    parsed = parse_search_api_response(data)
+
+    assert parsed is not None
+    total, accommodations = parsed
+    assert total == 2
+    assert [a.id for a in accommodations] == [506, 1185]
+    assert accommodations[0].title == "LE VELUM"
+    assert accommodations[0].price == 393.46
+    assert accommodations[1].price == "de 418,4 à 481,2 €"
+    assert accommodations[1].occupations == Occupation.INDIVIDUEL | Occupation.COUPLE
+    assert (accommodations[0].latitude, accommodations[0].longitude) == (45.7578, 4.8320)
+    assert accommodations[1].latitude is None
+
+
+def test_parse_search_api_response_unexpected_shape():
+    assert parse_search_api_response({"error": "unauthorized"}) is None
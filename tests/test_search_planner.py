@@ -0,0 +1,30 @@
+from src.models import UserConf
+from src.search_planner import normalize_search_url, plan_searches
+
+LYON = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=4.67_45.94_5.06_45.52"
+PARIS = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=2.22_48.90_2.46_48.81"
+
+
+def make_conf(search_url: str, **kwargs) -> UserConf:
+    return UserConf(conf_title=None, telegram_id="1", search_url=search_url, **kwargs)  # type: ignore
+
+
+def test_normalize_search_url():
+    assert normalize_search_url(
+        "https://TrouverUnLogement.lescrous.fr/tools/42/search/?page=&occupationModes=alone&bounds=1_2_3_4#map"
+    ) == normalize_search_url(
+        "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=1_2_3_4&occupationModes=alone"
+    )
+
+
+def test_plan_searches_groups_configurations_by_url():
+    confs = [
+        make_conf(LYON),
+        make_conf(PARIS),
+        make_conf(LYON + "#results", max_price=300),
+    ]
+
+    plan = plan_searches(confs)
+
+    assert list(plan.values()) == [[confs[0], confs[2]], [confs[1]]]
+
@@ -0,0 +1,54 @@
+import time
+
+from src.models import Accommodation
+from src.seen_store import SeenStore
+
+
+def make_accommodation(id: int, price: float | str | None = 300.0) -> Accommodation:
+    return Accommodation(id=id, title=f"Residence {id}", price=price)
+
+
+def test_only_new_accommodations_are_returned(tmp_path):
+    store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    store.mark_seen("conf", [make_accommodation(1)])
+
+    new = store.filter_new("conf", [make_accommodation(1), make_accommodation(2)])
+
+    assert [a.id for a in new] == [2]
+    # Seen accommodations are tracked per configuration
+    assert [a.id for a in store.filter_new("other", [make_accommodation(1)])] == [1]
+
+
+def test_price_change_and_ignored_ids(tmp_path):
+    store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    store.mark_seen("conf", [make_accommodation(1), make_accommodation(2)])
+
+    new = store.filter_new(
+        "conf",
+        [make_accommodation(1, price=250.0), make_accommodation(3)],
+        ignored_ids=[3],
+    )
+
+    assert [a.id for a in new] == [1]
+
+
+def test_store_is_persisted(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    store = SeenStore(path)
+    store.mark_seen("conf", [make_accommodation(1)])
+    store.close()
+
+    reloaded = SeenStore(path)
+
+    assert reloaded.filter_new("conf", [make_accommodation(1)]) == []
+
+
+def test_expired_entries_are_notified_again(tmp_path):
+    store = SeenStore(str(tmp_path / "seen.sqlite3"), ttl_seconds=0.05)
+    store.mark_seen("conf", [make_accommodation(1)])
+    assert store.filter_new("conf", [make_accommodation(1)]) == []
+
+    time.sleep(0.1)
+    store.purge_expired()
+
+    assert [a.id for a in store.filter_new("conf", [make_accommodation(1)])] == [1]
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+
+import src.session_manager as session_manager
+from src.session_manager import SessionExpiredError, SessionManager
+
+
+class FakeDriver:
+    def __init__(self, number: int):
+        self.number = number
+        self.quit_count = 0
+        self.service = SimpleNamespace(process=SimpleNamespace(pid=1000 + number))
+
+    def quit(self) -> None:
+        self.quit_count += 1
+
+
+class FakeAuthenticator:
+    def __init__(self):
+        self.authenticated: list[int] = []
+
+    def authenticate_driver(self, driver: FakeDriver) -> None:
+        self.authenticated.append(driver.number)
+
+
+def make_session(**kwargs) -> tuple[SessionManager, list[FakeDriver], FakeAuthenticator]:
+    drivers: list[FakeDriver] = []
+    authenticator = FakeAuthenticator()
+
+    def driver_factory() -> FakeDriver:
+        drivers.append(FakeDriver(len(drivers)))
+        return drivers[-1]
+
+    return SessionManager(driver_factory, authenticator, **kwargs), drivers, authenticator  # type: ignore[arg-type]
+
+
+def test_expired_sessions_are_reauthenticated_and_the_action_retried_once():
+    session, drivers, authenticator = make_session()
+    calls = []
+
+    def search(driver):
+        calls.append(driver.number)
+        if len(calls) == 1:
+            raise SessionExpiredError("redirected to the login page")
+        return "results"
+
+    assert session.run(search) == "results"
+    # The same browser is logged in again
+    assert calls == [0, 0]
+    assert authenticator.authenticated == [0, 0]
+    assert len(drivers) == 1
+
+    def always_expired(driver):
+        raise SessionExpiredError("results heading not found")
+
+    with pytest.raises(SessionExpiredError):
+        session.run(always_expired)
+    assert authenticator.authenticated == [0, 0, 0]
+
+
+def test_browsers_are_recycled_after_max_cycles():
+    session, drivers, _ = make_session(max_cycles=2)
+    session.run(lambda driver: None)
+    session.end_cycle()
+    session.run(lambda driver: None)
+    assert len(drivers) == 1
+
+    session.end_cycle()
+    assert drivers[0].quit_count == 1
+    session.run(lambda driver: None)
+    assert [driver.number for driver in drivers] == [0, 1]
+
+
+def test_browsers_are_recycled_when_using_too_much_memory(monkeypatch):
+    memory_mb = {1000: 800.0}
+    monkeypatch.setattr(session_manager, "process_tree_rss_mb", lambda pid: memory_mb[pid])
+    session, drivers, _ = make_session(max_memory_mb=1000)
+    session.run(lambda driver: None)
+    session.end_cycle()
+    assert drivers[0].quit_count == 0
+
+    memory_mb[1000] = 1200.0
+    session.end_cycle()
+    assert drivers[0].quit_count == 1
+    memory_mb[1001] = 300.0
+    session.run(lambda driver: None)
+    session.end_cycle()
+    assert len(drivers) == 2 and drivers[1].quit_count == 0
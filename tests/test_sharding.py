@@ -0,0 +1,113 @@
+from src.models import Accommodation
+from src.seen_store import SeenStore
+from src.sharding import ShardCoordinator
+
+LEASE = 30
+PLAN = {f"https://trouverunlogement.lescrous.fr/tools/42/search?bounds={i}": [i] for i in range(6)}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_workers(tmp_path, clock, *worker_ids):
+    return [
+        ShardCoordinator(str(tmp_path / "shards.sqlite3"), worker_id, lease_seconds=LEASE, clock=clock)
+        for worker_id in worker_ids
+    ]
+
+
+def heartbeat(*workers) -> None:
+    for worker in workers:
+        worker.owned(PLAN)
+        worker.heartbeat()
+
+
+def settle(clock, *workers) -> None:
+    """Lets the leader split the searches, and the moved ones start."""
+    heartbeat(*workers, *workers)
+    clock.now += LEASE
+    heartbeat(*workers)
+
+
+def owned(worker) -> set[str]:
+    return set(worker.owned(PLAN))
+
+
+def test_searches_are_split_and_rebalanced_when_a_worker_joins(tmp_path):
+    clock = Clock()
+    a, b = make_workers(tmp_path, clock, "a", "b")
+    heartbeat(a)
+    heartbeat(a)
+    assert owned(a) == set(PLAN)
+    assert a.is_leader
+
+    heartbeat(b, a, b)
+    # The searches moved to b only start once a had time to let them go
+    assert len(owned(a)) == 3
+    assert owned(b) == set()
+
+    clock.now += LEASE
+    heartbeat(a, b)
+    assert len(owned(b)) == 3
+    assert owned(a) | owned(b) == set(PLAN)
+    assert not b.is_leader
+
+
+def test_searches_of_dead_workers_go_to_the_others(tmp_path):
+    clock = Clock()
+    a, b, c = make_workers(tmp_path, clock, "a", "b", "c")
+    settle(clock, a, b, c)
+    assert [len(owned(w)) for w in (a, b, c)] == [2, 2, 2]
+
+    # a, the leader, dies: b takes over once its lease expired
+    for _ in range(4):
+        clock.now += LEASE / 3
+        heartbeat(b, c)
+    assert b.is_leader
+    assert owned(b) | owned(c) == set(PLAN)
+    assert owned(b) & owned(c) == set()
+    assert b.workers() == ["b", "c"]
+
+
+def test_stopped_workers_hand_their_searches_over(tmp_path):
+    clock = Clock()
+    a, b = make_workers(tmp_path, clock, "a", "b")
+    settle(clock, a, b)
+    a.stop()
+
+    heartbeat(b, b)
+    assert owned(b) == set(PLAN)
+    assert owned(a) == set()
+
+
+def test_shared_seen_store_sees_what_other_processes_marked(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    first = SeenStore(path, shared=True)
+    second = SeenStore(path, shared=True)
+    accommodation = Accommodation(id=1, title="A", price=300.0)
+
+    assert second.filter_new("conf", [accommodation]) == [accommodation]
+    first.mark_seen("conf", [accommodation])
+    assert second.filter_new("conf", [accommodation]) == []
+    first.close()
+    second.close()
+
+
+def test_only_one_process_claims_an_accommodation(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    first = SeenStore(path, shared=True)
+    second = SeenStore(path, shared=True)
+    accommodations = [Accommodation(id=1, title="A", price=300.0), Accommodation(id=2, title="B", price=400.0)]
+
+    # Both processes found the accommodations new before either notified them
+    assert second.filter_new("conf", accommodations) == accommodations
+    assert first.claim("conf", accommodations[:1]) == accommodations[:1]
+    assert second.claim("conf", accommodations) == accommodations[1:]
+    assert first.claim("conf", [accommodations[0].model_copy(update={"price": 250.0})])[0].id == 1
+    first.close()
+    second.close()
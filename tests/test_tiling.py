@@ -0,0 +1,96 @@
+from src.models import Accommodation, UserConf
+from src.search_api import parse_bounds
+from src.tiling import Rect, RectIndex, TileGrid, TilePlan, TilePlanner
+
+BASE = "https://trouverunlogement.lescrous.fr/tools/42/search"
+LYON = f"{BASE}?bounds=4.67_45.94_5.06_45.52"
+LYON_CENTER = f"{BASE}?bounds=4.80_45.74_4.90_45.70"
+PARIS = f"{BASE}?bounds=2.22_48.90_2.46_48.81"
+
+
+def make_conf(search_url: str, **kwargs) -> UserConf:
+    return UserConf(conf_title=None, telegram_id="1", search_url=search_url, **kwargs)  # type: ignore
+
+
+def located(id: int, longitude: float | None, latitude: float | None) -> Accommodation:
+    return Accommodation(id=id, title=str(id), price=300.0, latitude=latitude, longitude=longitude)
+
+
+def test_rect_from_search_url_and_back():
+    rect = Rect.from_search_url(LYON)
+
+    assert rect == Rect(4.67, 45.52, 5.06, 45.94)
+    assert parse_bounds(f"{BASE}?bounds={rect.to_bounds()}") == (4.67, 45.94, 5.06, 45.52)
+    assert Rect.from_search_url(f"{BASE}?bounds=5.06_45.52_4.67_45.94") == rect
+
+
+def test_tiles_cover_the_rectangle():
+    grid = TileGrid(0.25)
+    rect = Rect.from_search_url(LYON)
+
+    tiles = list(grid.tiles(rect))
+
+    assert len(tiles) == grid.tile_count(rect) == 2 * 3
+    for tile in tiles:
+        tile_rect = grid.rect(tile)
+        assert tile_rect.east > rect.west and tile_rect.west < rect.east
+        assert tile_rect.north > rect.south and tile_rect.south < rect.north
+
+
+def test_rect_index_returns_the_rectangles_containing_a_point():
+    index: RectIndex[str] = RectIndex(TileGrid(0.1))
+    index.add(Rect(4.67, 45.52, 5.06, 45.94), "lyon")
+    index.add(Rect(4.80, 45.70, 4.90, 45.74), "center")
+    index.add(Rect(2.22, 48.81, 2.46, 48.90), "paris")
+
+    assert sorted(index.query(4.85, 45.72)) == ["center", "lyon"]
+    assert index.query(4.70, 45.90) == ["lyon"]
+    assert index.query(2.30, 48.85) == ["paris"]
+    assert index.query(0, 0) == []
+
+
+def test_overlapping_areas_share_their_tiles():
+    lyon, center, paris = make_conf(LYON), make_conf(LYON_CENTER, max_price=400), make_conf(PARIS)
+
+    plan = TilePlan(TileGrid(0.25), [lyon, center, paris])
+
+    # The center of Lyon lies in tiles already searched for the whole Lyon area
+    assert len(plan.searches) == 6 + 2
+    assert sum(center in confs for confs in plan.searches.values()) == 1
+    assert all(lyon in confs for url, confs in plan.searches.items() if paris not in confs)
+    for search_url in plan.searches:
+        assert search_url.startswith(BASE + "?bounds=")
+
+
+def test_large_areas_and_searches_without_bounds_are_not_tiled():
+    france = make_conf(f"{BASE}?bounds=-5_51_8_42")
+    residence = make_conf(f"{BASE}?residence=12")
+
+    plan = TilePlan(TileGrid(0.25), [france, residence], max_tiles=16)
+
+    assert list(plan.searches.values()) == [[france], [residence]]
+
+
+def test_route_keeps_the_accommodations_inside_each_area():
+    lyon, center = make_conf(LYON), make_conf(LYON_CENTER)
+    plan = TilePlan(TileGrid(0.25), [lyon, center])
+    (tile_url,) = [url for url, confs in plan.searches.items() if center in confs]
+    inside, outside, unknown = located(1, 4.85, 45.72), located(2, 4.95, 45.60), located(3, None, None)
+    accommodations = [inside, outside, unknown]
+
+    routed = plan.route(tile_url, plan.searches[tile_url], [accommodations] * 2)
+
+    assert dict(zip(map(id, plan.searches[tile_url]), routed)) == {
+        id(lyon): [inside, outside, unknown],
+        id(center): [inside, unknown],
+    }
+
+
+def test_planner_only_rebuilds_the_plan_when_configurations_change():
+    planner = TilePlanner(0.25)
+    confs = [make_conf(LYON)]
+
+    searches = planner.plan(confs)
+
+    assert planner.plan(list(confs)) is searches
+    assert planner.plan([make_conf(LYON)]) is not searches